@@ -2,16 +2,43 @@
 Changelog generation using AI.
 """
 
-from typing import List, Dict, Optional
+import sqlite3
+import subprocess
+from typing import List, Dict, Optional, Tuple
 from ..shared.ai import AIService
+from ..shared.commitindex import CommitIndex
 from ..shared.config import Config
 from ..shared.git import GitService
+from ..shared.notes import CommitNotes
+from ..shared.usage import BudgetExceededError
 import re
 
+# Changelog section headers by name, in output order
+SECTIONS = {
+    "Added": "✨ Added",
+    "Changed": "🔄 Changed",
+    "Fixed": "🐛 Fixed",
+    "Performance": "🚀 Performance",
+    "Documentation": "📝 Documentation",
+    "Maintenance": "🔧 Maintenance",
+    "Removed": "🗑️ Removed",
+    "Security": "🔒 Security",
+}
+
+# "<number> | <section> | <entry>" lines of the per-commit classification
+CLASSIFICATION_PATTERN = re.compile(r"^\W*(\d+)\W*\|\s*([A-Za-z]+)\s*\|\s*(.+?)\s*$")
+
 
 class ChangelogGenerator(AIService):
     """AI-powered changelog generator."""
 
+    # Changelog runs can issue many requests; keep them behind interactive work
+    default_priority = "bulk"
+    # Bump whenever the per-commit prompt changes so shared notes are redone
+    SUMMARY_PROMPT_VERSION = "1"
+    # Commits classified per AI request
+    SUMMARY_BATCH_SIZE = 40
+
     def __init__(self, config: Config, git_service: Optional[GitService] = None):
         """Initialize changelog generator.
 
@@ -21,25 +48,189 @@ class ChangelogGenerator(AIService):
         """
         super().__init__(config)
         self.git_service = git_service
+        self.use_commit_index = str(config.get("commit_index", "true")).strip().lower() in [
+            "1",
+            "true",
+            "yes",
+            "on",
+        ]
+        self._commit_index: Optional[CommitIndex] = None
+        # Classify commits one by one and share the results as git notes
+        self.use_commit_notes = str(config.get("changelog_notes", "false")).strip().lower() in [
+            "1",
+            "true",
+            "yes",
+            "on",
+        ]
+
+    def _get_commit_index(self) -> Optional[CommitIndex]:
+        """Open the persistent commit index, or None if it is disabled or unusable."""
+        if not self.use_commit_index:
+            return None
+        if self._commit_index is None:
+            try:
+                self._commit_index = CommitIndex(self.git_service)
+            except Exception:
+                self.use_commit_index = False
+                return None
+        return self._commit_index
 
     def get_commits(self, from_tag: str) -> List[Dict[str, str]]:
         """Get commits since a tag."""
         if not self.git_service:
             raise ValueError("GitService not provided")
+        index = self._get_commit_index()
+        if index is not None:
+            try:
+                commits = index.commits_since_tag(from_tag)
+                if commits is not None:
+                    return commits
+            except (sqlite3.Error, OSError, subprocess.CalledProcessError):
+                pass
         return self.git_service.get_commits_since_tag(from_tag)
 
     def get_commits_since_date(self, days: int) -> List[Dict[str, str]]:
         """Get commits since a date."""
         if not self.git_service:
             raise ValueError("GitService not provided")
+        index = self._get_commit_index()
+        if index is not None:
+            try:
+                return index.commits_since_date(days)
+            except (sqlite3.Error, OSError, subprocess.CalledProcessError):
+                pass
         return self.git_service.get_commits_since_date(days)
 
     def get_last_n_commits(self, n: int) -> List[Dict[str, str]]:
         """Get last N commits."""
         if not self.git_service:
             raise ValueError("GitService not provided")
+        index = self._get_commit_index()
+        if index is not None:
+            try:
+                return index.last_commits(n)
+            except (sqlite3.Error, OSError, subprocess.CalledProcessError):
+                pass
         return self.git_service.get_commit_history(limit=n)
 
+    def summarize_commits(
+        self,
+        changes: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+    ) -> List[Tuple[str, str]]:
+        """Classify each commit into a changelog section with a one-line entry.
+
+        Results are shared through git notes under ``refs/notes/devtools``:
+        commits already classified (here or in another clone whose notes
+        were fetched) are reused, and only the rest are sent to the AI, in
+        batches. Commits the AI could not classify fall back to their
+        conventional commit type and are not stored. Storing the notes is
+        best effort, and batches classified before an error are stored
+        before it is raised.
+
+        Args:
+            changes: List of changes, each with 'message' and 'hash'
+            temperature: AI temperature for generation
+
+        Returns:
+            (section header, entry) for every change, in order
+        """
+        notes = CommitNotes(self.git_service) if self.git_service else None
+        hashes = [change.get("hash") for change in changes if change.get("hash")]
+        shared = notes.read(hashes, "changelog") if notes else {}
+        known: Dict[str, Tuple[str, str]] = {
+            commit: (SECTIONS[value["section"]], value["entry"])
+            for commit, value in shared.items()
+            if isinstance(value, dict)
+            and value.get("prompt") == self.SUMMARY_PROMPT_VERSION
+            and value.get("section") in SECTIONS
+            and value.get("entry")
+        }
+
+        missing = [change for change in changes if change.get("hash") not in known]
+        generated: Dict[str, Tuple[str, str]] = {}
+        try:
+            for start in range(0, len(missing), self.SUMMARY_BATCH_SIZE):
+                batch = missing[start : start + self.SUMMARY_BATCH_SIZE]
+                generated.update(self._classify_commits(batch, temperature))
+        except BudgetExceededError:
+            pass
+        finally:
+            # Keep the batches that were paid for, even if a later one failed
+            if notes and generated:
+                self._store_summaries(notes, generated)
+        known.update(
+            {commit: (SECTIONS[name], entry) for commit, (name, entry) in generated.items()}
+        )
+
+        return [
+            known.get(change.get("hash")) or self._classify_heuristic(change["message"])
+            for change in changes
+        ]
+
+    def _store_summaries(
+        self, notes: CommitNotes, generated: Dict[str, Tuple[str, str]]
+    ) -> None:
+        """Store classified commits as notes, warning instead of failing.
+
+        The notes only save later runs work; a read-only clone or a locked
+        ref must not discard a changelog that is already generated.
+        """
+        try:
+            notes.write(
+                {
+                    commit: {
+                        "prompt": self.SUMMARY_PROMPT_VERSION,
+                        "section": name,
+                        "entry": entry,
+                    }
+                    for commit, (name, entry) in generated.items()
+                },
+                "changelog",
+            )
+        except Exception as e:
+            print(f"Warning: Failed to store changelog notes: {e}")
+
+    def _classify_commits(
+        self, changes: List[Dict[str, str]], temperature: Optional[float] = None
+    ) -> Dict[str, Tuple[str, str]]:
+        """Classify a batch of commits with one AI request.
+
+        Returns:
+            Mapping of commit hash to (section name, entry) for the commits
+            the answer covered
+        """
+        system_prompt = f"""You are a helpful AI that prepares changelog entries.
+For every numbered commit, answer with exactly one line:
+<number> | <section> | <entry>
+Rules:
+1. <section> is one of: {", ".join(SECTIONS)}
+2. <entry> is a concise past-tense description starting with a verb
+3. Keep PR references like (#123) only if they exist in the commit message
+4. Do not use emojis, headers or any other text"""
+        commits_text = "\n".join(
+            f"{number}. {change['message'].strip()}"
+            for number, change in enumerate(changes, 1)
+        )
+        raw = self.generate_completion(
+            system_prompt,
+            f"Classify these commits:\n\n{commits_text}",
+            temperature=temperature,
+            max_tokens=60 * len(changes) + 100,
+            payload=commits_text,
+        )
+        results = {}
+        for line in raw.splitlines():
+            match = CLASSIFICATION_PATTERN.match(line.strip())
+            if not match:
+                continue
+            number, section, entry = match.groups()
+            section = section.capitalize()
+            index = int(number) - 1
+            if section in SECTIONS and 0 <= index < len(changes) and changes[index].get("hash"):
+                results[changes[index]["hash"]] = (section, entry)
+        return results
+
     def _extract_pr_reference(self, message: str) -> Optional[str]:
         """Extract PR reference from commit message if it exists."""
         # Look for patterns like (#123) or (#123, #456)
@@ -85,6 +276,10 @@ class ChangelogGenerator(AIService):
         7. Only include PR references if they exist in the original commit message
         8. Keep the changelog clean and professional"""
 
+        if self.use_commit_notes:
+            content = self._render_sections(self.summarize_commits(changes, temperature))
+            return self._clean_changelog_content(content, version)
+
         # Format changes for the prompt, preserving PR references
         changes_text = "\n".join(f"{change['message']}" for change in changes)
 
@@ -92,11 +287,64 @@ class ChangelogGenerator(AIService):
             version
         } with these changes:\n\n{changes_text}"
 
-        raw = self.generate_completion(
-            system_prompt, user_prompt, temperature=temperature
-        )
+        try:
+            raw = self.generate_completion(
+                system_prompt, user_prompt, temperature=temperature, payload=changes_text
+            )
+        except BudgetExceededError:
+            raw = self._heuristic_changelog(changes)
         return self._clean_changelog_content(raw, version)
 
+    def _heuristic_changelog(self, changes: List[Dict[str, str]]) -> str:
+        """Group commit subjects by conventional type without AI.
+
+        Used when the token budget is exhausted.
+
+        Args:
+            changes: List of changes, each with 'message'
+
+        Returns:
+            Changelog content with one section per change type
+        """
+        return self._render_sections(
+            [
+                self._classify_heuristic(change["message"])
+                for change in changes
+                if change["message"].strip()
+            ]
+        )
+
+    def _classify_heuristic(self, message: str) -> Tuple[str, str]:
+        """Get the section header and entry of a commit from its conventional type."""
+        sections = {
+            "feat": "✨ Added",
+            "fix": "🐛 Fixed",
+            "perf": "🚀 Performance",
+            "docs": "📝 Documentation",
+            "refactor": "🔄 Changed",
+            "style": "🔄 Changed",
+        }
+        lines = message.strip().splitlines()
+        subject = lines[0] if lines else ""
+        match = re.match(r"^\W*(\w+)(?:\([^)]*\))?!?:\s*(.+)$", subject)
+        if match:
+            section = sections.get(match.group(1).lower(), "🔧 Maintenance")
+            subject = match.group(2)
+        else:
+            section = "🔧 Maintenance"
+        return section, subject[:1].upper() + subject[1:]
+
+    def _render_sections(self, items: List[Tuple[str, str]]) -> str:
+        """Render (section header, entry) pairs as grouped markdown sections."""
+        grouped: Dict[str, List[str]] = {}
+        for section, entry in items:
+            grouped.setdefault(section, []).append(entry)
+        return "\n\n".join(
+            f"### {section}\n" + "\n".join(f"- {item}" for item in grouped[section])
+            for section in SECTIONS.values()
+            if section in grouped
+        )
+
     def _clean_changelog_content(self, text: str, version: str) -> str:
         """Sanitize AI output to avoid nested headers and code fences.
 
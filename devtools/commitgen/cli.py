@@ -10,11 +10,14 @@ from rich.table import Table
 from rich.syntax import Syntax
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from ..shared.config import Config
+from ..shared.diff import FileDiff
+from ..shared.notes import NOTES_REF, CommitNotes
+from ..shared.resultcache import ResultCache
 from .git import CommitGenGitService
 from .generator import CommitGenerator
 from ..changelog import ChangelogGenerator
-from ..shared.git import GitService
 import os
+from typing import List, Optional
 
 console = Console()
 
@@ -54,6 +57,11 @@ def cli():
     help="Smartly group multiple file changes into one commit (disable to commit per-file)",
 )
 @click.option("--no-verify", is_flag=True, help="Bypass git hooks when committing")
+@click.option(
+    "--regenerate",
+    is_flag=True,
+    help="Ignore messages cached for the same staged changes and generate new ones",
+)
 def generate(
     files: tuple,
     repo: str,
@@ -66,6 +74,7 @@ def generate(
     emoji: bool,
     smart_group: bool,
     no_verify: bool,
+    regenerate: bool,
 ):
     """Generate commit messages for staged changes"""
     try:
@@ -78,49 +87,136 @@ def generate(
             config = Config()
             # Override emoji setting for this invocation without persisting to disk
             config._config["emoji"] = "true" if emoji else "false"
-            git_service = CommitGenGitService(config)
-            ai_service = CommitGenerator(config)
+            git_service = CommitGenGitService(config, repo)
+            # Stop git co-processes (object reader) when the command ends
+            click.get_current_context().call_on_close(git_service.close)
+            use_cache = str(config.get("result_cache", "true")).strip().lower() in [
+                "1",
+                "true",
+                "yes",
+                "on",
+            ]
+            # Per-file messages are reused for files whose blobs didn't change
+            ai_service = CommitGenerator(
+                config,
+                message_cache=ResultCache(
+                    git_service.data_path("file-messages.json"), max_entries=4096
+                )
+                if use_cache and not regenerate
+                else None,
+            )
+            # --files are relative to the current directory, diffs to the top level
+            files = tuple(git_service.to_repo_paths(list(files), cwd=repo))
 
-            # Stage all changes if not disabled
+            # Stage the requested files, or every change with one `git add -A`
             if not no_stage:
                 task = progress.add_task("Staging changes...", total=None)
-                git_service.stage_all_changes()
+                staged_count, elapsed = git_service.stage_changes(
+                    list(files) if files else None
+                )
                 progress.update(task, completed=True)
+                console.print(f"[dim]Staged {staged_count} path(s) in {elapsed:.2f}s[/dim]")
+
+            # Messages generated earlier for the same staged tree and settings
+            cache = None
+            cache_key = None
+            cached = None
+            if use_cache:
+                # The diff being described is HEAD against the staged tree
+                tree, head = git_service.write_tree_and_head()
+                if tree:
+                    cache = ResultCache(git_service.data_path("messages.json"), max_entries=64)
+                    cache_key = ResultCache.make_key(
+                        "commit-generate",
+                        head,
+                        tree,
+                        sorted(files),
+                        smart_group,
+                        conventional,
+                        emoji,
+                        temperature,
+                        config.get("provider"),
+                        config.get("model"),
+                        git_service.summarize_generated,
+                        git_service._diff_args(staged=True),
+                        git_service.max_diff_file_bytes,
+                        git_service.max_diff_total_bytes,
+                    )
+                    if not regenerate:
+                        cached = cache.get(cache_key)
 
-            # Get staged changes
-            task = progress.add_task("Analyzing changes...", total=None)
-            staged_changes = git_service.get_staged_changes(files)
-            progress.update(task, completed=True)
-
-            if not staged_changes:
-                console.print("[yellow]No staged changes found.[/yellow]")
-                return
-
-            # Generate commit message(s)
-            task = progress.add_task("Generating commit message...", total=None)
+            # Show preview when taken from the cache
             messages_by_file = None
-            if smart_group:
-                commit_message = ai_service.generate_commit_message(
-                    staged_changes, temperature
-                )
+            commit_message = None
+            if cached is not None:
+                console.print("[dim]Using messages cached for these staged changes[/dim]")
+                if cached.get("messages"):
+                    messages_by_file = cached["messages"]
+                    console.print("\n[bold]Generated commit message(s):[/bold]")
+                    for fp, msg in messages_by_file.items():
+                        console.print(
+                            Panel(f"{fp}\n\n{msg}", title="Preview", border_style="blue")
+                        )
+                else:
+                    commit_message = cached["message"]
             else:
-                diffs_map = git_service.get_staged_changes_map(
-                    list(files) if files else None
-                )
-                messages_by_file = ai_service.generate_batch_messages(
-                    diffs_map, temperature
-                )
-                commit_message = None
-            progress.update(task, completed=True)
+                # Get staged changes
+                task = progress.add_task("Analyzing changes...", total=None)
+                # Parse the staged diff once and share it between consumers
+                diff_set = git_service.get_diff_set(staged=True)
+                staged_changes = git_service.get_staged_changes(files, diff_set=diff_set)
+                progress.update(task, completed=True)
 
-            # Show preview and confirm
-            console.print("\n[bold]Generated commit message(s):[/bold]")
-            if messages_by_file:
-                for fp, msg in messages_by_file.items():
-                    console.print(
-                        Panel(f"{fp}\n\n{msg}", title="Preview", border_style="blue")
+                if not staged_changes:
+                    console.print("[yellow]No staged changes found.[/yellow]")
+                    return
+
+                # Generate commit message(s)
+                task = progress.add_task("Generating commit message...", total=None)
+                if smart_group:
+                    commit_message = ai_service.generate_commit_message(
+                        staged_changes, temperature
                     )
-            else:
+                else:
+                    diffs_map = git_service.get_staged_changes_map(
+                        list(files) if files else None, diff_set=diff_set
+                    )
+                    console.print("\n[bold]Generated commit message(s):[/bold]")
+
+                    # Stream previews in completion order as messages arrive
+                    def show_preview(fp: str, msg: str) -> None:
+                        console.print(
+                            Panel(f"{fp}\n\n{msg}", title="Preview", border_style="blue")
+                        )
+
+                    messages_by_file = ai_service.generate_batch_messages(
+                        diffs_map,
+                        temperature,
+                        on_message=show_preview,
+                        blob_ids={
+                            file.path: (file.old_sha, file.new_sha) for file in diff_set
+                        },
+                    )
+                progress.update(task, completed=True)
+
+                # Fallbacks (timeouts, errors, exhausted budget) are retried
+                # on the next run instead of being committed from the cache
+                if smart_group:
+                    from_ai = not ai_service.last_message_fallback
+                else:
+                    from_ai = not ai_service.fallback_files
+                if cache is not None and from_ai:
+                    cache.put(
+                        cache_key,
+                        {"messages": messages_by_file}
+                        if messages_by_file
+                        else {"message": commit_message},
+                    )
+                    cache.save()
+
+            # Show preview and confirm
+            if not messages_by_file:
+                console.print("\n[bold]Generated commit message(s):[/bold]")
                 console.print(
                     Panel(commit_message, title="Preview", border_style="blue")
                 )
@@ -128,17 +224,11 @@ def generate(
             if commit:
                 task = progress.add_task("Committing changes...", total=None)
                 if messages_by_file:
-                    # Commit each file separately with its message
-                    # Ensure only that file is included in the commit by using pathspec
-                    # Assumes files are already staged; git commit -- <file> will include only that path
-                    for fp, msg in messages_by_file.items():
-                        ok, out, err, code = git_service.commit_paths_verbose(
-                            msg, [fp], sign=sign, no_verify=no_verify
-                        )
-                        if not ok:
-                            raise Exception(
-                                f"Failed to commit {fp}: {err or out or code}"
-                            )
+                    # Commit each file separately with its message; the
+                    # commits are written with plumbing and HEAD moves once
+                    git_service.commit_files(
+                        messages_by_file, sign=sign, no_verify=no_verify
+                    )
                 else:
                     if no_verify:
                         ok, out, err, code = git_service.commit_verbose(
@@ -201,6 +291,7 @@ def generate_log(
             # Initialize services
             config = Config()
             git_service = CommitGenGitService(config)
+            click.get_current_context().call_on_close(git_service.close)
             changelog_gen = ChangelogGenerator(config, git_service)
 
             task = progress.add_task("Analyzing commit history...", total=None)
@@ -238,6 +329,27 @@ def generate_log(
         raise click.Abort()
 
 
+@changelog.command(name="sync-notes")
+@click.option("--remote", "-r", default="origin", show_default=True, help="Remote to sync with")
+def sync_notes(remote: str):
+    """Fetch, merge and push the shared per-commit changelog notes"""
+    try:
+        git_service = CommitGenGitService(Config())
+        click.get_current_context().call_on_close(git_service.close)
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            console=console,
+        ) as progress:
+            task = progress.add_task(f"Syncing {NOTES_REF} with {remote}...", total=None)
+            CommitNotes(git_service).sync(remote)
+            progress.update(task, completed=True)
+        console.print(f"[green]{NOTES_REF} is in sync with {remote}[/green]")
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+        raise click.Abort()
+
+
 @cli.group()
 def config():
     """Manage configuration"""
@@ -275,20 +387,75 @@ def show():
         raise click.Abort()
 
 
+def _print_diffs(
+    diffs: List[FileDiff],
+    files: List[str],
+    budget: Optional[int],
+    page_lines: int = 200,
+) -> Optional[int]:
+    """Render diffs page by page until the line budget runs out.
+
+    Args:
+        diffs: Parsed file diffs
+        files: Paths to render
+        budget: Number of diff lines left to render, None for no limit
+        page_lines: Number of lines highlighted per Syntax block
+
+    Returns:
+        The remaining line budget
+    """
+    wanted = frozenset(files)
+    for file in diffs:
+        if file.path not in wanted:
+            continue
+        if budget is not None and budget <= 0:
+            console.print("[dim]… more changes not shown; raise --max-lines to see them[/dim]")
+            break
+        lines = file.text.split("\n")
+        shown = lines if budget is None else lines[:budget]
+        for start in range(0, len(shown), page_lines):
+            console.print(
+                Syntax("\n".join(shown[start : start + page_lines]), "diff", theme="monokai")
+            )
+        if len(shown) < len(lines):
+            console.print(f"[dim]… diff of {file.path} truncated[/dim]")
+        if budget is not None:
+            budget -= len(shown)
+    return budget
+
+
 @cli.command()
-def status():
+@click.option(
+    "--max-lines",
+    type=int,
+    default=500,
+    show_default=True,
+    help="Maximum number of diff lines to show (0 for no limit)",
+)
+@click.option("--stat-only", is_flag=True, help="Only list changed files, without diffs")
+def status(max_lines: int, stat_only: bool):
     """Show the current state of the repository."""
     try:
         # Initialize services
-        git = GitService(os.getcwd())
+        git = CommitGenGitService(Config())
+        click.get_current_context().call_on_close(git.close)
 
-        # Get repository info
-        repo_name = git.get_repo_name()
-        current_branch = git.get_current_branch()
+        # Get repository info and changes from a single git status call,
+        # run together with both diffs unless only the file list is wanted
+        if stat_only:
+            snapshot, diffs = git.get_status_snapshot(), None
+        else:
+            snapshot, diffs = git.get_status_with_diffs()
+        repo_name = snapshot.repo_name
+        current_branch = snapshot.branch
 
-        # Get changes
-        staged_files = git.get_staged_files()
-        unstaged_files = git.get_unstaged_files()
+        def describe(code: str, path: str) -> str:
+            original = snapshot.renames.get(path)
+            name = f"{original} → {path}" if original else path
+            return f"  • {code} {name}"
+
+        staged_files = [path for _, path in snapshot.staged_files]
+        unstaged_files = [path for _, path in snapshot.unstaged_files]
 
         # Create status table
         table = Table(title=f"Repository Status: {repo_name} ({current_branch})")
@@ -297,14 +464,18 @@ def status():
 
         # Add staged changes
         if staged_files:
-            staged_content = "\n".join(f"  • {file}" for file in staged_files)
+            staged_content = "\n".join(
+                describe(code, path) for code, path in snapshot.staged_files
+            )
             table.add_row("Staged", staged_content)
         else:
             table.add_row("Staged", "No staged changes")
 
         # Add unstaged changes
         if unstaged_files:
-            unstaged_content = "\n".join(f"  • {file}" for file in unstaged_files)
+            unstaged_content = "\n".join(
+                describe(code, path) for code, path in snapshot.unstaged_files
+            )
             table.add_row("Unstaged", unstaged_content)
         else:
             table.add_row("Unstaged", "No unstaged changes")
@@ -314,24 +485,28 @@ def status():
         console.print(table)
 
         # Show diffs if there are changes
-        if staged_files or unstaged_files:
+        if diffs is not None and (staged_files or unstaged_files):
             console.print("\n[bold]Changes:[/bold]")
+            budget = max_lines or None
 
             # Show staged diffs
             if staged_files:
                 console.print("\n[cyan]Staged Changes:[/cyan]")
-                for file in staged_files:
-                    diff = git.get_diff(file, staged=True)
-                    if diff:
-                        console.print(Syntax(diff, "diff", theme="monokai"))
+                budget = _print_diffs(diffs.staged, staged_files, budget)
 
             # Show unstaged diffs
             if unstaged_files:
-                console.print("\n[yellow]Unstaged Changes:[/yellow]")
-                for file in unstaged_files:
-                    diff = git.get_diff(file, staged=False)
-                    if diff:
-                        console.print(Syntax(diff, "diff", theme="monokai"))
+                if budget is not None and budget <= 0:
+                    console.print(
+                        "[dim]… unstaged changes not shown; raise --max-lines to see them[/dim]"
+                    )
+                else:
+                    console.print("\n[yellow]Unstaged Changes:[/yellow]")
+                    _print_diffs(diffs.unstaged, unstaged_files, budget)
+            if diffs.truncated:
+                console.print(
+                    "[dim]… diff output exceeded max_diff_total_bytes; later files not shown[/dim]"
+                )
 
     except Exception as e:
         console.print(f"[red]Error: {str(e)}[/red]")
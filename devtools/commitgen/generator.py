@@ -2,18 +2,49 @@
 Commit message and changelog generation using AI.
 """
 
-from typing import Dict, List, Optional
-
-from ..shared.ai import AIService
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from ..shared.ai import AIService, RateLimiter
+from ..shared.diff import SUMMARY_PATTERN
+from ..shared.resultcache import ResultCache
+from ..shared.usage import BudgetExceededError
 from ..shared.config import Config
 
 
+# A single conventional commit line, optionally prefixed with an emoji
+COMMIT_LINE_PATTERN = re.compile(
+    r"^(?:[^\w\s`]+\s*)?(feat|fix|docs|style|refactor|test|chore|perf|build|ci|revert)"
+    r"(\([^)]*\))?!?: \S.*$"
+)
+
+
 class CommitGenerator(AIService):
     """AI-powered commit message and changelog generator."""
 
-    def __init__(self, config: Config):
-        """Initialize commit generator."""
+    # Bump whenever the commit message prompt changes so cached per-file
+    # messages are not reused
+    PROMPT_VERSION = "1"
+
+    def __init__(self, config: Config, message_cache: Optional[ResultCache] = None):
+        """Initialize commit generator.
+
+        Args:
+            config: Configuration
+            message_cache: Cache of per-file messages keyed by blob ids
+        """
         super().__init__(config)
+        self.message_cache = message_cache
+        # Whether the last generate_commit_message result was built locally
+        # (exhausted budget, empty answer) instead of by the AI
+        self.last_message_fallback = False
+        # Files of the last generate_batch_messages call whose message did
+        # not entirely come from the AI (timeout, error, exhausted budget,
+        # failed grouping analysis)
+        self.fallback_files: Set[str] = set()
         # Read emoji preference from config (default: disabled)
         self.use_emoji: bool = bool(
             str(self.config.get("emoji", "false")).strip().lower()
@@ -28,7 +59,26 @@ class CommitGenerator(AIService):
     def generate_commit_message(
         self, diff: str, temperature: Optional[float] = None
     ) -> str:
-        """Generate a commit message from a diff."""
+        """Generate a commit message from a diff.
+
+        ``last_message_fallback`` tells whether the message is a local
+        fallback rather than an AI answer.
+        """
+        message, from_ai = self._generate_commit_message(diff, temperature)
+        self.last_message_fallback = not from_ai
+        return message
+
+    def _generate_commit_message(
+        self,
+        diff: str,
+        temperature: Optional[float] = None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[str, bool]:
+        """Generate a commit message and whether the AI wrote it.
+
+        Raises:
+            TimeoutError: If the AI didn't answer by the deadline
+        """
         system_prompt = """You are an expert Git assistant trained to write highly effective and conventional commit messages.
 
 Your task is to analyze the provided code diff and generate a commit message in the following format:
@@ -69,9 +119,25 @@ Output ONLY the commit message. Do not include any comments or explanations."""
 Identify the most relevant type, a concise scope, and the purpose of the change.
 Output ONLY the commit message in the correct format{" with emoji" if self.use_emoji else " without any emoji"}."""
 
-        message = self.generate_completion(
-            system_prompt, user_prompt, temperature=temperature
-        )
+        try:
+            # Commit messages are one line: stop generating once it has arrived
+            message = self.generate_completion(
+                system_prompt,
+                user_prompt,
+                temperature=temperature,
+                stop=["\n"],
+                stop_when=self._is_commit_line,
+                payload=diff,
+                deadline=deadline,
+            )
+            from_ai = True
+        except BudgetExceededError:
+            message = self._heuristic_commit_message(diff)
+            from_ai = False
+        if from_ai and not message.strip():
+            # Generation stopped before any text, e.g. at a leading newline
+            message = self._heuristic_commit_message(diff)
+            from_ai = False
 
         lines = [line.strip() for line in message.split("\n") if line.strip()]
 
@@ -95,6 +161,7 @@ Output ONLY the commit message in the correct format{" with emoji" if self.use_e
             break
         else:
             message = lines[0] if lines else "🔧 chore: update code"
+            from_ai = from_ai and bool(lines)
 
         # Apply or remove emoji based on configuration (strict removal when disabled)
         if self.use_emoji:
@@ -123,7 +190,80 @@ Output ONLY the commit message in the correct format{" with emoji" if self.use_e
                 message = message.replace(emoji, "")
             message = " ".join(message.split())
 
-        return message
+        return message, from_ai
+
+    def _is_commit_line(self, line: str) -> bool:
+        """Check whether a line is a complete conventional commit message."""
+        return bool(COMMIT_LINE_PATTERN.match(line))
+
+    def _heuristic_commit_message(self, diff: str) -> str:
+        """Build a commit message locally from the diff, without AI.
+
+        Used when the token budget is exhausted. The type is inferred from
+        the kinds of files touched and the scope from their common directory.
+
+        Args:
+            diff: Diff text containing ``diff --git`` headers
+
+        Returns:
+            str: Conventional commit message
+        """
+        files = re.findall(r"^diff --git a/.+? b/(.+)$", diff, flags=re.MULTILINE)
+        if not files:
+            return "chore: update code"
+
+        def is_doc(path: str) -> bool:
+            return path.lower().endswith((".md", ".rst", ".txt")) or path.startswith(
+                "docs/"
+            )
+
+        def is_test(path: str) -> bool:
+            name = os.path.basename(path)
+            return "tests/" in path or name.startswith("test_") or "_test." in name
+
+        if all(is_doc(path) for path in files):
+            type_ = "docs"
+        elif all(is_test(path) for path in files):
+            type_ = "test"
+        elif "new file mode" in diff and "deleted file mode" not in diff:
+            type_ = "feat"
+        else:
+            type_ = "chore"
+
+        scope = os.path.commonpath(files) if len(files) > 1 else os.path.dirname(files[0])
+        scope = scope.split("/")[-1] if scope else ""
+        target = os.path.basename(files[0]) if len(files) == 1 else f"{len(files)} files"
+        verb = "add" if type_ == "feat" else "update"
+        return f"{type_}({scope}): {verb} {target}" if scope else f"{type_}: {verb} {target}"
+
+    def _summary_commit_message(self, diff: str) -> Optional[str]:
+        """Build a commit message for a file whose patch was summarized.
+
+        Generated, vendored, lock, binary and oversized files reach the
+        generator as a one-line summary; an AI call would only paraphrase it.
+
+        Args:
+            diff: Diff text for a single file
+
+        Returns:
+            Commit message, or None if diff is a regular patch
+        """
+        match = SUMMARY_PATTERN.match(diff.strip())
+        if not match:
+            return None
+        reason, action, path, _ = match.groups()
+        name = os.path.basename(path)
+        if reason == "lock":
+            message = f"chore(deps): update {name}"
+        elif action == "added":
+            message = f"chore: add {name}"
+        elif action == "deleted":
+            message = f"chore: remove {name}"
+        elif action == "renamed":
+            message = f"chore: rename {name}"
+        else:
+            message = f"chore: update {name}"
+        return self._validate_commit_message(message)
 
     def _parse_analysis_result(self, analysis: str) -> bool:
         """Parse and validate the analysis result from AI.
@@ -248,7 +388,11 @@ Output ONLY the commit message in the correct format{" with emoji" if self.use_e
         return message
 
     def generate_batch_messages(
-        self, diffs: Dict[str, str], temperature: Optional[float] = None
+        self,
+        diffs: Dict[str, str],
+        temperature: Optional[float] = None,
+        on_message: Optional[Callable[[str, str], None]] = None,
+        blob_ids: Optional[Dict[str, Tuple[str, str]]] = None,
     ) -> Dict[str, str]:
         """Generate commit messages for multiple files with intelligent grouping.
 
@@ -258,17 +402,26 @@ Output ONLY the commit message in the correct format{" with emoji" if self.use_e
         Args:
             diffs: Dictionary mapping file paths to their diffs
             temperature: Optional temperature for generation
+            on_message: Optional callback invoked with (file_path, message)
+                as soon as each file's message is ready
+            blob_ids: (old, new) blob ids per file; the grouping decision
+                for the same file versions and per-file messages of files
+                whose blobs are unchanged since an earlier run are taken
+                from the message cache
 
         Returns:
-            Dictionary mapping file paths to their commit messages
+            Dictionary mapping file paths to their commit messages; files
+            whose message is a fallback are listed in ``fallback_files``
         """
+        self.fallback_files = set()
         if not diffs:
             return {}
 
         if len(diffs) == 1:
-            file_path, diff = next(iter(diffs.items()))
-            message = self.generate_commit_message(diff, temperature)
-            return {file_path: self._validate_commit_message(message)}
+            messages = self._generate_per_file_messages(
+                diffs, temperature, on_message, blob_ids=blob_ids
+            )
+            return dict(messages)
 
         # First, analyze the diffs to determine if they should be grouped
         system_prompt = """You are an expert at analyzing code changes and determining their relationships.
@@ -288,20 +441,32 @@ Include a brief explanation of your reasoning."""
             f"File: {file_path}\nChanges:\n{diff}" for file_path, diff in diffs.items()
         )
 
-        try:
-            analysis = self.generate_completion(
-                system_prompt,
-                f"Analyze these changes:\n\n{analysis_input}",
-                temperature=0.1,  # Lower temperature for more consistent analysis
-            )
-            should_group = self._parse_analysis_result(analysis)
-        except Exception as e:
-            print(
-                f"Warning: Failed to analyze changes, defaulting to separate messages: {
-                    e
-                }"
-            )
-            should_group = False
+        analysis_key = self._analysis_cache_key(diffs, blob_ids)
+        cached = self.message_cache.get(analysis_key) if analysis_key else None
+        if cached is not None:
+            should_group = cached == "group"
+        else:
+            try:
+                analysis = self.generate_completion(
+                    system_prompt,
+                    f"Analyze these changes:\n\n{analysis_input}",
+                    temperature=0.1,  # Lower temperature for more consistent analysis
+                    payload=analysis_input,
+                )
+                should_group = self._parse_analysis_result(analysis)
+                if analysis_key:
+                    self.message_cache.put(
+                        analysis_key, "group" if should_group else "separate"
+                    )
+                    self.message_cache.save()
+            except Exception as e:
+                print(
+                    f"Warning: Failed to analyze changes, defaulting to separate messages: {
+                        e
+                    }"
+                )
+                should_group = False
+                self.fallback_files.update(diffs)
 
         if should_group:
             # Generate a single commit message for all changes
@@ -312,71 +477,200 @@ Include a brief explanation of your reasoning."""
                     for file_path, diff in diffs.items()
                 )
 
-                message = self.generate_commit_message(structured_diff, temperature)
+                message, from_ai = self._generate_commit_message(structured_diff, temperature)
                 message = self._validate_commit_message(message)
-                return {file_path: message for file_path in diffs.keys()}
+                if not from_ai:
+                    self.fallback_files.update(diffs)
+                results = {file_path: message for file_path in diffs.keys()}
+                if on_message:
+                    for file_path in results:
+                        on_message(file_path, message)
+                return results
             except Exception as e:
                 # Fallback to individual messages if combined generation fails
                 print(f"Warning: Failed to generate combined message: {e}")
                 should_group = False
 
         if not should_group:
-            # Generate individual messages for each file in parallel
-            import time
-            from concurrent.futures import ThreadPoolExecutor
-            from queue import Queue
-            from threading import Lock
-
-            # Rate limiting setup
-            RATE_LIMIT = 5  # requests per second
-            rate_limit_queue = Queue()
-            rate_limit_lock = Lock()
-            last_request_time = time.time()
-
-            def rate_limited_generate(file_path: str, diff: str) -> tuple[str, str]:
-                """Generate commit message with rate limiting."""
-                nonlocal last_request_time
-
-                with rate_limit_lock:
-                    # Calculate time to wait
-                    current_time = time.time()
-                    time_since_last = current_time - last_request_time
-                    if time_since_last < 1.0 / RATE_LIMIT:
-                        time.sleep(1.0 / RATE_LIMIT - time_since_last)
+            messages = self._generate_per_file_messages(
+                diffs, temperature, on_message, blob_ids=blob_ids
+            )
+            # Keep the caller's file order for deterministic commits
+            return {file_path: messages[file_path] for file_path in diffs}
+
+    def _generate_per_file_messages(
+        self,
+        diffs: Dict[str, str],
+        temperature: Optional[float] = None,
+        on_message: Optional[Callable[[str, str], None]] = None,
+        blob_ids: Optional[Dict[str, Tuple[str, str]]] = None,
+    ) -> Dict[str, str]:
+        """Generate one commit message per file concurrently.
+
+        Request starts are paced by a shared RateLimiter, but the network
+        calls themselves run in parallel. Results are reported through
+        ``on_message`` in completion order. Every file must be answered
+        within ``file_timeout`` seconds of being submitted: the deadline
+        bounds the HTTP request itself, so a slow provider call is aborted
+        rather than left running, and the file falls back to a generic
+        message instead of stalling the rest of the batch. Files whose
+        message is a fallback are added to ``fallback_files`` and not
+        cached.
 
-                    try:
-                        message = self.generate_commit_message(diff, temperature)
-                        message = self._validate_commit_message(message)
-                        last_request_time = time.time()
-                        return file_path, message
-                    except Exception as e:
-                        print(
-                            f"Warning: Failed to generate message for {file_path}: {e}"
-                        )
-                        return file_path, "🔧 chore: update code"
-
-            # Use ThreadPoolExecutor with a reasonable number of workers
-            max_workers = min(len(diffs), 10)  # Cap at 10 concurrent workers
-            results = {}
-
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # Submit all tasks
-                future_to_file = {
-                    executor.submit(rate_limited_generate, file_path, diff): file_path
-                    for file_path, diff in diffs.items()
-                }
+        Args:
+            diffs: Dictionary mapping file paths to their diffs
+            temperature: Optional temperature for generation
+            on_message: Optional callback invoked with (file_path, message)
+                as each result becomes available
+            blob_ids: (old, new) blob ids per file, used to look up and
+                store messages in the message cache
+
+        Returns:
+            Dictionary mapping file paths to their commit messages, in
+            completion order
+        """
+        rate_limiter = RateLimiter(float(self.config.get("rate_limit", 5)))
+        file_timeout = float(self.config.get("file_timeout", 30))
+        results: Dict[str, str] = {}
+
+        def paced_generate(diff: str, deadline: float) -> Tuple[str, bool]:
+            """Generate a commit message once a start slot is available."""
+            rate_limiter.acquire()
+            message, from_ai = self._generate_commit_message(diff, temperature, deadline)
+            return self._validate_commit_message(message), from_ai
+
+        def emit(file_path: str, message: str) -> None:
+            results[file_path] = message
+            if on_message:
+                on_message(file_path, message)
+
+        # Summarized files and files unchanged since a cached run don't
+        # need an AI call
+        cache_keys = self._message_cache_keys(diffs, blob_ids, temperature)
+        to_generate = {}
+        for file_path, diff in diffs.items():
+            message = self._summary_commit_message(diff)
+            if not message and file_path in cache_keys:
+                message = self.message_cache.get(cache_keys[file_path])
+            if message:
+                emit(file_path, message)
+            else:
+                to_generate[file_path] = diff
+        if not to_generate:
+            if cache_keys:
+                self.message_cache.save()
+            return results
 
-                # Collect results as they complete
-                for future in future_to_file:
+        max_workers = min(len(to_generate), 10)  # Cap at 10 concurrent workers
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            # Deadlines run from submission, so time spent queued counts
+            deadline = time.monotonic() + file_timeout
+            future_to_file = {
+                executor.submit(paced_generate, diff, deadline): file_path
+                for file_path, diff in to_generate.items()
+            }
+            pending = set(future_to_file)
+
+            while pending:
+                done, pending = wait(
+                    pending,
+                    timeout=max(deadline - time.monotonic(), 0.0),
+                    return_when=FIRST_COMPLETED,
+                )
+
+                for future in done:
+                    file_path = future_to_file[future]
                     try:
-                        file_path, message = future.result()
-                        results[file_path] = message
+                        message, from_ai = future.result()
                     except Exception as e:
-                        file_path = future_to_file[future]
-                        print(f"Warning: Failed to process {file_path}: {e}")
-                        results[file_path] = "🔧 chore: update code"
+                        print(f"Warning: Failed to generate message for {file_path}: {e}")
+                        message, from_ai = "🔧 chore: update code", False
+                    emit(file_path, message)
+                    if not from_ai:
+                        self.fallback_files.add(file_path)
+                    elif file_path in cache_keys:
+                        self.message_cache.put(cache_keys[file_path], message)
+
+                if time.monotonic() < deadline:
+                    continue
+                for future in pending:
+                    file_path = future_to_file[future]
+                    # Queued files never start; running requests hit their
+                    # HTTP timeout at the same deadline
+                    future.cancel()
+                    print(
+                        f"Warning: Timed out generating message for {file_path} "
+                        f"after {file_timeout:g}s"
+                    )
+                    emit(file_path, "🔧 chore: update code")
+                    self.fallback_files.add(file_path)
+                pending = set()
+        finally:
+            # Running requests end by the deadline; don't wait for them here
+            executor.shutdown(wait=False)
+            if cache_keys:
+                self.message_cache.save()
+
+        return results
+
+    def _message_cache_keys(
+        self,
+        diffs: Dict[str, str],
+        blob_ids: Optional[Dict[str, Tuple[str, str]]],
+        temperature: Optional[float],
+    ) -> Dict[str, str]:
+        """Cache keys of the files whose messages can be cached.
 
-            return results
+        A message is determined by the file's (old, new) blob ids, its path
+        and the prompt and generation settings. Files without blob ids are
+        not cached.
+        """
+        if self.message_cache is None or not blob_ids:
+            return {}
+        keys = {}
+        for file_path in diffs:
+            old_sha, new_sha = blob_ids.get(file_path, ("", ""))
+            if not old_sha.strip("0") and not new_sha.strip("0"):
+                continue
+            keys[file_path] = ResultCache.make_key(
+                "file-message",
+                old_sha,
+                new_sha,
+                file_path,
+                self.PROMPT_VERSION,
+                self.config.get("provider"),
+                self.config.get("model"),
+                self.use_emoji,
+                temperature,
+            )
+        return keys
+
+    def _analysis_cache_key(
+        self,
+        diffs: Dict[str, str],
+        blob_ids: Optional[Dict[str, Tuple[str, str]]],
+    ) -> Optional[str]:
+        """Cache key of the grouping decision for these exact file versions.
+
+        The decision depends on every diff, so any edited file changes the
+        key. Without blob ids for all files the decision is not cached.
+        """
+        if self.message_cache is None or not blob_ids:
+            return None
+        files = []
+        for file_path in sorted(diffs):
+            old_sha, new_sha = blob_ids.get(file_path, ("", ""))
+            if not old_sha.strip("0") and not new_sha.strip("0"):
+                return None
+            files.append([file_path, old_sha, new_sha])
+        return ResultCache.make_key(
+            "group-analysis",
+            files,
+            self.PROMPT_VERSION,
+            self.config.get("provider"),
+            self.config.get("model"),
+        )
 
     def generate_changelog(
         self, commits: List[str], version: str, temperature: Optional[float] = None
@@ -401,13 +695,14 @@ Follow these rules:
 
 Do NOT include raw commit messages. Use the commit messages as input and convert them into user-facing changelog entries."""
 
+        commits_text = "\n".join(commits)
         user_prompt = (
             f"Generate a clean and structured changelog for version {
                 version
             } using these commits:\n\n"
-            + "\n".join(commits)
+            + commits_text
         )
 
         return self.generate_completion(
-            system_prompt, user_prompt, temperature=temperature
+            system_prompt, user_prompt, temperature=temperature, payload=commits_text
         )
@@ -3,6 +3,7 @@ Git service for commit_gen tool.
 """
 
 from typing import List, Optional
+from ..shared.diff import DiffSet
 from ..shared.git import GitService
 from ..shared.config import Config
 import os
@@ -11,18 +12,79 @@ import os
 class CommitGenGitService(GitService):
     """Git service for commit_gen tool."""
 
-    def __init__(self, config: Config):
-        """Initialize commit_gen git service."""
-        super().__init__(os.getcwd())  # Use current directory as repo path
+    def __init__(self, config: Config, repo_path: Optional[str] = None):
+        """Initialize commit_gen git service.
+
+        Args:
+            config: Configuration
+            repo_path: Any directory inside the repository, the current
+                directory by default
+        """
+        super().__init__(repo_path or os.getcwd())
         self.config = config
+        self.native_history = str(config.get("native_history", "false")).strip().lower() in [
+            "1",
+            "true",
+            "yes",
+            "on",
+        ]
+        self.native_index = str(config.get("native_index", "false")).strip().lower() in [
+            "1",
+            "true",
+            "yes",
+            "on",
+        ]
+        self.git_concurrency = int(config.get("git_concurrency", 8))
+        self.force_untracked_cache = str(
+            config.get("force_untracked_cache", "false")
+        ).strip().lower() in [
+            "1",
+            "true",
+            "yes",
+            "on",
+        ]
+        self.force_fsmonitor = str(config.get("force_fsmonitor", "false")).strip().lower() in [
+            "1",
+            "true",
+            "yes",
+            "on",
+        ]
+        self.diff_algorithm = config.get("diff_algorithm") or None
+        if config.get("diff_context") not in (None, ""):
+            self.diff_context = int(config.get("diff_context"))
+        if config.get("diff_rename_limit") not in (None, ""):
+            self.rename_limit = int(config.get("diff_rename_limit"))
+        self.diff_filter = config.get("diff_filter") or None
+        self.detect_renames = str(config.get("diff_renames", "true")).strip().lower() in [
+            "1",
+            "true",
+            "yes",
+            "on",
+        ]
+        # 0 disables a ceiling
+        self.max_diff_file_bytes = int(config.get("max_diff_file_bytes", 1 << 20)) or None
+        self.max_diff_total_bytes = int(config.get("max_diff_total_bytes", 16 << 20)) or None
+        self.summarize_generated = str(
+            config.get("summarize_generated", "true")
+        ).strip().lower() in [
+            "1",
+            "true",
+            "yes",
+            "on",
+        ]
 
-    def get_staged_changes(self, files: Optional[List[str]] = None) -> str:
+    def get_staged_changes(
+        self, files: Optional[List[str]] = None, diff_set: Optional[DiffSet] = None
+    ) -> str:
         """Get staged changes as a diff.
 
         Args:
             files: Optional list of files to get changes for
+            diff_set: Already parsed staged diff to reuse
         """
-        diffs = self.get_all_diffs(staged=True)
+        diffs = self.get_all_diffs(
+            staged=True, diff_set=diff_set, summarize=self.summarize_generated
+        )
         if files:
             diffs = {file: diff for file, diff in diffs.items() if file in files}
         return "\n\n".join(
@@ -30,17 +92,20 @@ class CommitGenGitService(GitService):
         )
 
     def get_staged_changes_map(
-        self, files: Optional[List[str]] = None
+        self, files: Optional[List[str]] = None, diff_set: Optional[DiffSet] = None
     ) -> dict[str, str]:
         """Get staged changes as a mapping of file -> diff.
 
         Args:
             files: Optional list of files to get changes for
+            diff_set: Already parsed staged diff to reuse
 
         Returns:
             Dict mapping file path to its staged diff
         """
-        diffs = self.get_all_diffs(staged=True)
+        diffs = self.get_all_diffs(
+            staged=True, diff_set=diff_set, summarize=self.summarize_generated
+        )
         if files:
             diffs = {file: diff for file, diff in diffs.items() if file in files}
         return diffs
@@ -2,21 +2,195 @@
 Shared AI service for devtools.
 """
 
+import json
 import requests
 import os
-from typing import List, Dict, Optional, Any
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import Condition, Event, Lock, local
+from typing import Callable, Deque, Iterator, List, Dict, Optional, Any, Tuple
 from abc import ABC, abstractmethod
 from .config import BaseConfig
+from .health import get_default_health
+from .usage import (
+    BudgetExceededError,
+    BudgetGovernor,
+    estimate_tokens,
+    get_default_ledger,
+)
+
+# Token usage reported by the provider call running on the current thread
+_usage = local()
+# Seconds an HTTP request to a provider may wait for data unless the
+# caller has a deadline of its own
+REQUEST_TIMEOUT = 30
+
+
+class RateLimiter:
+    """Pace request start times without holding a lock during I/O.
+
+    Each caller reserves the next free start slot under a short lock and
+    then sleeps outside of it, so concurrent requests overlap while still
+    being spaced out to at most ``rate`` starts per second.
+    """
+
+    def __init__(self, rate: float):
+        """Initialize the limiter.
+
+        Args:
+            rate: Maximum request starts per second (<= 0 disables pacing)
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = Lock()
+        self._next_slot = 0.0
+
+    def acquire(self) -> None:
+        """Block until the caller's reserved start slot arrives."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class AIScheduler:
+    """Admit AI requests by priority class with per-class concurrency caps.
+
+    Classes are served in strict priority order, but each class has its
+    own concurrency cap, so a flood of bulk work can never occupy the
+    slots interactive requests need. Within a class, waiting requests are
+    queued per job and jobs are served round-robin, so one large batch
+    cannot starve another.
+    """
+
+    PRIORITIES = ("interactive", "bulk")
+
+    def __init__(self, caps: Optional[Dict[str, int]] = None):
+        """Initialize the scheduler.
+
+        Args:
+            caps: Maximum concurrent requests per priority class
+        """
+        caps = caps or {}
+        self.caps = {
+            priority: max(1, int(caps.get(priority, 1))) for priority in self.PRIORITIES
+        }
+        self._cond = Condition()
+        self._running = {priority: 0 for priority in self.PRIORITIES}
+        self._waiting: Dict[str, "OrderedDict[str, Deque[Event]]"] = {
+            priority: OrderedDict() for priority in self.PRIORITIES
+        }
+
+    def _dispatch(self) -> None:
+        """Grant free slots to waiting requests. Caller holds the lock."""
+        for priority in self.PRIORITIES:
+            queues = self._waiting[priority]
+            while queues and self._running[priority] < self.caps[priority]:
+                # Round-robin: take from the first job, then move it to the back
+                job, queue = next(iter(queues.items()))
+                ticket = queue.popleft()
+                if queue:
+                    queues.move_to_end(job)
+                else:
+                    del queues[job]
+                self._running[priority] += 1
+                ticket.set()
+
+    @contextmanager
+    def slot(self, priority: str = "interactive", job: Optional[str] = None) -> Iterator[None]:
+        """Hold a concurrency slot for the duration of a request.
+
+        Args:
+            priority: Priority class, one of PRIORITIES
+            job: Fair-queuing key; requests sharing a job are served in order
+
+        Raises:
+            ValueError: If the priority class is unknown
+        """
+        if priority not in self.PRIORITIES:
+            raise ValueError(
+                f"Unknown priority class: {priority}. Supported classes: {', '.join(self.PRIORITIES)}"
+            )
+        ticket = Event()
+        with self._cond:
+            self._waiting[priority].setdefault(job or priority, deque()).append(ticket)
+            self._dispatch()
+        ticket.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running[priority] -= 1
+                self._dispatch()
+
+
+_default_scheduler: Optional[AIScheduler] = None
+_default_scheduler_lock = Lock()
+
+
+def get_default_scheduler(config: BaseConfig) -> AIScheduler:
+    """Get the process-wide scheduler shared by all AI services.
+
+    The caps are read from the configuration of the first caller.
+    """
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = AIScheduler(
+                {
+                    "interactive": config.get("interactive_concurrency", 10),
+                    "bulk": config.get("bulk_concurrency", 4),
+                }
+            )
+        return _default_scheduler
+
+
+def _iter_sse_data(response: requests.Response) -> Iterator[Dict[str, Any]]:
+    """Yield the JSON payloads of a server-sent events response."""
+    for raw_line in response.iter_lines(decode_unicode=True):
+        if not raw_line or not raw_line.startswith("data:"):
+            continue
+        data = raw_line[len("data:") :].strip()
+        if data == "[DONE]":
+            return
+        try:
+            yield json.loads(data)
+        except ValueError:
+            continue
 
 
 class AIProvider(ABC):
     """Base class for AI providers."""
 
+    # Provider identifier used in configuration and usage tracking
+    name = ""
+    # Config key / environment variable holding the provider's API key
+    api_key_name = ""
+
+    def _report_usage(
+        self, prompt_tokens: Optional[int], completion_tokens: Optional[int]
+    ) -> None:
+        """Report token usage of the current request, if the API returned it."""
+        _usage.value = (prompt_tokens, completion_tokens)
+
+    def take_usage(self) -> Tuple[Optional[int], Optional[int]]:
+        """Return and clear the usage reported on the current thread."""
+        value = getattr(_usage, "value", (None, None))
+        _usage.value = (None, None)
+        return value
+
     @abstractmethod
     def setup(self, config: BaseConfig) -> None:
         """Set up the provider with configuration."""
         pass
 
+    # Whether stream_completion is implemented for this provider
+    supports_streaming = False
+
     @abstractmethod
     def generate_completion(
         self,
@@ -25,17 +199,59 @@ class AIProvider(ABC):
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         top_p: float = 0.95,
+        stop: Optional[List[str]] = None,
+        timeout: Optional[float] = None,
     ) -> str:
-        """Generate a completion from the AI model."""
+        """Generate a completion from the AI model.
+
+        ``timeout`` is the HTTP timeout in seconds, REQUEST_TIMEOUT when
+        not given.
+        """
         pass
 
+    def stream_completion(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        top_p: float = 0.95,
+        timeout: Optional[float] = None,
+    ) -> Iterator[str]:
+        """Yield completion text as it is generated.
+
+        Closing the generator early closes the HTTP connection, which
+        cancels the remaining generation.
+        """
+        raise NotImplementedError(f"{self.name} does not support streaming")
+
+    def _resolve_params(
+        self, temperature: Optional[float], max_tokens: Optional[int]
+    ) -> Tuple[float, int]:
+        """Fill in temperature and max_tokens from configuration."""
+        temp = (
+            temperature
+            if temperature is not None
+            else float(self.config.get("temperature", 0.7))
+        )
+        tokens = (
+            max_tokens
+            if max_tokens is not None
+            else int(self.config.get("max_tokens", 150))
+        )
+        return temp, tokens
+
 
 class OpenRouterProvider(AIProvider):
     """OpenRouter AI provider implementation."""
 
+    name = "openrouter"
+    api_key_name = "OPENROUTER_API_KEY"
+    supports_streaming = True
+
     def setup(self, config: BaseConfig) -> None:
         self.config = config
-        self.api_key = config.get_env_or_config("OPENROUTER_API_KEY")
+        self.api_key = config.get_env_or_config(self.api_key_name)
         if not self.api_key:
             raise ValueError(
                 "OpenRouter API key not found. Please set it in config or environment."
@@ -65,6 +281,8 @@ class OpenRouterProvider(AIProvider):
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         top_p: float = 0.95,
+        stop: Optional[List[str]] = None,
+        timeout: Optional[float] = None,
     ) -> str:
         messages = self._create_prompt(system_prompt, user_prompt)
 
@@ -86,13 +304,14 @@ class OpenRouterProvider(AIProvider):
                 "temperature": temp,
                 "max_tokens": tokens,
                 "top_p": float(top_p),
+                "stop": stop,
                 "stream": False,
             }
 
             payload = {k: v for k, v in payload.items() if v is not None}
 
             response = requests.post(
-                self.api_url, headers=self.headers, json=payload, timeout=30
+                self.api_url, headers=self.headers, json=payload, timeout=timeout or REQUEST_TIMEOUT
             )
 
             if response.status_code != 200:
@@ -106,6 +325,10 @@ class OpenRouterProvider(AIProvider):
                 raise Exception(f"OpenRouter API error: {error_msg}")
 
             result = response.json()
+            usage = result.get("usage") or {}
+            self._report_usage(
+                usage.get("prompt_tokens"), usage.get("completion_tokens")
+            )
 
             if "choices" in result and len(result["choices"]) > 0:
                 return result["choices"][0]["message"]["content"].strip()
@@ -115,13 +338,50 @@ class OpenRouterProvider(AIProvider):
         except Exception as e:
             raise Exception(f"AI generation failed: {str(e)}")
 
+    def stream_completion(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        top_p: float = 0.95,
+        timeout: Optional[float] = None,
+    ) -> Iterator[str]:
+        temp, tokens = self._resolve_params(temperature, max_tokens)
+        payload = {
+            "model": self.model,
+            "messages": self._create_prompt(system_prompt, user_prompt),
+            "temperature": temp,
+            "max_tokens": tokens,
+            "top_p": float(top_p),
+            "stream": True,
+        }
+
+        response = requests.post(
+            self.api_url, headers=self.headers, json=payload, timeout=timeout or REQUEST_TIMEOUT, stream=True
+        )
+        try:
+            if response.status_code != 200:
+                raise Exception(f"OpenRouter API error: {response.text}")
+            for event in _iter_sse_data(response):
+                choices = event.get("choices") or [{}]
+                text = (choices[0].get("delta") or {}).get("content")
+                if text:
+                    yield text
+        finally:
+            response.close()
+
 
 class OpenAIProvider(AIProvider):
     """OpenAI provider implementation."""
 
+    name = "openai"
+    api_key_name = "OPENAI_API_KEY"
+    supports_streaming = True
+
     def setup(self, config: BaseConfig) -> None:
         self.config = config
-        self.api_key = config.get_env_or_config("OPENAI_API_KEY")
+        self.api_key = config.get_env_or_config(self.api_key_name)
         if not self.api_key:
             raise ValueError(
                 "OpenAI API key not found. Please set it in config or environment."
@@ -149,6 +409,8 @@ class OpenAIProvider(AIProvider):
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         top_p: float = 0.95,
+        stop: Optional[List[str]] = None,
+        timeout: Optional[float] = None,
     ) -> str:
         messages = self._create_prompt(system_prompt, user_prompt)
 
@@ -170,12 +432,13 @@ class OpenAIProvider(AIProvider):
                 "temperature": temp,
                 "max_tokens": tokens,
                 "top_p": float(top_p),
+                "stop": stop,
             }
 
             payload = {k: v for k, v in payload.items() if v is not None}
 
             response = requests.post(
-                self.api_url, headers=self.headers, json=payload, timeout=30
+                self.api_url, headers=self.headers, json=payload, timeout=timeout or REQUEST_TIMEOUT
             )
 
             if response.status_code != 200:
@@ -189,6 +452,10 @@ class OpenAIProvider(AIProvider):
                 raise Exception(f"OpenAI API error: {error_msg}")
 
             result = response.json()
+            usage = result.get("usage") or {}
+            self._report_usage(
+                usage.get("prompt_tokens"), usage.get("completion_tokens")
+            )
 
             if "choices" in result and len(result["choices"]) > 0:
                 return result["choices"][0]["message"]["content"].strip()
@@ -198,13 +465,50 @@ class OpenAIProvider(AIProvider):
         except Exception as e:
             raise Exception(f"AI generation failed: {str(e)}")
 
+    def stream_completion(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        top_p: float = 0.95,
+        timeout: Optional[float] = None,
+    ) -> Iterator[str]:
+        temp, tokens = self._resolve_params(temperature, max_tokens)
+        payload = {
+            "model": self.model,
+            "messages": self._create_prompt(system_prompt, user_prompt),
+            "temperature": temp,
+            "max_tokens": tokens,
+            "top_p": float(top_p),
+            "stream": True,
+        }
+
+        response = requests.post(
+            self.api_url, headers=self.headers, json=payload, timeout=timeout or REQUEST_TIMEOUT, stream=True
+        )
+        try:
+            if response.status_code != 200:
+                raise Exception(f"OpenAI API error: {response.text}")
+            for event in _iter_sse_data(response):
+                choices = event.get("choices") or [{}]
+                text = (choices[0].get("delta") or {}).get("content")
+                if text:
+                    yield text
+        finally:
+            response.close()
+
 
 class GeminiProvider(AIProvider):
     """Google Gemini provider implementation."""
 
+    name = "gemini"
+    api_key_name = "GOOGLE_API_KEY"
+    supports_streaming = True
+
     def setup(self, config: BaseConfig) -> None:
         self.config = config
-        self.api_key = config.get_env_or_config("GOOGLE_API_KEY")
+        self.api_key = config.get_env_or_config(self.api_key_name)
         if not self.api_key:
             raise ValueError(
                 "Google API key not found. Please set it in config or environment."
@@ -221,6 +525,8 @@ class GeminiProvider(AIProvider):
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         top_p: float = 0.95,
+        stop: Optional[List[str]] = None,
+        timeout: Optional[float] = None,
     ) -> str:
         try:
             temp = (
@@ -243,6 +549,7 @@ class GeminiProvider(AIProvider):
                     "temperature": temp,
                     "maxOutputTokens": tokens,
                     "topP": float(top_p),
+                    **({"stopSequences": stop} if stop else {}),
                 },
             }
 
@@ -250,7 +557,7 @@ class GeminiProvider(AIProvider):
                 f"{self.api_url}?key={self.api_key}",
                 headers=self.headers,
                 json=payload,
-                timeout=30,
+                timeout=timeout or REQUEST_TIMEOUT,
             )
 
             if response.status_code != 200:
@@ -264,6 +571,10 @@ class GeminiProvider(AIProvider):
                 raise Exception(f"Gemini API error: {error_msg}")
 
             result = response.json()
+            usage = result.get("usageMetadata") or {}
+            self._report_usage(
+                usage.get("promptTokenCount"), usage.get("candidatesTokenCount")
+            )
 
             if "candidates" in result and len(result["candidates"]) > 0:
                 return result["candidates"][0]["content"]["parts"][0]["text"].strip()
@@ -273,13 +584,55 @@ class GeminiProvider(AIProvider):
         except Exception as e:
             raise Exception(f"AI generation failed: {str(e)}")
 
+    def stream_completion(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        top_p: float = 0.95,
+        timeout: Optional[float] = None,
+    ) -> Iterator[str]:
+        temp, tokens = self._resolve_params(temperature, max_tokens)
+        payload = {
+            "contents": [{"parts": [{"text": f"{system_prompt}\n\n{user_prompt}"}]}],
+            "generationConfig": {
+                "temperature": temp,
+                "maxOutputTokens": tokens,
+                "topP": float(top_p),
+            },
+        }
+
+        stream_url = self.api_url.replace(":generateContent", ":streamGenerateContent")
+        response = requests.post(
+            f"{stream_url}?alt=sse&key={self.api_key}",
+            headers=self.headers,
+            json=payload,
+            timeout=timeout or REQUEST_TIMEOUT,
+            stream=True,
+        )
+        try:
+            if response.status_code != 200:
+                raise Exception(f"Gemini API error: {response.text}")
+            for event in _iter_sse_data(response):
+                for candidate in event.get("candidates") or []:
+                    for part in (candidate.get("content") or {}).get("parts") or []:
+                        if part.get("text"):
+                            yield part["text"]
+        finally:
+            response.close()
+
 
 class ClaudeProvider(AIProvider):
     """Anthropic Claude provider implementation."""
 
+    name = "claude"
+    api_key_name = "ANTHROPIC_API_KEY"
+    supports_streaming = True
+
     def setup(self, config: BaseConfig) -> None:
         self.config = config
-        self.api_key = config.get_env_or_config("ANTHROPIC_API_KEY")
+        self.api_key = config.get_env_or_config(self.api_key_name)
         if not self.api_key:
             raise ValueError(
                 "Anthropic API key not found. Please set it in config or environment."
@@ -308,6 +661,8 @@ class ClaudeProvider(AIProvider):
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         top_p: float = 0.95,
+        stop: Optional[List[str]] = None,
+        timeout: Optional[float] = None,
     ) -> str:
         messages = self._create_prompt(system_prompt, user_prompt)
 
@@ -329,12 +684,14 @@ class ClaudeProvider(AIProvider):
                 "temperature": temp,
                 "max_tokens": tokens,
                 "top_p": float(top_p),
+                # Claude rejects whitespace-only stop sequences
+                "stop_sequences": [seq for seq in stop or [] if seq.strip()] or None,
             }
 
             payload = {k: v for k, v in payload.items() if v is not None}
 
             response = requests.post(
-                self.api_url, headers=self.headers, json=payload, timeout=30
+                self.api_url, headers=self.headers, json=payload, timeout=timeout or REQUEST_TIMEOUT
             )
 
             if response.status_code != 200:
@@ -348,6 +705,8 @@ class ClaudeProvider(AIProvider):
                 raise Exception(f"Claude API error: {error_msg}")
 
             result = response.json()
+            usage = result.get("usage") or {}
+            self._report_usage(usage.get("input_tokens"), usage.get("output_tokens"))
 
             if "content" in result and len(result["content"]) > 0:
                 return result["content"][0]["text"].strip()
@@ -357,13 +716,50 @@ class ClaudeProvider(AIProvider):
         except Exception as e:
             raise Exception(f"AI generation failed: {str(e)}")
 
+    def stream_completion(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        top_p: float = 0.95,
+        timeout: Optional[float] = None,
+    ) -> Iterator[str]:
+        temp, tokens = self._resolve_params(temperature, max_tokens)
+        payload = {
+            "model": self.model,
+            "system": system_prompt,
+            "messages": [{"role": "user", "content": user_prompt}],
+            "temperature": temp,
+            "max_tokens": tokens,
+            "top_p": float(top_p),
+            "stream": True,
+        }
+
+        response = requests.post(
+            self.api_url, headers=self.headers, json=payload, timeout=timeout or REQUEST_TIMEOUT, stream=True
+        )
+        try:
+            if response.status_code != 200:
+                raise Exception(f"Claude API error: {response.text}")
+            for event in _iter_sse_data(response):
+                if event.get("type") == "content_block_delta":
+                    text = (event.get("delta") or {}).get("text")
+                    if text:
+                        yield text
+        finally:
+            response.close()
+
 
 class HuggingFaceProvider(AIProvider):
     """Hugging Face provider implementation."""
 
+    name = "huggingface"
+    api_key_name = "HUGGINGFACE_API_KEY"
+
     def setup(self, config: BaseConfig) -> None:
         self.config = config
-        self.api_key = config.get_env_or_config("HUGGINGFACE_API_KEY")
+        self.api_key = config.get_env_or_config(self.api_key_name)
         if not self.api_key:
             raise ValueError(
                 "Hugging Face API key not found. Please set it in config or environment."
@@ -387,6 +783,8 @@ class HuggingFaceProvider(AIProvider):
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         top_p: float = 0.95,
+        stop: Optional[List[str]] = None,
+        timeout: Optional[float] = None,
     ) -> str:
         try:
             temp = (
@@ -409,11 +807,12 @@ class HuggingFaceProvider(AIProvider):
                     "max_new_tokens": tokens,
                     "top_p": float(top_p),
                     "return_full_text": False,
+                    **({"stop": stop} if stop else {}),
                 },
             }
 
             response = requests.post(
-                self.api_url, headers=self.headers, json=payload, timeout=30
+                self.api_url, headers=self.headers, json=payload, timeout=timeout or REQUEST_TIMEOUT
             )
 
             if response.status_code != 200:
@@ -437,33 +836,198 @@ class HuggingFaceProvider(AIProvider):
             raise Exception(f"AI generation failed: {str(e)}")
 
 
+PROVIDERS = {
+    "openrouter": OpenRouterProvider,
+    "openai": OpenAIProvider,
+    "gemini": GeminiProvider,
+    "claude": ClaudeProvider,
+    "huggingface": HuggingFaceProvider,
+}
+
+
 class AIService:
     """Base AI service that can be extended by specific tools."""
 
+    # Priority class used when a caller doesn't ask for one explicitly
+    default_priority = "interactive"
+
     def __init__(self, config: BaseConfig):
         """Initialize AI service with configuration."""
         self.config = config
-        self.provider = self._get_provider()
-        self.provider.setup(config)
+        self.health = get_default_health(config)
+        self.auto = str(config.get("provider", "openrouter")).lower() == "auto"
+        if self.auto:
+            self.providers = self._setup_auto_providers()
+            self.provider = self.providers[self.health.rank(list(self.providers))[0]]
+        else:
+            self.provider = self._get_provider()
+            self.provider.setup(config)
+            self.providers = {self.provider.name: self.provider}
+        self.scheduler = get_default_scheduler(config)
+        self.ledger = get_default_ledger(config)
+        self.governor = BudgetGovernor(config, self.ledger)
+        self._reduced_provider: Optional[AIProvider] = None
+
+        if self.auto and str(config.get("provider_probe", "false")).strip().lower() in [
+            "1",
+            "true",
+            "yes",
+            "on",
+        ]:
+            max_age = float(config.get("provider_probe_interval", 3600))
+            if any(self.health.is_stale(name, max_age) for name in self.providers):
+                self.probe_providers()
+
+    def _setup_auto_providers(self) -> Dict[str, AIProvider]:
+        """Set up every provider that has an API key configured.
+
+        Each provider uses its own ``<provider>_model`` setting when present
+        and its default model otherwise, since ``model`` names are
+        provider-specific.
+
+        Raises:
+            ValueError: If no provider has an API key configured
+        """
+        providers = {}
+        for name, provider_class in PROVIDERS.items():
+            if not self.config.get_env_or_config(provider_class.api_key_name):
+                continue
+            provider_config = BaseConfig(self.config.get_all())
+            provider_config.delete("model")
+            if self.config.get(f"{name}_model"):
+                provider_config.set("model", self.config.get(f"{name}_model"))
+            provider = provider_class()
+            provider.setup(provider_config)
+            providers[name] = provider
+
+        if not providers:
+            raise ValueError(
+                "No AI provider API key found for provider 'auto'. Please set at least one in config or environment."
+            )
+        return providers
+
+    def probe_providers(self) -> Dict[str, bool]:
+        """Send a minimal request to each provider to refresh its profile.
+
+        Returns:
+            Dictionary mapping provider name to whether the probe succeeded
+        """
+
+        def probe(provider: AIProvider) -> bool:
+            start = time.monotonic()
+            try:
+                provider.generate_completion("Reply with OK.", "ping", 0.0, 1)
+                ok = True
+            except Exception:
+                ok = False
+            provider.take_usage()
+            self.health.record(provider.name, time.monotonic() - start, ok)
+            return ok
+
+        with ThreadPoolExecutor(max_workers=len(self.providers)) as executor:
+            results = executor.map(probe, self.providers.values())
+            return dict(zip(self.providers, results))
+
+    def _get_reduced_provider(self) -> AIProvider:
+        """Get the provider used once the budget soft limit is reached.
+
+        Uses ``budget_model`` when configured, otherwise the regular provider.
+        """
+        budget_model = self.config.get("budget_model")
+        if not budget_model or self.auto:
+            return self.provider
+        if self._reduced_provider is None:
+            reduced_config = BaseConfig(self.config.get_all())
+            reduced_config.set("model", budget_model)
+            provider = self._get_provider()
+            provider.setup(reduced_config)
+            self._reduced_provider = provider
+        return self._reduced_provider
 
     def _get_provider(self) -> AIProvider:
         """Get the appropriate AI provider based on configuration."""
         provider = self.config.get("provider", "openrouter").lower()
 
-        providers = {
-            "openrouter": OpenRouterProvider,
-            "openai": OpenAIProvider,
-            "gemini": GeminiProvider,
-            "claude": ClaudeProvider,
-            "huggingface": HuggingFaceProvider,
-        }
-
-        if provider not in providers:
+        if provider not in PROVIDERS:
             raise ValueError(
-                f"Unsupported AI provider: {provider}. Supported providers: {', '.join(providers.keys())}"
+                f"Unsupported AI provider: {provider}. Supported providers: {', '.join(list(PROVIDERS) + ['auto'])}"
             )
 
-        return providers[provider]()
+        return PROVIDERS[provider]()
+
+    def _record_health(self, provider: AIProvider, latency: float, ok: bool) -> None:
+        """Feed a call outcome to provider ranking; only ``provider: auto`` ranks."""
+        if self.auto:
+            self.health.record(provider.name, latency, ok)
+
+    def _candidate_providers(self, mode: str) -> List[AIProvider]:
+        """Get the providers to try for a request, most preferred first."""
+        if not self.auto:
+            return [self._get_reduced_provider() if mode == "reduced" else self.provider]
+        return [self.providers[name] for name in self.health.rank(list(self.providers))]
+
+    def _call_provider(
+        self,
+        provider: AIProvider,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        top_p: float,
+        stop: Optional[List[str]],
+        stop_when: Optional[Callable[[str], bool]],
+        deadline: Optional[float] = None,
+    ) -> str:
+        """Run a single provider request, stopping early for single-line tasks.
+
+        With a deadline (a time.monotonic() value) the HTTP timeout is the
+        time left, and a streamed answer is abandoned once it passes.
+
+        Raises:
+            TimeoutError: If the deadline passed
+        """
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                raise TimeoutError("AI request deadline passed")
+
+        if stop_when is None:
+            return provider.generate_completion(
+                system_prompt, user_prompt, temperature, max_tokens, top_p, stop, timeout
+            )
+
+        if provider.supports_streaming:
+            text = ""
+            pending = ""
+            stream = provider.stream_completion(
+                system_prompt, user_prompt, temperature, max_tokens, top_p, timeout
+            )
+            try:
+                for chunk in stream:
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise TimeoutError("AI request deadline passed")
+                    text += chunk
+                    *complete, pending = (pending + chunk).split("\n")
+                    for line in complete:
+                        if stop_when(line.strip()):
+                            return line.strip()
+            finally:
+                # Closing the stream drops the connection and cancels generation
+                stream.close()
+            if stop_when(pending.strip()):
+                return pending.strip()
+            return text.strip()
+
+        # Without streaming, cut generation at the stop sequences. If that
+        # left no valid line (e.g. only a preamble), return the truncated
+        # text and let the caller fall back rather than paying for a second
+        # full request
+        completion = provider.generate_completion(
+            system_prompt, user_prompt, temperature, max_tokens, top_p, stop, timeout
+        )
+        matches = [line.strip() for line in completion.splitlines() if stop_when(line.strip())]
+        return matches[0] if matches else completion
 
     def generate_completion(
         self,
@@ -472,11 +1036,95 @@ class AIService:
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         top_p: float = 0.95,
+        priority: Optional[str] = None,
+        job: Optional[str] = None,
+        stop: Optional[List[str]] = None,
+        stop_when: Optional[Callable[[str], bool]] = None,
+        payload: Optional[str] = None,
+        deadline: Optional[float] = None,
     ) -> str:
-        """Generate a completion from the AI model."""
-        return self.provider.generate_completion(
-            system_prompt, user_prompt, temperature, max_tokens, top_p
+        """Generate a completion from the AI model.
+
+        With ``provider: auto`` the fastest healthy provider is used and the
+        next one is tried if it fails.
+
+        Args:
+            priority: Scheduler priority class (defaults to default_priority)
+            job: Fair-queuing key for requests belonging to the same job
+            stop: Stop sequences passed to the provider
+            stop_when: For single-line tasks, a predicate accepting a valid
+                output line. The first matching line is returned and, when
+                the provider streams, generation is cancelled as soon as it
+                arrives.
+            payload: The data part of user_prompt (diff, commit list). In
+                reduced budget mode only this part is shortened, so the
+                instructions around it are kept.
+            deadline: time.monotonic() value by which the request must be
+                answered; provider HTTP timeouts are cut to the time left
+
+        Raises:
+            BudgetExceededError: If the configured token budget is used up
+            TimeoutError: If the deadline passed
+        """
+        mode = self.governor.mode()
+        if mode == "exhausted":
+            raise BudgetExceededError("AI token budget exhausted")
+
+        if mode == "reduced":
+            max_chars = int(self.config.get("budget_prompt_chars", 8000))
+            user_prompt = self._shorten_prompt(user_prompt, payload, max_chars)
+
+        error: Optional[Exception] = None
+        with self.scheduler.slot(priority or self.default_priority, job):
+            for provider in self._candidate_providers(mode):
+                start = time.monotonic()
+                try:
+                    completion = self._call_provider(
+                        provider,
+                        system_prompt,
+                        user_prompt,
+                        temperature,
+                        max_tokens,
+                        top_p,
+                        stop,
+                        stop_when,
+                        deadline,
+                    )
+                except Exception as e:
+                    self._record_health(provider, time.monotonic() - start, False)
+                    error = e
+                    continue
+                self._record_health(provider, time.monotonic() - start, True)
+                break
+            else:
+                raise error
+
+        prompt_tokens, completion_tokens = provider.take_usage()
+        if prompt_tokens is None:
+            prompt_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(completion)
+        self.ledger.record(
+            provider.name,
+            getattr(provider, "model", ""),
+            prompt_tokens,
+            completion_tokens,
         )
+        return completion
+
+    @staticmethod
+    def _shorten_prompt(user_prompt: str, payload: Optional[str], max_chars: int) -> str:
+        """Cut a user prompt down to max_chars by shortening its payload.
+
+        Prompts without a payload are cut at the end.
+        """
+        if len(user_prompt) <= max_chars:
+            return user_prompt
+        start = user_prompt.find(payload) if payload else -1
+        if start == -1:
+            return user_prompt[:max_chars]
+        keep = max(0, max_chars - (len(user_prompt) - len(payload)))
+        return user_prompt[: start + keep] + user_prompt[start + len(payload) :]
 
     def generate_batch_completions(
         self,
@@ -484,12 +1132,19 @@ class AIService:
         prompts: List[str],
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
+        priority: str = "bulk",
     ) -> List[str]:
         """Generate completions for multiple prompts."""
+        job = f"batch-{id(prompts)}"
         completions = []
         for prompt in prompts:
             completion = self.generate_completion(
-                system_prompt, prompt, temperature, max_tokens
+                system_prompt,
+                prompt,
+                temperature,
+                max_tokens,
+                priority=priority,
+                job=job,
             )
             completions.append(completion)
         return completions
@@ -0,0 +1,142 @@
+"""
+Persistent git object reader built on ``git cat-file --batch``.
+"""
+
+import subprocess
+import threading
+from typing import IO, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class GitObject(NamedTuple):
+    """A git object returned by the batch reader."""
+
+    sha: str
+    type: str
+    size: int
+    data: bytes
+
+
+class GitObjectReader:
+    """Read git objects through long-lived ``git cat-file`` co-processes.
+
+    One ``--batch`` process serves contents and one ``--batch-check``
+    process serves type/size lookups, both started on first use. Requests
+    are pipelined: all object names are written by a background thread
+    while responses are read, so thousands of lookups cost a single fork.
+    """
+
+    def __init__(self, repo_path: str):
+        """Initialize the reader.
+
+        Args:
+            repo_path: Path to the git repository
+        """
+        self.repo_path = repo_path
+        self._processes = {}
+        self._locks = {"--batch": threading.Lock(), "--batch-check": threading.Lock()}
+
+    def _process(self, mode: str) -> subprocess.Popen:
+        process = self._processes.get(mode)
+        if process is None or process.poll() is not None:
+            process = subprocess.Popen(
+                ["git", "cat-file", mode],
+                cwd=self.repo_path,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            self._processes[mode] = process
+        return process
+
+    @staticmethod
+    def _write_requests(stdin: IO[bytes], revs: List[str]) -> None:
+        try:
+            for rev in revs:
+                stdin.write(rev.encode("utf-8") + b"\n")
+            stdin.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    def _pipeline(
+        self, mode: str, revs: Iterable[str]
+    ) -> Iterator[Tuple[str, Optional[GitObject]]]:
+        # Object names can't contain newlines; they would desync the protocol
+        revs = [rev for rev in revs if "\n" not in rev]
+        if not revs:
+            return
+        with self._locks[mode]:
+            process = self._process(mode)
+            writer = threading.Thread(
+                target=self._write_requests, args=(process.stdin, revs), daemon=True
+            )
+            writer.start()
+            answered = 0
+            try:
+                for rev in revs:
+                    header = process.stdout.readline()
+                    answered += 1
+                    yield rev, self._read_object(process, mode, header)
+            finally:
+                # Drain responses the caller didn't consume to keep the
+                # stream in sync for the next request
+                for _ in range(len(revs) - answered):
+                    self._read_object(process, mode, process.stdout.readline())
+                writer.join()
+
+    @staticmethod
+    def _read_object(
+        process: subprocess.Popen, mode: str, header: bytes
+    ) -> Optional[GitObject]:
+        if not header:
+            raise RuntimeError("git cat-file exited unexpectedly")
+        # "<name> missing" / "<name> ambiguous"; names may contain spaces
+        if header.rstrip(b"\n").endswith((b" missing", b" ambiguous")):
+            return None
+        sha, type_, size = header.decode("utf-8", errors="replace").split()
+        size = int(size)
+        data = b""
+        if mode == "--batch":
+            data = process.stdout.read(size)
+            process.stdout.read(1)  # trailing newline
+        return GitObject(sha, type_, size, data)
+
+    def read(self, rev: str) -> Optional[GitObject]:
+        """Read one object by name (sha, ``HEAD:path``, ``:path`` ...)."""
+        return next(self.read_many([rev]), (rev, None))[1]
+
+    def read_many(
+        self, revs: Iterable[str]
+    ) -> Iterator[Tuple[str, Optional[GitObject]]]:
+        """Read many objects in one pipelined round trip.
+
+        Yields:
+            (rev, object) pairs in request order; object is None if missing
+        """
+        return self._pipeline("--batch", revs)
+
+    def check_many(
+        self, revs: Iterable[str]
+    ) -> Iterator[Tuple[str, Optional[GitObject]]]:
+        """Look up type and size of many objects without reading contents.
+
+        Yields:
+            (rev, object) pairs in request order with empty ``data``
+        """
+        return self._pipeline("--batch-check", revs)
+
+    def close(self) -> None:
+        """Stop the co-processes."""
+        for process in self._processes.values():
+            if process.poll() is None:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+                process.wait()
+        self._processes.clear()
+
+    def __enter__(self) -> "GitObjectReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,261 @@
+"""
+Persistent commit metadata index for fast history range queries.
+"""
+
+import re
+import sqlite3
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .git import GitService
+
+# Conventional commit subject: optional emoji, type, optional scope, optional "!"
+CONVENTIONAL_PATTERN = re.compile(r"^\W*(\w+)(?:\(([^)]*)\))?!?:\s*(.+)$")
+PR_REFERENCE_PATTERN = re.compile(r"#(\d+)\b")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS commits (
+    hash TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    author TEXT NOT NULL,
+    date TEXT NOT NULL,
+    author_time INTEGER NOT NULL,
+    commit_time INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    message TEXT NOT NULL,
+    type TEXT,
+    scope TEXT,
+    pr_refs TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS commits_seq ON commits (seq);
+CREATE INDEX IF NOT EXISTS commits_time ON commits (commit_time);
+CREATE TABLE IF NOT EXISTS parents (hash TEXT NOT NULL, parent TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS parents_hash ON parents (hash);
+CREATE TABLE IF NOT EXISTS paths (hash TEXT NOT NULL, path TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS paths_path ON paths (path);
+CREATE INDEX IF NOT EXISTS paths_hash ON paths (hash);
+"""
+
+# Fields of each `git log` record, before the touched paths
+_LOG_FORMAT = "%H%x00%P%x00%an%x00%ad%x00%at%x00%ct%x00%B%x00"
+_LOG_FIELDS = 7
+
+
+class CommitIndex:
+    """SQLite index of commit metadata stored under ``.git/devtools/``.
+
+    The index is brought up to date with HEAD before every query: only
+    commits added since the last indexed HEAD are read from ``git log``,
+    and the index is rebuilt when history was rewritten (the old HEAD is
+    no longer an ancestor). Range queries then run against SQLite instead
+    of walking history.
+    """
+
+    SCHEMA_VERSION = "1"
+
+    def __init__(self, git_service: GitService):
+        """Open (and create if needed) the index for a repository.
+
+        Args:
+            git_service: GitService of the repository to index
+        """
+        self.git_service = git_service
+        self.path = git_service.data_path("commits.db")
+        self._lock = Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        if self._meta("version") != self.SCHEMA_VERSION:
+            self._reset()
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _reset(self) -> None:
+        with self._conn:
+            for table in ("meta", "commits", "parents", "paths"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('version', ?)", (self.SCHEMA_VERSION,)
+            )
+
+    def _rev_parse(self, rev: str) -> Optional[str]:
+        stdout, _, code = self.git_service._run_git_command(
+            ["rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"]
+        )
+        return stdout if code == 0 and stdout else None
+
+    # Indexing
+
+    def _iter_log_records(self, rev_range: str) -> Iterator[Tuple[List[str], List[str]]]:
+        """Stream (fields, touched paths) for each commit in rev_range.
+
+        With ``-z --name-only`` each record is the NUL-terminated fields,
+        then a newline and NUL-terminated paths, then an empty field.
+        """
+        tokens = self.git_service._iter_log(
+            [
+                f"--pretty=format:{_LOG_FORMAT}",
+                "--date=format:%Y-%m-%d %H:%M:%S %z",
+                "--name-only",
+                rev_range,
+            ],
+            check=True,
+        )
+        fields: List[str] = []
+        paths: List[str] = []
+        for token in tokens:
+            if len(fields) < _LOG_FIELDS:
+                fields.append(token)
+            elif token == "":
+                yield fields, paths
+                fields, paths = [], []
+            else:
+                paths.append(token[1:] if not paths and token.startswith("\n") else token)
+        if len(fields) == _LOG_FIELDS:
+            yield fields, paths
+
+    def update(self) -> None:
+        """Index commits added since the last update."""
+        with self._lock:
+            head = self._rev_parse("HEAD")
+            indexed = self._meta("head")
+            if head == indexed:
+                return
+            if head is None:
+                self._reset()
+                return
+
+            rev_range = head
+            if indexed is not None:
+                _, _, code = self.git_service._run_git_command(
+                    ["merge-base", "--is-ancestor", indexed, head]
+                )
+                if code == 0:
+                    rev_range = f"{indexed}..{head}"
+                else:
+                    # History was rewritten; start over
+                    self._reset()
+
+            records = list(self._iter_log_records(rev_range))
+            row = self._conn.execute("SELECT MAX(seq) FROM commits").fetchone()
+            next_seq = (row[0] or 0) + len(records)
+            with self._conn:
+                for offset, (fields, paths) in enumerate(records):
+                    self._insert(next_seq - offset, fields, paths)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('head', ?)", (head,)
+                )
+
+    def _insert(self, seq: int, fields: List[str], paths: List[str]) -> None:
+        commit_hash, parents, author, date, author_time, commit_time, message = fields
+        subject = GitService._subject(message)
+        match = CONVENTIONAL_PATTERN.match(subject)
+        commit_type = match.group(1).lower() if match else None
+        scope = match.group(2) if match else None
+        pr_refs = ",".join(f"#{number}" for number in PR_REFERENCE_PATTERN.findall(subject))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO commits VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                commit_hash,
+                seq,
+                author,
+                date,
+                int(author_time or 0),
+                int(commit_time or 0),
+                subject,
+                message,
+                commit_type,
+                scope,
+                pr_refs,
+            ),
+        )
+        self._conn.executemany(
+            "INSERT INTO parents (hash, parent) VALUES (?, ?)",
+            [(commit_hash, parent) for parent in parents.split()],
+        )
+        self._conn.executemany(
+            "INSERT INTO paths (hash, path) VALUES (?, ?)",
+            [(commit_hash, path) for path in paths],
+        )
+
+    # Queries
+
+    def commits_since_tag(self, tag: str) -> Optional[List[Dict[str, str]]]:
+        """Commits reachable from HEAD but not from tag (``tag..HEAD``).
+
+        Returns:
+            Commits with hash and subject as message, newest first, or None
+            if the tag is not part of the indexed history
+
+        Raises:
+            Exception: If the tag does not exist
+        """
+        self.update()
+        tag_hash = self._rev_parse(tag)
+        if tag_hash is None:
+            raise Exception(f"Unknown revision: {tag}")
+        with self._lock:
+            if not self._conn.execute(
+                "SELECT 1 FROM commits WHERE hash = ?", (tag_hash,)
+            ).fetchone():
+                return None
+            rows = self._conn.execute(
+                """
+                WITH RECURSIVE reachable (hash) AS (
+                    SELECT ?
+                    UNION
+                    SELECT parents.parent FROM parents
+                    JOIN reachable ON parents.hash = reachable.hash
+                )
+                SELECT hash, subject FROM commits
+                WHERE hash NOT IN (SELECT hash FROM reachable)
+                ORDER BY seq DESC
+                """,
+                (tag_hash,),
+            ).fetchall()
+        return [{"hash": row[0], "message": row[1]} for row in rows]
+
+    def commits_since_date(self, days: int) -> List[Dict[str, str]]:
+        """Commits committed within the last N days, newest first."""
+        self.update()
+        # Same cutoff as `git log --since=<date>`, which keeps the time of day
+        since = int((datetime.now() - timedelta(days=days)).timestamp())
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hash, subject FROM commits WHERE commit_time >= ? ORDER BY seq DESC",
+                (since,),
+            ).fetchall()
+        return [{"hash": row[0], "message": row[1]} for row in rows]
+
+    def last_commits(self, limit: int) -> List[Dict[str, str]]:
+        """The last N commits with hash, author, date and full message."""
+        self.update()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hash, author, date, message FROM commits ORDER BY seq DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            {"hash": row[0], "author": row[1], "date": row[2], "message": row[3]}
+            for row in rows
+        ]
+
+    def commits_touching(self, path: str) -> List[str]:
+        """Hashes of commits that touched a path, newest first."""
+        self.update()
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT commits.hash FROM paths JOIN commits ON commits.hash = paths.hash
+                WHERE paths.path = ? ORDER BY commits.seq DESC
+                """,
+                (path,),
+            ).fetchall()
+        return [row[0] for row in rows]
@@ -0,0 +1,98 @@
+"""
+Compact commit records.
+"""
+
+import sys
+from collections.abc import Mapping
+from typing import Iterator, Tuple, Union
+
+from .objectstore import format_git_date
+
+# Keys exposed by full history records and by hash/subject summaries
+FULL_KEYS = ("hash", "author", "date", "message")
+SUMMARY_KEYS = ("hash", "message")
+
+
+class CommitRecord(Mapping):
+    """Memory-compact commit metadata with a read-only dict interface.
+
+    The sha is kept as 20 raw bytes, author names and timezones are
+    interned so repeated authors share one string, the date is kept as a
+    timestamp and only formatted on access, and the message stays as raw
+    bytes until it is first read. Existing callers can keep using
+    ``commit["message"]``, ``commit.get(...)`` and ``dict(commit)``.
+    """
+
+    __slots__ = ("_sha", "_author", "_time", "_tz", "_message", "_keys")
+
+    def __init__(
+        self,
+        sha: Union[str, bytes],
+        message: Union[str, bytes],
+        author: str = "",
+        time: int = 0,
+        tz: str = "+0000",
+        keys: Tuple[str, ...] = FULL_KEYS,
+    ):
+        """Create a record.
+
+        Args:
+            sha: Commit id, hex string or raw bytes
+            message: Commit message (or subject), str or undecoded bytes
+            author: Author name
+            time: Author timestamp in seconds
+            tz: Author timezone offset like ``+0100``
+            keys: Keys exposed through the mapping interface
+        """
+        if isinstance(sha, str):
+            try:
+                sha = bytes.fromhex(sha)
+            except ValueError:
+                pass
+        self._sha = sha
+        self._author = sys.intern(author)
+        self._time = time
+        self._tz = sys.intern(tz)
+        self._message = message
+        self._keys = keys
+
+    @property
+    def hash(self) -> str:
+        """Full hex commit id."""
+        return self._sha.hex() if isinstance(self._sha, bytes) else self._sha
+
+    @property
+    def author(self) -> str:
+        """Author name."""
+        return self._author
+
+    @property
+    def date(self) -> str:
+        """Author date formatted like ``%Y-%m-%d %H:%M:%S %z``."""
+        return format_git_date(self._time, self._tz)
+
+    @property
+    def message(self) -> str:
+        """Commit message, decoded on first access."""
+        if isinstance(self._message, bytes):
+            self._message = self._message.decode("utf-8", errors="replace")
+        return self._message
+
+    @property
+    def subject(self) -> str:
+        """First line of the message."""
+        return self.message.split("\n", 1)[0]
+
+    def __getitem__(self, key: str) -> str:
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __repr__(self) -> str:
+        return f"CommitRecord({dict(self)!r})"
@@ -0,0 +1,590 @@
+"""
+Structured diff model parsed once from ``git diff -z --patch-with-raw`` output.
+
+Files and hunks are offsets into the original output rather than copies of
+it; text is only decoded when a consumer asks for it. Output can also be
+parsed from a stream with per-file and total byte ceilings, in which case
+oversized patches are reduced to their header and line counts.
+"""
+
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+_HUNK_HEADER = re.compile(rb"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+# One-line summaries replace the patches of generated, vendored, lock,
+# binary and oversized files in prompts
+SUMMARY_PREFIX = "Summary only: "
+SUMMARY_PATTERN = re.compile(rf"^{re.escape(SUMMARY_PREFIX)}(\w+) file (\w+): (.+) \(([^()]*)\)$")
+_STATUS_WORDS = {"A": "added", "D": "deleted", "R": "renamed", "C": "copied", "T": "retyped"}
+
+
+def _parse_meta(meta: bytes) -> Tuple[str, Tuple[str, str], int]:
+    """Get the status letter, (old, new) blob ids and patch count of a raw record.
+
+    git prints a change between file types (e.g. a file replaced by a
+    symlink) as a deletion followed by a creation, so such a record has two
+    ``diff --git`` blocks instead of one.
+
+    Args:
+        meta: The ``:<mode> <mode> <sha> <sha> <status>`` field
+    """
+    fields = meta.split()
+    if len(fields) < 5:
+        return fields[-1][:1].decode("ascii"), ("", ""), 1
+    shas = (fields[2].decode("ascii"), fields[3].decode("ascii"))
+    old_mode, new_mode = int(fields[0][1:], 8), int(fields[1], 8)
+    retyped = old_mode and new_mode and (old_mode & 0o170000) != (new_mode & 0o170000)
+    return fields[-1][:1].decode("ascii"), shas, 2 if retyped else 1
+
+
+class Hunk:
+    """One ``@@`` hunk of a file diff."""
+
+    __slots__ = ("old_start", "old_count", "new_start", "new_count", "_data", "_start", "_end", "_body")
+
+    def __init__(self, data: bytes, start: int, end: int):
+        """Parse a hunk.
+
+        Args:
+            data: The complete diff output
+            start: Offset of the ``@@`` line
+            end: Offset just past the hunk
+        """
+        self._data = data
+        self._start = start
+        self._end = end
+        line_end = data.find(b"\n", start, end)
+        self._body = end if line_end == -1 else line_end
+        match = _HUNK_HEADER.match(data, start, self._body)
+        groups = match.groups() if match else (b"0", None, b"0", None)
+        self.old_start = int(groups[0])
+        self.old_count = int(groups[1]) if groups[1] is not None else 1
+        self.new_start = int(groups[2])
+        self.new_count = int(groups[3]) if groups[3] is not None else 1
+
+    @property
+    def view(self) -> memoryview:
+        """Zero-copy view of the hunk bytes."""
+        return memoryview(self._data)[self._start : self._end]
+
+    @property
+    def header(self) -> str:
+        """The ``@@ -a,b +c,d @@ section`` line."""
+        return self._data[self._start : self._body].decode("utf-8", errors="replace")
+
+    @property
+    def additions(self) -> int:
+        """Number of added lines."""
+        return self._data.count(b"\n+", self._body, self._end)
+
+    @property
+    def deletions(self) -> int:
+        """Number of removed lines."""
+        return self._data.count(b"\n-", self._body, self._end)
+
+    @property
+    def text(self) -> str:
+        """Decoded hunk including its header."""
+        return self._data[self._start : self._end].decode("utf-8", errors="replace")
+
+
+class FileDiff:
+    """The patch for one file."""
+
+    __slots__ = (
+        "path",
+        "old_path",
+        "status",
+        "binary",
+        "_data",
+        "_start",
+        "_end",
+        "_hunk_start",
+        "_hunks",
+        "_counts",
+        "old_sha",
+        "new_sha",
+    )
+
+    def __init__(
+        self,
+        path: str,
+        status: str,
+        data: bytes,
+        start: int,
+        end: int,
+        old_path: Optional[str] = None,
+        counts: Optional[Tuple[int, int]] = None,
+        old_sha: Optional[str] = None,
+        new_sha: Optional[str] = None,
+    ):
+        """Create a file diff.
+
+        Args:
+            path: Path of the file after the change
+            status: Raw status letter (A, M, D, R, C, T)
+            data: The complete diff output
+            start: Offset of the ``diff --git`` line
+            end: Offset just past this file's patch
+            old_path: Path before a rename or copy
+            counts: (additions, deletions) of a patch that was dropped for
+                exceeding a byte ceiling; data then only holds its header
+            old_sha: Blob id before the change (zeros if added)
+            new_sha: Blob id after the change (zeros if deleted or not
+                yet hashed in the worktree)
+        """
+        self.path = path
+        self.old_sha = old_sha
+        self.new_sha = new_sha
+        self.old_path = old_path
+        self.status = status
+        self._data = data
+        self._start = start
+        self._end = end
+        self._hunks: Optional[List[Hunk]] = None
+        self._counts = counts
+        found = data.find(b"\n@@ ", start, end)
+        self._hunk_start = end if found == -1 else found + 1
+        self.binary = (
+            data.find(b"\nBinary files ", start, self._hunk_start) != -1
+            or data.find(b"\nGIT binary patch", start, self._hunk_start) != -1
+        )
+
+    @property
+    def view(self) -> memoryview:
+        """Zero-copy view of the patch bytes."""
+        return memoryview(self._data)[self._start : self._end]
+
+    @property
+    def header(self) -> str:
+        """Extended header lines (``diff --git``, ``index``, ``rename from`` ...)."""
+        return self._data[self._start : self._hunk_start].decode("utf-8", errors="replace").rstrip("\n")
+
+    @property
+    def is_rename(self) -> bool:
+        """Whether the file was renamed."""
+        return self.status == "R"
+
+    @property
+    def truncated(self) -> bool:
+        """Whether the patch was dropped for exceeding a byte ceiling."""
+        return self._counts is not None
+
+    @property
+    def hunks(self) -> List[Hunk]:
+        """Parsed hunks, built on first access."""
+        if self._hunks is None:
+            offsets = []
+            position = self._hunk_start
+            while position < self._end:
+                offsets.append(position)
+                found = self._data.find(b"\n@@ ", position, self._end)
+                position = self._end if found == -1 else found + 1
+            offsets.append(self._end)
+            self._hunks = []
+            for start, end in zip(offsets, offsets[1:]):
+                # The creation half of a type change starts with its own header
+                header = self._data.find(b"\ndiff --git ", start, end)
+                self._hunks.append(Hunk(self._data, start, end if header == -1 else header + 1))
+        return self._hunks
+
+    @property
+    def additions(self) -> int:
+        """Number of added lines."""
+        if self._counts is not None:
+            return self._counts[0]
+        return sum(hunk.additions for hunk in self.hunks)
+
+    @property
+    def deletions(self) -> int:
+        """Number of removed lines."""
+        if self._counts is not None:
+            return self._counts[1]
+        return sum(hunk.deletions for hunk in self.hunks)
+
+    @property
+    def size(self) -> int:
+        """Size of the kept patch bytes."""
+        return self._end - self._start
+
+    @property
+    def text(self) -> str:
+        """Decoded patch text, as returned by ``get_all_diffs``.
+
+        Truncated patches are replaced by their one-line stat summary.
+        """
+        if self._counts is not None:
+            return self.summary("oversized")
+        return self._data[self._start : self._end].decode("utf-8", errors="replace").rstrip("\n")
+
+    def summary(self, reason: str) -> str:
+        """One-line stat summary used instead of the patch for noisy files.
+
+        Args:
+            reason: Why the patch is omitted (generated, vendored, lock,
+                binary)
+        """
+        stats = "binary" if self.binary else f"+{self.additions} -{self.deletions}"
+        action = _STATUS_WORDS.get(self.status, "modified")
+        return f"{SUMMARY_PREFIX}{reason} file {action}: {self.path} ({stats})"
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"FileDiff({self.path!r}, status={self.status!r})"
+
+
+class DiffSet:
+    """All file diffs of one ``git diff`` invocation."""
+
+    def __init__(self, files: List[FileDiff]):
+        """Create a diff set.
+
+        Args:
+            files: File diffs in git's output order
+        """
+        self.files = files
+        self._by_path = {file.path: file for file in files}
+
+    @classmethod
+    def parse(cls, data: bytes) -> "DiffSet":
+        """Parse the output of ``git diff -z --patch-with-raw``.
+
+        The NUL-delimited raw section supplies paths and statuses (so paths
+        never have to be recovered from quoted ``diff --git`` headers) and
+        each patch is matched to its raw record by position; both patches
+        git prints for a type change belong to the same record. Unmerged
+        entries are skipped because they have no patch.
+        """
+        records = []
+        position = 0
+        while data.startswith(b":", position):
+            meta_end = data.index(b"\0", position)
+            status, shas, patches = _parse_meta(data[position:meta_end])
+            names = []
+            position = meta_end + 1
+            for _ in range(2 if status in ("R", "C") else 1):
+                end = data.index(b"\0", position)
+                names.append(os.fsdecode(data[position:end]))
+                position = end + 1
+            if status != "U":
+                records.append((status, names, shas, patches))
+        if data.startswith(b"\0", position):
+            position += 1
+
+        # Patches start at "diff --git" lines; "* Unmerged path" lines are
+        # boundaries too but are dropped
+        boundaries = []
+        for marker in (b"diff --git ", b"* Unmerged path "):
+            if data.startswith(marker, position):
+                boundaries.append(position)
+            found = data.find(b"\n" + marker, position)
+            while found != -1:
+                boundaries.append(found + 1)
+                found = data.find(b"\n" + marker, found + 1)
+        boundaries.sort()
+        boundaries.append(len(data))
+
+        spans = []
+        index = 0
+        remaining = 0
+        for start, end in zip(boundaries, boundaries[1:]):
+            if not data.startswith(b"diff --git ", start):
+                continue
+            if remaining:
+                # Second patch of a type change: extend the record's span
+                spans[-1][2] = end
+                remaining -= 1
+                continue
+            if index >= len(records):
+                continue
+            spans.append([records[index], start, end])
+            remaining = records[index][3] - 1
+            index += 1
+
+        return cls(
+            [
+                FileDiff(
+                    names[-1],
+                    status,
+                    data,
+                    start,
+                    end,
+                    old_path=names[0] if len(names) == 2 else None,
+                    old_sha=shas[0],
+                    new_sha=shas[1],
+                )
+                for (status, names, shas, _), start, end in spans
+            ]
+        )
+
+    @classmethod
+    def iter_stream(
+        cls,
+        chunks: Iterable[bytes],
+        max_file_bytes: Optional[int] = None,
+        max_total_bytes: Optional[int] = None,
+    ) -> Iterator[FileDiff]:
+        """Parse ``git diff -z --patch-with-raw`` output as it streams in.
+
+        Each file diff is yielded once its patch is complete. Patch bytes
+        are only kept while the file stays within max_file_bytes and all
+        kept patches within max_total_bytes; beyond that a file keeps its
+        header and the added/removed line counts, so memory stays bounded
+        however large the change is.
+
+        Args:
+            chunks: Raw output chunks, e.g. from a git subprocess
+            max_file_bytes: Ceiling per file patch, None for no limit
+            max_total_bytes: Ceiling across all kept patches, None for no
+                limit
+        """
+        parser = _StreamParser(max_file_bytes, max_total_bytes)
+        for chunk in chunks:
+            yield from parser.feed(chunk)
+        yield from parser.close()
+
+    @classmethod
+    def parse_stream(
+        cls,
+        chunks: Iterable[bytes],
+        max_file_bytes: Optional[int] = None,
+        max_total_bytes: Optional[int] = None,
+    ) -> "DiffSet":
+        """Build a diff set from streamed output with byte ceilings.
+
+        See ``iter_stream``.
+        """
+        return cls(list(cls.iter_stream(chunks, max_file_bytes, max_total_bytes)))
+
+    def __iter__(self) -> Iterator[FileDiff]:
+        return iter(self.files)
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._by_path
+
+    def __getitem__(self, path: str) -> FileDiff:
+        return self._by_path[path]
+
+    def get(self, path: str) -> Optional[FileDiff]:
+        """Get the diff of a path, if it changed."""
+        return self._by_path.get(path)
+
+    @property
+    def paths(self) -> List[str]:
+        """Changed paths in git's output order."""
+        return [file.path for file in self.files]
+
+    @property
+    def additions(self) -> int:
+        """Total number of added lines."""
+        return sum(file.additions for file in self.files)
+
+    @property
+    def deletions(self) -> int:
+        """Total number of removed lines."""
+        return sum(file.deletions for file in self.files)
+
+    @property
+    def renames(self) -> Dict[str, str]:
+        """Mapping of new path to old path for renamed files."""
+        return {file.path: file.old_path for file in self.files if file.is_rename and file.old_path}
+
+    def filter(self, paths: Optional[List[str]]) -> "DiffSet":
+        """Get a diff set restricted to paths (all files if paths is empty)."""
+        if not paths:
+            return self
+        wanted = set(paths)
+        return DiffSet([file for file in self.files if file.path in wanted])
+
+    def as_dict(self) -> Dict[str, str]:
+        """Mapping of path to decoded patch text."""
+        return {file.path: file.text for file in self.files}
+
+
+class _StreamParser:
+    """Incremental parser behind ``DiffSet.iter_stream``.
+
+    The raw section is parsed first; patches are then split on
+    ``diff --git`` and ``* Unmerged path`` lines. Input is consumed up to
+    the last complete line, or in full when a single line grows past
+    ``_LINE_LIMIT`` (minified files), so the pending buffer stays small.
+    """
+
+    _LINE_LIMIT = 1 << 16
+    _MARKERS = (b"diff --git ", b"* Unmerged path ")
+
+    def __init__(self, max_file_bytes: Optional[int], max_total_bytes: Optional[int]):
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.records: List[Tuple[str, List[str], Tuple[str, str], int]] = []
+        self.record_index = 0
+        self.in_raw = True
+        self.pending = b""
+        self.at_line_start = True
+        self.total = 0
+        # Patch being collected: its raw record, kept bytes and, once it
+        # went over a ceiling, (additions, deletions) of the dropped part
+        self.current: Optional[Tuple[str, List[str], Tuple[str, str], int]] = None
+        self.kept = bytearray()
+        self.counts: Optional[List[int]] = None
+        # Patches still expected for the current record (type changes have
+        # two) and whether a dropped part is inside such a patch's header
+        self.remaining = 0
+        self.in_header = False
+
+    def feed(self, chunk: bytes) -> Iterator[FileDiff]:
+        self.pending += chunk
+        if self.in_raw and not self._parse_raw(final=False):
+            return
+        newline = self.pending.rfind(b"\n")
+        if newline != -1:
+            block, self.pending = self.pending[: newline + 1], self.pending[newline + 1 :]
+        elif len(self.pending) > self._LINE_LIMIT and not self._may_be_marker():
+            block, self.pending = self.pending, b""
+        else:
+            return
+        yield from self._process(block)
+
+    def close(self) -> Iterator[FileDiff]:
+        if self.in_raw:
+            self._parse_raw(final=True)
+        if self.pending:
+            yield from self._process(self.pending)
+            self.pending = b""
+        yield from self._finish()
+
+    def _may_be_marker(self) -> bool:
+        """Whether pending is the start of a line that may still turn into a marker."""
+        return self.at_line_start and any(
+            marker.startswith(self.pending[: len(marker)]) for marker in self._MARKERS
+        )
+
+    def _parse_raw(self, final: bool) -> bool:
+        """Consume complete raw records; True once the raw section ended."""
+        data = self.pending
+        position = 0
+        while data.startswith(b":", position):
+            meta_end = data.find(b"\0", position)
+            if meta_end == -1:
+                break
+            status, shas, patches = _parse_meta(data[position:meta_end])
+            names = []
+            cursor = meta_end + 1
+            for _ in range(2 if status in ("R", "C") else 1):
+                end = data.find(b"\0", cursor)
+                if end == -1:
+                    break
+                names.append(os.fsdecode(data[cursor:end]))
+                cursor = end + 1
+            if len(names) < (2 if status in ("R", "C") else 1):
+                break
+            if status != "U":
+                self.records.append((status, names, shas, patches))
+            position = cursor
+        self.pending = data[position:]
+        if not self.pending and not final:
+            return False
+        if self.pending.startswith(b":") and not final:
+            return False
+        if self.pending.startswith(b"\0"):
+            self.pending = self.pending[1:]
+        self.in_raw = False
+        return True
+
+    def _process(self, block: bytes) -> Iterator[FileDiff]:
+        """Split a block of output on patch boundaries."""
+        boundaries = []
+        for marker in self._MARKERS:
+            if self.at_line_start and block.startswith(marker):
+                boundaries.append(0)
+            found = block.find(b"\n" + marker)
+            while found != -1:
+                boundaries.append(found + 1)
+                found = block.find(b"\n" + marker, found + 1)
+        boundaries.sort()
+
+        position = 0
+        for boundary in boundaries:
+            if boundary > position:
+                self._append(block[position:boundary], self.at_line_start if position == 0 else True)
+            if block.startswith(b"diff --git ", boundary) and self.remaining:
+                # Second patch of a type change belongs to the same file
+                self.remaining -= 1
+                self.in_header = self.counts is not None
+            else:
+                yield from self._finish()
+                if block.startswith(b"diff --git ", boundary):
+                    if self.record_index < len(self.records):
+                        self.current = self.records[self.record_index]
+                        self.remaining = self.current[3] - 1
+                    self.record_index += 1
+            position = boundary
+        if position < len(block):
+            self._append(block[position:], self.at_line_start if position == 0 else True)
+        self.at_line_start = block.endswith(b"\n")
+
+    def _append(self, segment: bytes, line_start: bool) -> None:
+        """Add part of the current patch, dropping it once over a ceiling."""
+        if self.current is None:
+            return
+        if self.counts is None:
+            size = len(self.kept) + len(segment)
+            if (self.max_file_bytes is None or size <= self.max_file_bytes) and (
+                self.max_total_bytes is None or self.total + size <= self.max_total_bytes
+            ):
+                self.kept += segment
+                return
+            # Over a ceiling: keep the header, count the lines kept so far.
+            # Headers (without hunks) are a few lines, so they are kept whole
+            self.kept += segment
+            found = self.kept.find(b"\n@@ ")
+            if found == -1:
+                return
+            kept = FileDiff("", "", bytes(self.kept), 0, len(self.kept))
+            self.counts = [kept.additions, kept.deletions]
+            self.in_header = self.kept.rfind(b"\ndiff --git ") > self.kept.rfind(b"\n@@ ")
+            del self.kept[found + 1 :]
+            return
+        if self.in_header:
+            # Skip the header of a type change's second patch
+            if not (line_start and segment.startswith(b"@@ ")):
+                found = segment.find(b"\n@@ ")
+                if found == -1:
+                    return
+                segment = segment[found + 1 :]
+            line_start = True
+            self.in_header = False
+        self.counts[0] += segment.count(b"\n+") + (line_start and segment.startswith(b"+"))
+        self.counts[1] += segment.count(b"\n-") + (line_start and segment.startswith(b"-"))
+
+    def _finish(self) -> Iterator[FileDiff]:
+        """Emit the patch being collected, if any."""
+        if self.current is None:
+            return
+        status, names, shas, _ = self.current
+        data = bytes(self.kept)
+        counts = tuple(self.counts) if self.counts is not None else None
+        self.total += len(data)
+        self.current = None
+        self.kept = bytearray()
+        self.counts = None
+        self.remaining = 0
+        self.in_header = False
+        yield FileDiff(
+            names[-1],
+            status,
+            data,
+            0,
+            len(data),
+            old_path=names[0] if len(names) == 2 else None,
+            counts=counts,
+            old_sha=shas[0],
+            new_sha=shas[1],
+        )
@@ -2,21 +2,292 @@
 Shared Git service for devtools.
 """
 
+import asyncio
+import fnmatch
+import re
 import subprocess
+import sys
+import tempfile
+import time
+import zlib
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, NamedTuple, Optional, Tuple
 import os
 from datetime import datetime, timedelta
+from threading import Lock
+
+from .catfile import GitObject, GitObjectReader
+from .commits import SUMMARY_KEYS, CommitRecord
+from .diff import DiffSet, FileDiff
+from .index import IndexStatus
+from .objectstore import ObjectStore, UnsupportedRepositoryError
+
+# Errors of the in-process readers that make callers fall back to git
+_NATIVE_ERRORS = (UnsupportedRepositoryError, KeyError, ValueError, OSError, zlib.error)
+# Dependency lockfiles; their diffs say nothing a commit message needs
+LOCKFILE_NAMES = {
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "yarn.lock",
+    "pnpm-lock.yaml",
+    "bun.lockb",
+    "poetry.lock",
+    "Pipfile.lock",
+    "uv.lock",
+    "pdm.lock",
+    "Cargo.lock",
+    "Gemfile.lock",
+    "composer.lock",
+    "go.sum",
+    "mix.lock",
+    "pubspec.lock",
+    "Podfile.lock",
+    "flake.lock",
+}
+# Minified bundles, source maps, test snapshots and generated protobuf code
+GENERATED_PATTERNS = ("*.min.js", "*.min.css", "*.map", "*.snap", "*.pb.go", "*_pb2.py")
+
+
+class StatusSnapshot(NamedTuple):
+    """Repository state gathered for the status command."""
+
+    repo_name: str
+    branch: str
+    # (two-letter porcelain code, path) pairs
+    staged_files: List[Tuple[str, str]]
+    unstaged_files: List[Tuple[str, str]]
+    # New path -> original path for renames and copies
+    renames: Dict[str, str]
+
+
+class StatusDiffs(NamedTuple):
+    """Staged and unstaged diffs gathered together with a status snapshot."""
+
+    staged: List[FileDiff]
+    unstaged: List[FileDiff]
+    # Output stopped at max_diff_total_bytes; later files are left out
+    truncated: bool
+
+
+class GitQueryResult(NamedTuple):
+    """Raw outcome of one query run by ``GitService.run_git_queries``."""
+
+    stdout: bytes
+    stderr: bytes
+    returncode: int
+    # stdout reached the byte limit and git was stopped
+    truncated: bool
+
+
+class RepoContext(NamedTuple):
+    """Repository facts that stay fixed until HEAD or shallow state change."""
+
+    toplevel: str
+    git_dir: str
+    # Shared by all worktrees of the repository
+    common_dir: str
+    # "HEAD" when detached
+    branch: str
+    is_shallow: bool
+
+
+# Process-wide cache: start path -> (signature of HEAD/shallow files, context)
+_repo_contexts: Dict[str, Tuple[Tuple, RepoContext]] = {}
+_repo_contexts_lock = Lock()
+
+
+def _context_signature(git_dir: str, common_dir: str) -> Tuple:
+    """Stat of the files whose changes invalidate a cached RepoContext.
+
+    Git rewrites HEAD through a lock file and rename whenever the current
+    branch changes, and creates or removes ``shallow`` on (un)shallowing
+    fetches, so a stat comparison is enough to notice both.
+    """
+    signature = []
+    for path in (os.path.join(git_dir, "HEAD"), os.path.join(common_dir, "shallow")):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def get_repo_context(path: str) -> RepoContext:
+    """Get the repository context of a path, shared by all services.
+
+    A single ``git rev-parse`` resolves the top level, git directories,
+    branch and shallowness; later calls only stat HEAD and ``shallow`` to
+    check that the cached answer still holds. Works from subdirectories
+    and linked worktrees.
+
+    Args:
+        path: Any directory inside the working tree
+
+    Raises:
+        ValueError: If path is not inside a git working tree
+    """
+    key = os.path.realpath(path)
+    with _repo_contexts_lock:
+        cached = _repo_contexts.get(key)
+    if cached is not None:
+        signature, context = cached
+        if _context_signature(context.git_dir, context.common_dir) == signature:
+            return context
+
+    result = subprocess.run(
+        [
+            "git",
+            "rev-parse",
+            "--show-toplevel",
+            "--git-dir",
+            "--git-common-dir",
+            "--is-shallow-repository",
+            "--abbrev-ref",
+            "HEAD",
+        ],
+        cwd=key,
+        capture_output=True,
+    )
+    lines = os.fsdecode(result.stdout).splitlines()
+    if len(lines) < 4:
+        raise ValueError(f"Not a git repository: {path}")
+    toplevel, git_dir, common_dir, shallow = lines[:4]
+    git_dir = os.path.normpath(os.path.join(key, git_dir))
+    common_dir = os.path.normpath(os.path.join(key, common_dir))
+    branch = lines[4] if result.returncode == 0 and len(lines) > 4 else "HEAD"
+    if result.returncode != 0:
+        # Unborn branch: --abbrev-ref fails, but HEAD still names the branch
+        try:
+            with open(os.path.join(git_dir, "HEAD"), "r") as f:
+                head = f.read().strip()
+            if head.startswith("ref: refs/heads/"):
+                branch = head[len("ref: refs/heads/") :]
+        except OSError:
+            pass
+
+    context = RepoContext(
+        toplevel=os.path.normpath(toplevel),
+        git_dir=git_dir,
+        common_dir=common_dir,
+        branch=branch,
+        is_shallow=shallow == "true",
+    )
+    with _repo_contexts_lock:
+        _repo_contexts[key] = (_context_signature(git_dir, common_dir), context)
+    return context
 
 
 class GitService:
     """Base Git service that can be extended by specific tools."""
 
+    # Read history with the in-process object reader instead of `git log`
+    native_history = False
+    # Answer status queries from .git/index instead of `git diff`/`ls-files`
+    native_index = False
+    # Maximum number of git processes run_git_queries starts at once
+    git_concurrency = 8
+    # Force the untracked cache and, where git supports it, the builtin
+    # fsmonitor daemon on for worktree scans (status, add); otherwise the
+    # repository's own core.untrackedCache/core.fsmonitor settings apply
+    force_untracked_cache = False
+    force_fsmonitor = False
+    # Diff options for huge change sets: --diff-algorithm (myers, minimal,
+    # patience, histogram), -U context lines, diff.renameLimit,
+    # --diff-filter, and rename detection (off adds --no-renames)
+    diff_algorithm: Optional[str] = None
+    diff_context: Optional[int] = None
+    rename_limit: Optional[int] = None
+    diff_filter: Optional[str] = None
+    detect_renames = True
+    # Byte ceilings for collected patches; larger ones become stat
+    # summaries (None for no limit)
+    max_diff_file_bytes: Optional[int] = 1 << 20
+    max_diff_total_bytes: Optional[int] = 16 << 20
+
     def __init__(self, repo_path: str):
-        """Initialize GitService with repository path."""
-        self.repo_path = repo_path
-        if not os.path.exists(os.path.join(repo_path, ".git")):
-            raise ValueError(f"Not a git repository: {repo_path}")
+        """Initialize GitService with repository path.
+
+        Args:
+            repo_path: Any directory inside the working tree; git commands
+                run from its top level
+
+        Raises:
+            ValueError: If repo_path is not inside a git working tree
+        """
+        self.repo_path = get_repo_context(repo_path).toplevel
+
+    @property
+    def context(self) -> RepoContext:
+        """Cached top level, git directories, branch and shallowness."""
+        return get_repo_context(self.repo_path)
+
+    def to_repo_paths(self, paths: List[str], cwd: Optional[str] = None) -> List[str]:
+        """Convert paths given relative to cwd into top-level relative paths.
+
+        Args:
+            paths: Paths as typed by the user
+            cwd: Directory they are relative to, the process cwd by default
+        """
+        base = cwd or os.getcwd()
+        return [
+            Path(os.path.relpath(os.path.join(base, path), self.repo_path)).as_posix()
+            for path in paths
+        ]
+
+    @property
+    def object_reader(self) -> GitObjectReader:
+        """Persistent ``git cat-file`` reader, started on first use."""
+        if getattr(self, "_object_reader", None) is None:
+            self._object_reader = GitObjectReader(self.repo_path)
+        return self._object_reader
+
+    def close(self) -> None:
+        """Stop any long-lived git co-processes and release mapped files."""
+        if getattr(self, "_object_reader", None) is not None:
+            self._object_reader.close()
+            self._object_reader = None
+        if getattr(self, "_object_store", None) is not None:
+            self._object_store.close()
+            self._object_store = None
+
+    def read_objects(self, revs: List[str]) -> Dict[str, Optional[GitObject]]:
+        """Read many objects (blobs, commits, ``HEAD:path`` ...) in one round trip."""
+        return dict(self.object_reader.read_many(revs))
+
+    def read_blob(self, rev: str) -> Optional[bytes]:
+        """Read the contents of a blob, e.g. ``HEAD:path`` or ``:path`` for the index."""
+        obj = self.object_reader.read(rev)
+        return obj.data if obj else None
+
+    def get_commits(self, revs: List[str]) -> List[CommitRecord]:
+        """Get metadata of many commits from the object reader.
+
+        Returns:
+            List of commit records with hash, author, date and message,
+            in the same shape as get_commit_history; missing revs are skipped
+        """
+        commits = []
+        for _, obj in self.object_reader.read_many(revs):
+            if obj is None or obj.type != "commit":
+                continue
+            commits.append(self._parse_commit_object(obj))
+        return commits
+
+    @staticmethod
+    def _parse_commit_object(obj: GitObject) -> CommitRecord:
+        headers, _, message = obj.data.partition(b"\n\n")
+        author, seconds, tz = "", 0, "+0000"
+        for line in headers.split(b"\n"):
+            if line.startswith(b"author "):
+                # author Name <email> 1700000000 +0100
+                text = line[len(b"author ") :].decode("utf-8", errors="replace")
+                ident, _, stamp = text.rpartition("> ")
+                author = ident.split(" <")[0]
+                stamp_seconds, _, tz = stamp.partition(" ")
+                seconds = int(stamp_seconds or 0)
+                break
+        return CommitRecord(obj.sha, message.strip(), author=author, time=seconds, tz=tz or "+0000")
 
     def _is_git_repo(self) -> bool:
         """Check if the current directory is a git repository."""
@@ -31,44 +302,498 @@ class GitService:
         except subprocess.CalledProcessError:
             return False
 
+    def _run_git_bytes(
+        self,
+        args: List[str],
+        input: Optional[bytes] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> Tuple[bytes, bytes, int]:
+        """Run a git command and return its raw stdout, stderr and return code.
+
+        Output is not decoded, so binary or non-UTF-8 content (diffs of
+        latin-1 files, odd path names) can't make the command fail.
+
+        Args:
+            args: git arguments
+            input: Bytes written to git's stdin
+            env: Extra environment variables, e.g. GIT_INDEX_FILE
+        """
+        result = subprocess.run(
+            ["git"] + args,
+            cwd=self.repo_path,
+            input=input,
+            capture_output=True,
+            env={**os.environ, **env} if env else None,
+        )
+        return result.stdout, result.stderr, result.returncode
+
+    @staticmethod
+    def _decode(data: bytes) -> str:
+        """Decode git output, replacing bytes that are not valid UTF-8."""
+        return data.decode("utf-8", errors="replace")
+
     def _run_git_command(self, args: List[str]) -> Tuple[str, str, int]:
         """Run a git command and return its output and return code."""
-        try:
-            result = subprocess.run(
+        stdout, stderr, returncode = self._run_git_bytes(args)
+        return self._decode(stdout.strip()), self._decode(stderr.strip()), returncode
+
+    def _stream_git_command(
+        self, args: List[str], check: bool = False, chunk_size: int = 65536
+    ) -> Iterator[bytes]:
+        """Run a git command and yield its stdout in raw chunks.
+
+        Memory stays bounded by chunk_size no matter how large the output
+        is. If the caller stops early, git is terminated. stderr goes to a
+        temporary file, so git can't block on a full pipe while stdout is
+        being read.
+
+        Raises:
+            subprocess.CalledProcessError: If check is set and git fails;
+                its stderr holds git's error output
+        """
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(
                 ["git"] + args,
                 cwd=self.repo_path,
-                check=True,
-                capture_output=True,
-                text=True,
+                stdout=subprocess.PIPE,
+                stderr=stderr,
             )
-            return result.stdout.strip(), result.stderr.strip(), result.returncode
-        except subprocess.CalledProcessError as e:
-            return e.stdout.strip(), e.stderr.strip(), e.returncode
+            try:
+                yield from iter(lambda: process.stdout.read(chunk_size), b"")
+                if check and process.wait() != 0:
+                    stderr.seek(0)
+                    raise subprocess.CalledProcessError(
+                        process.returncode, ["git"] + args, stderr=stderr.read()
+                    )
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                process.stdout.close()
+                process.wait()
+
+    async def _run_git_async(
+        self,
+        args: List[str],
+        semaphore: asyncio.Semaphore,
+        max_output_bytes: Optional[int] = None,
+        chunk_size: int = 65536,
+    ) -> GitQueryResult:
+        async with semaphore:
+            process = await asyncio.create_subprocess_exec(
+                "git",
+                *args,
+                cwd=self.repo_path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            if max_output_bytes is None:
+                stdout, stderr = await process.communicate()
+                return GitQueryResult(stdout, stderr, process.returncode, False)
+            # Drain stderr alongside stdout so git can't block on either pipe
+            stderr_task = asyncio.ensure_future(process.stderr.read())
+            chunks: List[bytes] = []
+            size = 0
+            truncated = False
+            while True:
+                chunk = await process.stdout.read(chunk_size)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > max_output_bytes:
+                    truncated = True
+                    process.kill()
+                    break
+            stderr = await stderr_task
+            await process.wait()
+            stdout = b"".join(chunks)[:max_output_bytes] if truncated else b"".join(chunks)
+            return GitQueryResult(stdout, stderr, process.returncode, truncated)
+
+    def run_git_queries(
+        self,
+        queries: Dict[str, List[str]],
+        max_output_bytes: Optional[int] = None,
+    ) -> Dict[str, GitQueryResult]:
+        """Run independent git commands concurrently.
+
+        At most ``git_concurrency`` processes run at once, so the total
+        latency is roughly that of the slowest command rather than the sum.
+
+        Args:
+            queries: Mapping of name to git arguments
+            max_output_bytes: Stop a command once its stdout exceeds this
+                many bytes and keep only that much, None for no limit
+
+        Returns:
+            Mapping of name to its result
+        """
+
+        async def run_all() -> Dict[str, GitQueryResult]:
+            semaphore = asyncio.Semaphore(max(1, int(self.git_concurrency)))
+            results = await asyncio.gather(
+                *(
+                    self._run_git_async(args, semaphore, max_output_bytes)
+                    for args in queries.values()
+                )
+            )
+            return dict(zip(queries, results))
+
+        return asyncio.run(run_all())
+
+    def _status_args(self) -> List[str]:
+        return self._scan_options() + [
+            "status",
+            "--porcelain=v2",
+            "-z",
+            "--branch",
+            "--untracked-files=all",
+        ]
+
+    def get_status_snapshot(self) -> StatusSnapshot:
+        """Gather branch and changed files from one ``git status`` call.
+
+        ``git status --porcelain=v2 -z`` reports staged, unstaged, renamed,
+        unmerged and untracked paths together; the repository name comes
+        from the cached repository context. With native_index the snapshot
+        is built from the index instead when it can answer exactly.
+
+        Raises:
+            Exception: If git status fails
+        """
+        snapshot = self._native_status_snapshot()
+        if snapshot is not None:
+            return snapshot
+        stdout, stderr, returncode = self._run_git_bytes(self._status_args())
+        if returncode != 0:
+            raise Exception(f"Failed to get status: {self._decode(stderr.strip())}")
+        return self._parse_status(stdout)
+
+    def get_status_with_diffs(self) -> Tuple[StatusSnapshot, StatusDiffs]:
+        """Gather the status snapshot and both diffs with concurrent git calls.
+
+        ``git status`` (unless the native index answers), the staged diff
+        and the unstaged diff are independent, so they run together through
+        run_git_queries. Each diff's output is capped at
+        max_diff_total_bytes; the file cut off by the cap and any after it
+        are left out.
+
+        Raises:
+            Exception: If git status or git diff fails
+        """
+        queries = {
+            "staged": self._diff_args(staged=True),
+            "unstaged": self._diff_args(staged=False),
+        }
+        snapshot = self._native_status_snapshot()
+        if snapshot is None:
+            queries["status"] = self._status_args()
+        results = self.run_git_queries(queries, max_output_bytes=self.max_diff_total_bytes)
+
+        if snapshot is None:
+            status = results["status"]
+            if status.returncode != 0 or status.truncated:
+                raise Exception(f"Failed to get status: {self._decode(status.stderr.strip())}")
+            snapshot = self._parse_status(status.stdout)
+
+        diffs: Dict[str, List[FileDiff]] = {}
+        for name in ("staged", "unstaged"):
+            result = results[name]
+            if result.returncode != 0 and not result.truncated:
+                raise Exception(f"Failed to get diff: {self._decode(result.stderr.strip())}")
+            files = list(
+                DiffSet.iter_stream([result.stdout], max_file_bytes=self.max_diff_file_bytes)
+            )
+            # The last patch may be incomplete
+            diffs[name] = files[:-1] if result.truncated else files
+        truncated = results["staged"].truncated or results["unstaged"].truncated
+        return snapshot, StatusDiffs(diffs["staged"], diffs["unstaged"], truncated)
+
+    def _parse_status(self, stdout: bytes) -> StatusSnapshot:
+        """Build a snapshot from ``git status --porcelain=v2 -z --branch`` output."""
+        branch = ""
+        staged: List[Tuple[str, str]] = []
+        unstaged: List[Tuple[str, str]] = []
+        renames: Dict[str, str] = {}
+        tokens = iter(stdout.split(b"\0"))
+        for token in tokens:
+            if not token:
+                continue
+            kind = token[:1]
+            if kind == b"#":
+                if token.startswith(b"# branch.head "):
+                    branch = self._decode(token[len(b"# branch.head ") :])
+                continue
+            if kind in (b"?", b"!"):
+                if kind == b"?":
+                    unstaged.append(("??", os.fsdecode(token[2:])))
+                continue
+            # "1 XY ... path", "2 XY ... score path" + original path as the
+            # next field, "u XY ... path"
+            fields = token.split(b" ", {b"1": 8, b"2": 9, b"u": 10}.get(kind, 8))
+            code = self._decode(fields[1])
+            path = os.fsdecode(fields[-1])
+            if kind == b"2":
+                renames[path] = os.fsdecode(next(tokens, b""))
+            if kind == b"u" or code[0] != ".":
+                staged.append((code, path))
+            if kind == b"u" or code[1] != ".":
+                unstaged.append((code, path))
+
+        return StatusSnapshot(
+            repo_name=Path(self.repo_path).name,
+            # Detached HEAD, like `git rev-parse --abbrev-ref HEAD`
+            branch="HEAD" if branch == "(detached)" else branch,
+            staged_files=staged,
+            unstaged_files=unstaged,
+            renames=renames,
+        )
+
+    def _native_status_snapshot(self) -> Optional[StatusSnapshot]:
+        """Build the status snapshot from the index when native_index is enabled.
+
+        Returns:
+            The snapshot, or None if the index can't answer like ``git
+            status`` would (disabled, unsupported, possible renames or
+            merge conflicts)
+        """
+        status = self._index_status()
+        if status is None:
+            return None
+        try:
+            staged = dict((path, letter) for letter, path in status.staged_changes())
+            modified = dict((path, letter) for letter, path in status.modified_changes())
+        except (UnsupportedRepositoryError, KeyError, ValueError, OSError, zlib.error):
+            return None
+        if "U" in staged.values():
+            return None
+
+        staged_files: List[Tuple[str, str]] = []
+        unstaged_files: List[Tuple[str, str]] = []
+        for path in sorted(set(staged) | set(modified), key=os.fsencode):
+            # Porcelain v2 codes, "." for an unchanged side
+            code = staged.get(path, ".") + modified.get(path, ".")
+            if path in staged:
+                staged_files.append((code, path))
+            if path in modified:
+                unstaged_files.append((code, path))
+        unstaged_files.extend(("??", path) for path in self._untracked_files(status))
+
+        return StatusSnapshot(
+            repo_name=Path(self.repo_path).name,
+            branch=self.context.branch,
+            staged_files=staged_files,
+            unstaged_files=unstaged_files,
+            renames={},
+        )
+
+    def _untracked_files(self, status: IndexStatus) -> List[str]:
+        """List untracked files from the untracked cache, or through git.
+
+        The untracked cache collapses untracked directories; their files are
+        listed through git to keep ``ls-files`` semantics.
+        """
+        try:
+            untracked = status.untracked_files()
+        except (UnsupportedRepositoryError, OSError, ValueError, IndexError):
+            untracked = None
+        if untracked is None or any(path.endswith("/") for path in untracked):
+            stdout, _, _ = self._run_git_command(["ls-files", "--others", "--exclude-standard"])
+            untracked = stdout.splitlines() if stdout else []
+        return untracked
+
+    def _index_status(self) -> Optional[IndexStatus]:
+        """Load the index natively when native_index is enabled.
+
+        Returns:
+            The parsed index, or None if it is disabled or unsupported
+        """
+        if not self.native_index:
+            return None
+        try:
+            if getattr(self, "_object_store", None) is None:
+                self._object_store = ObjectStore(self.repo_path)
+            return IndexStatus(self.repo_path, self._object_store)
+        except (UnsupportedRepositoryError, ValueError, OSError, IndexError):
+            return None
 
     def get_staged_files(self) -> List[str]:
         """Get list of staged files."""
+        status = self._index_status()
+        if status is not None:
+            try:
+                return status.staged_files()
+            except (UnsupportedRepositoryError, KeyError, ValueError, OSError, zlib.error):
+                pass
         stdout, _, _ = self._run_git_command(["diff", "--cached", "--name-only"])
         return stdout.splitlines() if stdout else []
 
     def get_unstaged_files(self) -> List[str]:
         """Get list of unstaged files."""
+        status = self._index_status()
+        if status is not None:
+            try:
+                modified = status.modified_files()
+            except (UnsupportedRepositoryError, OSError):
+                modified = None
+            if modified is not None:
+                return sorted(modified + self._untracked_files(status))
         stdout, _, _ = self._run_git_command(
             ["ls-files", "--modified", "--others", "--exclude-standard"]
         )
         return stdout.splitlines() if stdout else []
 
+    def _diff_args(self, staged: bool, raw: bool = True) -> List[str]:
+        """Arguments of a ``git diff`` call honouring the diff options.
+
+        Args:
+            staged: Diff the index against HEAD instead of the worktree
+                against the index
+            raw: Add ``-z --patch-with-raw`` for parsing
+        """
+        args = []
+        if self.rename_limit is not None:
+            args += ["-c", f"diff.renameLimit={int(self.rename_limit)}"]
+        args.append("diff")
+        if raw:
+            # Full blob ids in the raw section
+            args += ["-z", "--patch-with-raw", "--no-abbrev"]
+        if self.diff_algorithm:
+            args.append(f"--diff-algorithm={self.diff_algorithm}")
+        if self.diff_context is not None:
+            args.append(f"-U{int(self.diff_context)}")
+        if self.diff_filter:
+            args.append(f"--diff-filter={self.diff_filter}")
+        if not self.detect_renames:
+            args.append("--no-renames")
+        if staged:
+            args.append("--cached")
+        return args
+
     def get_diff(self, file_path: str, staged: bool = True) -> str:
         """Get diff for a specific file."""
-        args = ["diff", "--cached" if staged else ""]
+        args = self._diff_args(staged, raw=False)
         if file_path:
-            args.append(file_path)
+            args.extend(["--", file_path])
         stdout, _, _ = self._run_git_command(args)
         return stdout
 
-    def get_all_diffs(self, staged: bool = True) -> Dict[str, str]:
-        """Get diffs for all changed files."""
-        files = self.get_staged_files() if staged else self.get_unstaged_files()
-        return {file: self.get_diff(file, staged) for file in files}
+    def iter_file_diffs(self, staged: bool = True) -> Iterator[Tuple[str, str]]:
+        """Stream (path, diff) pairs from a single ``git diff`` invocation.
+
+        Paths come from the NUL-delimited raw section that ``-z
+        --patch-with-raw`` prints before the patches, so they never need to
+        be parsed out of (possibly quoted) ``diff --git`` headers. Patches
+        larger than max_diff_file_bytes are replaced by stat summaries.
+        """
+        chunks = self._stream_git_command(self._diff_args(staged))
+        try:
+            for file in DiffSet.iter_stream(chunks, max_file_bytes=self.max_diff_file_bytes):
+                yield file.path, file.text
+        finally:
+            chunks.close()
+
+    def get_diff_set(self, staged: bool = True) -> DiffSet:
+        """Get all changed files as a parsed DiffSet from one ``git diff`` call.
+
+        The output is streamed: patches over max_diff_file_bytes, and all
+        patches once max_diff_total_bytes have been kept, are reduced to
+        their header and line counts while parsing.
+
+        Raises:
+            Exception: If git diff fails
+        """
+        try:
+            return DiffSet.parse_stream(
+                self._stream_git_command(self._diff_args(staged), check=True),
+                max_file_bytes=self.max_diff_file_bytes,
+                max_total_bytes=self.max_diff_total_bytes,
+            )
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"Failed to get diff: {self._decode(e.stderr.strip()) or str(e)}")
+
+    def classify_paths(self, paths: List[str]) -> Dict[str, str]:
+        """Find paths whose diffs are noise for commit messages.
+
+        Attributes of all paths are read in one ``git check-attr -z
+        --stdin`` call: ``linguist-generated`` and ``linguist-vendored``
+        mark generated and vendored files, ``binary`` or ``-diff`` mark
+        binary ones. Built-in lockfile and generated-file patterns apply
+        on top of that.
+
+        Returns:
+            Mapping of noisy path to reason (generated, vendored, lock
+            or binary); other paths are left out
+        """
+        reasons: Dict[str, str] = {}
+        for path in paths:
+            name = os.path.basename(path)
+            if name in LOCKFILE_NAMES:
+                reasons[path] = "lock"
+            elif any(fnmatch.fnmatch(name, pattern) for pattern in GENERATED_PATTERNS):
+                reasons[path] = "generated"
+        if not paths:
+            return reasons
+
+        stdout, _, returncode = self._run_git_bytes(
+            [
+                "check-attr",
+                "-z",
+                "--stdin",
+                "linguist-generated",
+                "linguist-vendored",
+                "diff",
+                "binary",
+            ],
+            input=b"".join(os.fsencode(path) + b"\0" for path in paths),
+        )
+        if returncode != 0:
+            return reasons
+        fields = stdout.split(b"\0")
+        for i in range(0, len(fields) - 2, 3):
+            path, attribute, value = (os.fsdecode(field) for field in fields[i : i + 3])
+            if path in reasons:
+                continue
+            if attribute in ("linguist-generated", "linguist-vendored") and value in ("set", "true"):
+                reasons[path] = attribute[len("linguist-") :]
+            elif (attribute == "binary" and value == "set") or (
+                attribute == "diff" and value == "unset"
+            ):
+                reasons[path] = "binary"
+        return reasons
+
+    def get_all_diffs(
+        self,
+        staged: bool = True,
+        diff_set: Optional[DiffSet] = None,
+        summarize: bool = False,
+    ) -> Dict[str, str]:
+        """Get diffs for all changed files.
+
+        Args:
+            staged: Diff the index against HEAD instead of the worktree
+                against the index
+            diff_set: Already parsed diff to reuse instead of running git
+            summarize: Replace patches of generated, vendored, lock and
+                binary files with one-line stat summaries
+        """
+        if diff_set is None:
+            diff_set = self.get_diff_set(staged)
+        if summarize:
+            reasons = self.classify_paths(diff_set.paths)
+            diffs = {
+                file.path: (
+                    file.summary(reasons.get(file.path, "binary"))
+                    if file.binary or file.path in reasons
+                    else file.text
+                )
+                for file in diff_set
+            }
+        else:
+            diffs = diff_set.as_dict()
+        if staged:
+            return diffs
+        # Untracked files have no diff against the index
+        return {file: diffs.get(file, "") for file in self.get_unstaged_files()}
 
     def commit(self, message: str, sign: bool = False, no_verify: bool = False) -> bool:
         """Create a commit with the given message."""
@@ -138,15 +863,236 @@ class GitService:
         stdout, stderr, returncode = self._run_git_command(args)
         return returncode == 0, stdout, stderr, returncode
 
+    @staticmethod
+    def _clean_message(message: str) -> str:
+        """Tidy a message the way ``git commit -m`` does.
+
+        Trailing whitespace is stripped from every line, runs of blank lines
+        are collapsed and leading/trailing blank lines are removed.
+        """
+        lines = [line.rstrip() for line in message.splitlines()]
+        cleaned: List[str] = []
+        for line in lines:
+            if line or (cleaned and cleaned[-1]):
+                cleaned.append(line)
+        while cleaned and not cleaned[-1]:
+            cleaned.pop()
+        return "\n".join(cleaned) + "\n" if cleaned else ""
+
+    def _run_hook(
+        self,
+        name: str,
+        args: Optional[List[str]] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Run a git hook if it is installed.
+
+        Uses ``git hook run`` on git 2.36+ and executes the hook from the
+        hooks directory (honouring core.hooksPath) otherwise.
+
+        Args:
+            name: Hook name, e.g. ``"pre-commit"``
+            args: Arguments passed to the hook
+            env: Extra environment variables, e.g. GIT_INDEX_FILE
+
+        Raises:
+            Exception: If the hook rejects the commit
+        """
+        args = args or []
+        if self._git_version() >= (2, 36):
+            out, err, returncode = self._run_git_bytes(
+                ["hook", "run", "--ignore-missing", name, "--"] + args, env=env
+            )
+            stdout, stderr = self._decode(out), self._decode(err)
+        else:
+            hook_path, _, _ = self._run_git_command(["rev-parse", "--git-path", f"hooks/{name}"])
+            hook_path = os.path.join(self.repo_path, hook_path)
+            if not os.access(hook_path, os.X_OK):
+                return
+            result = subprocess.run(
+                [hook_path] + args,
+                cwd=self.repo_path,
+                capture_output=True,
+                text=True,
+                env={**os.environ, **env} if env else None,
+            )
+            stdout, stderr, returncode = result.stdout, result.stderr, result.returncode
+        if returncode != 0:
+            details = (stderr or stdout).strip() or f"exit code {returncode}"
+            raise Exception(f"{name} hook failed: {details}")
+
+    def commit_files(
+        self,
+        messages: Dict[str, str],
+        sign: bool = False,
+        no_verify: bool = False,
+    ) -> List[str]:
+        """Commit each staged file separately, with its own message.
+
+        The commits are built with plumbing: a temporary index starts at
+        HEAD, each file's staged entry is copied into it with
+        ``update-index`` and ``write-tree``/``commit-tree`` create the
+        commit. HEAD is moved once with ``update-ref`` at the end, so the
+        real index is never locked or refreshed per file. The pre-commit
+        hook runs once for the whole batch; prepare-commit-msg (even with
+        no_verify, like ``git commit --no-verify``) and commit-msg run once
+        per message against the commit's temporary index, and post-commit
+        once at the end.
+
+        Args:
+            messages: Mapping of file path (relative to the top level) to
+                commit message, in commit order
+            sign: Sign the commits with GPG
+            no_verify: Skip the pre-commit and commit-msg hooks
+
+        Returns:
+            Hashes of the created commits, oldest first
+
+        Raises:
+            Exception: If a hook rejects the commits or git fails
+        """
+        if not messages:
+            return []
+
+        def git(
+            args: List[str],
+            input: Optional[bytes] = None,
+            env: Optional[Dict[str, str]] = None,
+        ) -> str:
+            stdout, stderr, returncode = self._run_git_bytes(args, input=input, env=env)
+            if returncode != 0:
+                raise Exception(
+                    f"git {args[0]} failed: {self._decode(stderr.strip()) or returncode}"
+                )
+            return self._decode(stdout.strip())
+
+        if not no_verify:
+            self._run_hook("pre-commit")
+
+        # Staged entries of the files, read after pre-commit may have
+        # re-staged them; files missing from the index are deletions
+        output, _, _ = self._run_git_bytes(
+            ["ls-files", "--stage", "-z", "--full-name", "--"]
+            + [f":(top,literal){path}" for path in messages]
+        )
+        entries: Dict[str, bytes] = {}
+        for record in output.split(b"\0"):
+            if not record:
+                continue
+            info, path = record.split(b"\t", 1)
+            if info.split()[2] != b"0":
+                raise Exception(f"Cannot commit unmerged path: {os.fsdecode(path)}")
+            entries[os.fsdecode(path)] = info.split()[0] + b" " + info.split()[1]
+
+        git_dir = self.context.git_dir
+        head_stdout, _, head_code = self._run_git_command(["rev-parse", "--verify", "--quiet", "HEAD"])
+        old_head = head_stdout if head_code == 0 else ""
+        index_file = os.path.abspath(os.path.join(git_dir, f"devtools-index-{os.getpid()}"))
+        env = {"GIT_INDEX_FILE": index_file}
+
+        commits: List[str] = []
+        last_message = ""
+        try:
+            git(["read-tree", old_head] if old_head else ["read-tree", "--empty"], env=env)
+            parent = old_head
+            parent_tree = git(["rev-parse", f"{parent}^{{tree}}"]) if parent else ""
+            for path, message in messages.items():
+                if path in entries:
+                    git(
+                        ["update-index", "-z", "--index-info"],
+                        input=entries[path] + b"\t" + os.fsencode(path) + b"\0",
+                        env=env,
+                    )
+                else:
+                    git(["update-index", "--force-remove", "--", path], env=env)
+                tree = git(["write-tree"], env=env)
+                if tree == parent_tree:
+                    # Nothing staged for this file
+                    continue
+
+                # Like `git commit -m`: prepare-commit-msg gets the "message"
+                # source, then commit-msg may rewrite or reject the result
+                message_file = os.path.join(git_dir, "COMMIT_EDITMSG")
+                with open(message_file, "w", encoding="utf-8") as f:
+                    f.write(self._clean_message(message))
+                self._run_hook("prepare-commit-msg", [message_file, "message"], env=env)
+                if not no_verify:
+                    self._run_hook("commit-msg", [message_file], env=env)
+                with open(message_file, encoding="utf-8") as f:
+                    message = self._clean_message(f.read())
+                if not message:
+                    raise Exception(f"Empty commit message for {path}")
+
+                args = ["commit-tree", tree]
+                if parent:
+                    args.extend(["-p", parent])
+                if sign:
+                    args.append("-S")
+                parent = git(args, input=message.encode("utf-8"))
+                parent_tree = tree
+                commits.append(parent)
+                last_message = message
+        finally:
+            if os.path.exists(index_file):
+                os.remove(index_file)
+
+        if commits:
+            # Fails if HEAD moved while the commits were being built
+            git(
+                [
+                    "update-ref",
+                    "-m",
+                    f"commit: {self._subject(last_message)}",
+                    "HEAD",
+                    parent,
+                    old_head,
+                ]
+            )
+            self._run_hook("post-commit")
+        return commits
+
+    def data_path(self, name: str) -> str:
+        """Path of a devtools data file kept under ``<git-dir>/devtools/``."""
+        directory = os.path.join(self.context.git_dir, "devtools")
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, name)
+
+    def write_tree(self) -> Optional[str]:
+        """Write the index as a tree and return its hash.
+
+        The hash identifies the exact staged content. Returns None if the
+        index can't be written as a tree, e.g. with unresolved conflicts.
+        """
+        stdout, _, returncode = self._run_git_command(["write-tree"])
+        return stdout if returncode == 0 and stdout else None
+
+    def write_tree_and_head(self) -> Tuple[Optional[str], str]:
+        """Write the index as a tree and resolve HEAD with concurrent git calls.
+
+        Returns:
+            (tree hash or None like write_tree, HEAD commit or "" on an
+            unborn branch)
+        """
+        results = self.run_git_queries(
+            {
+                "tree": ["write-tree"],
+                "head": ["rev-parse", "--verify", "--quiet", "HEAD"],
+            }
+        )
+        tree = self._decode(results["tree"].stdout.strip())
+        head = self._decode(results["head"].stdout.strip())
+        return (
+            tree if results["tree"].returncode == 0 and tree else None,
+            head if results["head"].returncode == 0 else "",
+        )
+
     def get_repo_name(self) -> str:
         """Get the repository name."""
-        stdout, _, _ = self._run_git_command(["rev-parse", "--show-toplevel"])
-        return Path(stdout).name
+        return Path(self.repo_path).name
 
     def get_current_branch(self) -> str:
         """Get the current branch name."""
-        stdout, _, _ = self._run_git_command(["rev-parse", "--abbrev-ref", "HEAD"])
-        return stdout
+        return self.context.branch
 
     def push(self, branch: Optional[str] = None) -> bool:
         """Push changes to remote."""
@@ -162,37 +1108,13 @@ class GitService:
 
             if files:
                 for file in files:
-                    result = subprocess.run(
-                        ["git", "diff", "--staged", "--", file],
-                        cwd=self.repo_path,
-                        capture_output=True,
-                        text=True,
+                    stdout, _, _ = self._run_git_bytes(
+                        self._diff_args(staged=True, raw=False) + ["--", file]
                     )
-                    if result.stdout:
-                        diffs[file] = result.stdout
+                    if stdout:
+                        diffs[file] = self._decode(stdout)
             else:
-                result = subprocess.run(
-                    ["git", "diff", "--staged"],
-                    cwd=self.repo_path,
-                    capture_output=True,
-                    text=True,
-                )
-                if result.stdout:
-                    # Parse the diff to get individual file changes
-                    current_file = None
-                    current_diff = []
-
-                    for line in result.stdout.split("\n"):
-                        if line.startswith("diff --git"):
-                            if current_file and current_diff:
-                                diffs[current_file] = "\n".join(current_diff)
-                            current_file = line.split("b/")[-1].strip()
-                            current_diff = [line]
-                        elif current_file:
-                            current_diff.append(line)
-
-                    if current_file and current_diff:
-                        diffs[current_file] = "\n".join(current_diff)
+                diffs = self.get_diff_set(staged=True).as_dict()
 
             return diffs
         except subprocess.CalledProcessError as e:
@@ -205,90 +1127,252 @@ class GitService:
         except subprocess.CalledProcessError as e:
             raise Exception(f"Failed to stage changes: {str(e)}")
 
-    def get_commit_history(
+    def _git_version(self) -> Tuple[int, ...]:
+        """Version of the git executable, e.g. (2, 43, 0)."""
+        if getattr(self, "_version", None) is None:
+            stdout, _, _ = self._run_git_command(["--version"])
+            match = re.search(r"(\d+)\.(\d+)(?:\.(\d+))?", stdout)
+            self._version = tuple(int(part or 0) for part in match.groups()) if match else ()
+        return self._version
+
+    def _scan_options(self) -> List[str]:
+        """``-c`` options that speed up commands scanning the worktree.
+
+        The untracked cache lets git skip directories whose mtime did not
+        change. The builtin fsmonitor daemon (git 2.36+, macOS and Windows
+        only) answers which files changed without scanning at all. Both
+        change state in the repository (the index extension, a background
+        daemon), so they are only forced on when asked for; git uses them
+        anyway where the repository enables them.
+        """
+        options = []
+        if self.force_untracked_cache:
+            options += ["-c", "core.untrackedCache=true"]
+        if (
+            self.force_fsmonitor
+            and sys.platform in ("darwin", "win32")
+            and self._git_version() >= (2, 36)
+        ):
+            options += ["-c", "core.fsmonitor=true"]
+        return options
+
+    def stage_changes(self, pathspecs: Optional[List[str]] = None) -> Tuple[int, float]:
+        """Stage the given pathspecs, or every change in the worktree.
+
+        Without pathspecs this is a single ``git add -A``: one worktree scan,
+        helped by the untracked cache and fsmonitor where enabled. Pathspecs
+        are passed through ``--pathspec-from-file``, so long lists never hit
+        the command line length limit.
+
+        Args:
+            pathspecs: Paths to stage, relative to the repository path
+
+        Returns:
+            Number of pathspecs given, or of paths git staged when there
+            were none, and the elapsed time in seconds
+
+        Raises:
+            Exception: If staging fails
+        """
+        started = time.monotonic()
+        if pathspecs:
+            _, stderr, returncode = self._run_git_bytes(
+                self._scan_options()
+                + ["add", "--all", "--pathspec-from-file=-", "--pathspec-file-nul"],
+                input=b"\0".join(os.fsencode(spec) for spec in pathspecs),
+            )
+            count = len(pathspecs)
+        else:
+            # --verbose prints one "add '<path>'"/"remove '<path>'" line per change
+            stdout, stderr, returncode = self._run_git_bytes(
+                self._scan_options() + ["add", "--all", "--verbose"]
+            )
+            count = len(stdout.splitlines())
+        if returncode != 0:
+            raise Exception(f"Failed to stage changes: {self._decode(stderr.strip())}")
+        return count, time.monotonic() - started
+
+    def _native_log(
+        self,
+        exclude: Optional[str] = None,
+        since: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Optional[Iterator[Dict]]:
+        """Walk history from HEAD in-process when native_history is enabled.
+
+        Returns:
+            Parsed commits (with a "hash" key added) as they are walked, or
+            None if the native reader is disabled or can't open the
+            repository, in which case callers fall back to `git log`. The
+            iterator raises one of _NATIVE_ERRORS if it hits something it
+            doesn't support part way.
+        """
+        if not self.native_history:
+            return None
+        try:
+            if getattr(self, "_object_store", None) is None:
+                self._object_store = ObjectStore(self.repo_path)
+            store = self._object_store
+            include = [store.resolve("HEAD")]
+            excluded = [store.resolve(exclude)] if exclude else []
+        except _NATIVE_ERRORS:
+            return None
+
+        def commits() -> Iterator[Dict]:
+            for count, sha in enumerate(store.walk(include, excluded, since)):
+                if limit is not None and count >= limit:
+                    return
+                yield dict(store.commit(sha), hash=sha.hex())
+
+        return commits()
+
+    @staticmethod
+    def _subject(message: str) -> str:
+        """Get the subject of a commit message like `git log --format=%s`."""
+        return " ".join(message.strip().split("\n\n", 1)[0].split("\n")).strip()
+
+    def _iter_log_bytes(self, args: List[str], check: bool = False) -> Iterator[bytes]:
+        """Stream undecoded NUL-delimited records from ``git log -z``.
+
+        Output is read in chunks, so memory stays bounded by the largest
+        record. If the caller stops early, git is terminated.
+
+        Raises:
+            subprocess.CalledProcessError: If check is set and git fails
+        """
+        chunks = self._stream_git_command(["log", "-z", *args], check=check)
+        try:
+            buffer = b""
+            for chunk in chunks:
+                buffer += chunk
+                *records, buffer = buffer.split(b"\0")
+                yield from records
+            if buffer:
+                yield buffer
+        finally:
+            chunks.close()
+
+    def _iter_log(self, args: List[str], check: bool = False) -> Iterator[str]:
+        """Stream decoded NUL-delimited records from ``git log -z``."""
+        for record in self._iter_log_bytes(args, check=check):
+            yield record.decode("utf-8", errors="replace")
+
+    def iter_commit_history(
         self, since: Optional[str] = None, limit: Optional[int] = None
-    ) -> List[Dict[str, str]]:
-        """Get commit history.
+    ) -> Iterator[CommitRecord]:
+        """Iterate over commit history, newest first.
+
+        Commits are yielded as they are read, so callers can stop early
+        (e.g. at the first commit matching a tag) without reading the rest.
 
         Args:
             since: Get commits since this reference (tag, commit, etc.)
             limit: Maximum number of commits to return
         """
-        args = [
-            "log",
-            "--pretty=format:%H%n%an%n%ad%n%B%n==END==",
-            "--date=format:%Y-%m-%d %H:%M:%S %z",
-        ]
+        native = self._native_log(exclude=since, limit=limit)
+        skip = 0
+        if native is not None:
+            try:
+                for commit in native:
+                    yield CommitRecord(
+                        commit["hash"],
+                        commit["message"],
+                        author=commit["author"],
+                        time=commit["author_time"],
+                        tz=commit["author_tz"],
+                    )
+                    skip += 1
+                return
+            except _NATIVE_ERRORS:
+                # The walk follows git log's order: continue after what was yielded
+                pass
+
+        args = ["--pretty=format:%H%n%an%n%at%n%ad%n%B", "--date=format:%z"]
 
         if since:
             args.append(f"{since}..HEAD")
         if limit:
-            args.append(f"-n {limit}")
+            args.append(f"-n {limit - skip}")
+        if skip:
+            args.append(f"--skip={skip}")
 
-        stdout, _, _ = self._run_git_command(args)
+        for record in self._iter_log_bytes(args):
+            commit_hash, author, seconds, tz, message = (record.split(b"\n", 4) + [b""] * 4)[:5]
+            yield CommitRecord(
+                commit_hash.decode("ascii"),
+                message,
+                author=author.decode("utf-8", errors="replace"),
+                time=int(seconds or 0),
+                tz=tz.decode("ascii") or "+0000",
+            )
 
-        commits = []
-        current_commit = []
-
-        for line in stdout.split("\n"):
-            if line == "==END==":
-                if current_commit:
-                    commit_hash, author, date, *message_lines = current_commit
-                    commits.append(
-                        {
-                            "hash": commit_hash,
-                            "author": author,
-                            "date": date,
-                            "message": "\n".join(message_lines),
-                        }
-                    )
-                current_commit = []
-            else:
-                current_commit.append(line)
+    def get_commit_history(
+        self, since: Optional[str] = None, limit: Optional[int] = None
+    ) -> List[CommitRecord]:
+        """Get commit history.
 
-        return commits
+        Args:
+            since: Get commits since this reference (tag, commit, etc.)
+            limit: Maximum number of commits to return
+        """
+        return list(self.iter_commit_history(since=since, limit=limit))
 
-    def get_commits_since_tag(self, tag: str) -> List[Dict[str, str]]:
+    def get_commits_since_tag(self, tag: str) -> List[CommitRecord]:
         """Get commits since a tag.
 
         Args:
             tag: Git tag to use as reference point
 
         Returns:
-            List of commit dictionaries with hash and message
+            List of commit records with hash and message
         """
-        cmd = ["git", "log", f"{tag}..HEAD", "--pretty=format:%H|%s"]
-        result = subprocess.run(cmd, capture_output=True, text=True, cwd=self.repo_path)
-        result.check_returncode()
+        native = self._native_log(exclude=tag)
+        if native is not None:
+            try:
+                return [
+                    CommitRecord(commit["hash"], self._subject(commit["message"]), keys=SUMMARY_KEYS)
+                    for commit in native
+                ]
+            except _NATIVE_ERRORS:
+                pass
 
         commits = []
-        for line in result.stdout.splitlines():
-            hash_, message = line.split("|", 1)
-            commits.append({"hash": hash_, "message": message})
+        for record in self._iter_log_bytes([f"{tag}..HEAD", "--pretty=format:%H%n%s"], check=True):
+            hash_, _, message = record.partition(b"\n")
+            commits.append(CommitRecord(hash_.decode("ascii"), message, keys=SUMMARY_KEYS))
 
         return commits
 
-    def get_commits_since_date(self, days: int) -> List[Dict[str, str]]:
+    def get_commits_since_date(self, days: int) -> List[CommitRecord]:
         """Get commits since a date.
 
         Args:
             days: Number of days to look back
 
         Returns:
-            List of commit dictionaries with hash and message
+            List of commit records with hash and message
         """
         # Calculate date
         date = datetime.now() - timedelta(days=days)
         date_str = date.strftime("%Y-%m-%d")
 
-        # Get commits
-        cmd = ["git", "log", f"--since={date_str}", "--pretty=format:%H|%s"]
-        result = subprocess.run(cmd, capture_output=True, text=True, cwd=self.repo_path)
-        result.check_returncode()
+        # git fills in the current time of day for a date-only --since
+        native = self._native_log(since=int(date.timestamp()))
+        if native is not None:
+            try:
+                return [
+                    CommitRecord(commit["hash"], self._subject(commit["message"]), keys=SUMMARY_KEYS)
+                    for commit in native
+                ]
+            except _NATIVE_ERRORS:
+                pass
 
+        # Get commits
         commits = []
-        for line in result.stdout.splitlines():
-            hash_, message = line.split("|", 1)
-            commits.append({"hash": hash_, "message": message})
+        for record in self._iter_log_bytes(
+            [f"--since={date_str}", "--pretty=format:%H%n%s"], check=True
+        ):
+            hash_, _, message = record.partition(b"\n")
+            commits.append(CommitRecord(hash_.decode("ascii"), message, keys=SUMMARY_KEYS))
 
         return commits
@@ -0,0 +1,173 @@
+"""
+Latency and error tracking for AI providers.
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from .config import BaseConfig
+from .usage import _file_lock
+
+
+class ProviderHealth:
+    """Keep a moving latency and error profile per provider.
+
+    Latency and error rate are exponentially weighted moving averages over
+    recent calls, persisted between runs so ``provider: auto`` can pick a
+    provider before the first request of a session.
+
+    Samples are written in batches, at most every SAVE_INTERVAL seconds and
+    at exit. Each write holds a lock file and replays this process's new
+    samples onto the profiles on disk, so concurrent runs don't lose each
+    other's updates.
+    """
+
+    # Weight of the newest sample in the moving averages
+    ALPHA = 0.3
+    # Error rate above which a provider is considered unhealthy
+    MAX_ERROR_RATE = 0.5
+    # Seconds an unhealthy provider is skipped before it is retried
+    COOLDOWN = 300
+    # Minimum seconds between writes of the profile file
+    SAVE_INTERVAL = 5.0
+
+    def __init__(self, path: Path):
+        """Initialize provider health tracking.
+
+        Args:
+            path: Path to the JSON file holding the profiles
+        """
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._lock = Lock()
+        self._stats: Dict[str, Dict[str, float]] = self._load()
+        # (name, latency, ok, time) samples not written yet
+        self._pending: List[Tuple[str, float, bool, float]] = []
+        self._last_save: Optional[float] = None
+        atexit.register(self.flush)
+
+    def _load(self) -> Dict[str, Dict[str, float]]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, data: Dict[str, Dict[str, float]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def record(self, name: str, latency: float, ok: bool) -> None:
+        """Record the outcome of a call.
+
+        Args:
+            name: Provider name
+            latency: Call duration in seconds
+            ok: Whether the call succeeded
+        """
+        with self._lock:
+            sample = (name, latency, ok, time.time())
+            self._apply(self._stats, *sample)
+            self._pending.append(sample)
+            now = time.monotonic()
+            if self._last_save is None or now - self._last_save >= self.SAVE_INTERVAL:
+                self._flush()
+
+    def flush(self) -> None:
+        """Write samples recorded since the last write."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        with _file_lock(self.lock_path):
+            stats = self._load()
+            for sample in self._pending:
+                self._apply(stats, *sample)
+            self._save(stats)
+        # Pick up what other runs wrote in the meantime
+        self._stats = stats
+        self._pending = []
+        self._last_save = time.monotonic()
+
+    @classmethod
+    def _apply(
+        cls,
+        profiles: Dict[str, Dict[str, float]],
+        name: str,
+        latency: float,
+        ok: bool,
+        when: float,
+    ) -> None:
+        stats = profiles.get(name)
+        if stats is None:
+            stats = {"latency": latency, "error_rate": 0.0 if ok else 1.0}
+        else:
+            if ok:
+                # Failed calls often return fast; keep them out of latency
+                stats["latency"] += cls.ALPHA * (latency - stats["latency"])
+            stats["error_rate"] += cls.ALPHA * ((0.0 if ok else 1.0) - stats["error_rate"])
+        stats["updated"] = when
+        if not ok:
+            stats["last_failure"] = when
+        profiles[name] = stats
+
+    def get(self, name: str) -> Optional[Dict[str, float]]:
+        """Get the profile for a provider, if any calls were recorded."""
+        with self._lock:
+            stats = self._stats.get(name)
+            return dict(stats) if stats else None
+
+    def is_healthy(self, name: str) -> bool:
+        """Check whether a provider should currently receive requests."""
+        stats = self.get(name)
+        if not stats or stats["error_rate"] <= self.MAX_ERROR_RATE:
+            return True
+        return time.time() - stats.get("last_failure", 0) > self.COOLDOWN
+
+    def is_stale(self, name: str, max_age: float) -> bool:
+        """Check whether a provider has no profile newer than max_age seconds."""
+        stats = self.get(name)
+        return not stats or time.time() - stats.get("updated", 0) > max_age
+
+    def rank(self, names: List[str]) -> List[str]:
+        """Order providers from most to least preferred.
+
+        Healthy providers come first, fastest first; providers without a
+        profile are tried before known ones so they get measured.
+        """
+
+        def key(name: str):
+            stats = self.get(name)
+            latency = stats["latency"] if stats else 0.0
+            return (not self.is_healthy(name), latency)
+
+        return sorted(names, key=key)
+
+
+_default_health: Optional[ProviderHealth] = None
+_default_health_lock = Lock()
+
+
+def get_default_health(config: BaseConfig) -> ProviderHealth:
+    """Get the process-wide provider health tracker."""
+    global _default_health
+    with _default_health_lock:
+        if _default_health is None:
+            config_dir = getattr(config, "config_dir", Path.home() / ".devtools")
+            _default_health = ProviderHealth(Path(config_dir) / "provider_health.json")
+        return _default_health
@@ -0,0 +1,579 @@
+"""
+Read-only parser for the git index (``.git/index``).
+
+Supports index versions 2-4 together with the cache-tree (TREE), untracked
+cache (UNTR) and fsmonitor (FSMN) extensions, which is enough to answer
+"which paths are staged, modified or untracked" without running git.
+Anything else raises UnsupportedRepositoryError so callers can fall back
+to the git command line.
+"""
+
+import hashlib
+import os
+import stat
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from .objectstore import ObjectStore, UnsupportedRepositoryError
+
+# Stat fields (in .git/index order): ctime s/ns, mtime s/ns, dev, ino, mode,
+# uid, gid, size
+_STAT_SIZE = 40
+_ENTRY_FIXED_SIZE = 62
+
+
+def _u32(data: bytes, pos: int) -> int:
+    return int.from_bytes(data[pos : pos + 4], "big")
+
+
+def _varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Decode git's offset-style variable width integer."""
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+
+def _read_ewah(data: bytes, pos: int) -> Tuple[Set[int], int]:
+    """Decode an EWAH compressed bitmap. Returns (set bit positions, new pos)."""
+    bit_size = _u32(data, pos)
+    word_count = _u32(data, pos + 4)
+    pos += 8
+    words = [
+        int.from_bytes(data[pos + i * 8 : pos + i * 8 + 8], "big")
+        for i in range(word_count)
+    ]
+    pos += word_count * 8 + 4  # words + position of the last RLW
+    bits: Set[int] = set()
+    bit = 0
+    i = 0
+    while i < word_count:
+        marker = words[i]
+        i += 1
+        running_length = (marker >> 1) & 0xFFFFFFFF
+        if marker & 1:
+            bits.update(range(bit, bit + running_length * 64))
+        bit += running_length * 64
+        for _ in range(marker >> 33):
+            word = words[i]
+            i += 1
+            while word:
+                low = word & -word
+                bits.add(bit + low.bit_length() - 1)
+                word ^= low
+            bit += 64
+    return {b for b in bits if b < bit_size}, pos
+
+
+def blob_sha(data: bytes) -> bytes:
+    """Compute the git blob id of some content."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).digest()
+
+
+class IndexEntry(NamedTuple):
+    """One entry of the git index."""
+
+    path: str
+    mode: int
+    sha: bytes
+    stage: int
+    ctime: Tuple[int, int]
+    mtime: Tuple[int, int]
+    ino: int
+    size: int
+    assume_valid: bool
+    skip_worktree: bool
+    intent_to_add: bool
+
+
+class UntrackedCache(NamedTuple):
+    """Parsed untracked cache extension."""
+
+    location: str
+    info_exclude_sha: bytes
+    excludes_file_sha: bytes
+    exclude_per_dir: str
+    # (directory path with trailing slash, untracked names, stat or None,
+    # per-dir exclude file sha or None)
+    directories: List[Tuple[str, List[str], Optional[Tuple[int, ...]], Optional[bytes]]]
+    all_valid: bool
+
+
+class GitIndex:
+    """Parsed contents of a git index file."""
+
+    def __init__(self, path: str):
+        """Read and parse an index file.
+
+        Raises:
+            UnsupportedRepositoryError: If the index uses a version or a
+                required extension that is not supported
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            data = f.read()
+        self.mtime_ns = os.stat(path).st_mtime_ns
+
+        if data[:4] != b"DIRC":
+            raise UnsupportedRepositoryError("Not a git index file")
+        self.version = _u32(data, 4)
+        if self.version not in (2, 3, 4):
+            raise UnsupportedRepositoryError(f"Unsupported index version {self.version}")
+
+        self.entries: List[IndexEntry] = []
+        self.cache_tree: Dict[str, Tuple[int, bytes]] = {}
+        self.untracked: Optional[UntrackedCache] = None
+        self.fsmonitor_token: Optional[str] = None
+        self.fsmonitor_dirty: Set[int] = set()
+
+        pos = self._read_entries(data, 12, _u32(data, 8))
+        self._read_extensions(data, pos, len(data) - 20)
+
+    def _read_entries(self, data: bytes, pos: int, count: int) -> int:
+        previous = b""
+        for _ in range(count):
+            start = pos
+            fields = [_u32(data, pos + 4 * i) for i in range(10)]
+            sha = data[pos + _STAT_SIZE : pos + _STAT_SIZE + 20]
+            flags = int.from_bytes(data[pos + 60 : pos + 62], "big")
+            pos += _ENTRY_FIXED_SIZE
+            extended = 0
+            if self.version >= 3 and flags & 0x4000:
+                extended = int.from_bytes(data[pos : pos + 2], "big")
+                pos += 2
+
+            if self.version == 4:
+                # Path is the previous path minus N bytes plus a new suffix
+                strip, pos = _varint(data, pos)
+                end = data.index(b"\0", pos)
+                name = previous[: len(previous) - strip] + data[pos:end]
+                pos = end + 1
+            else:
+                end = data.index(b"\0", pos)
+                name = data[pos:end]
+                # Entries are NUL-padded to a multiple of eight bytes
+                pos = start + ((end - start) // 8 + 1) * 8
+            previous = name
+
+            self.entries.append(
+                IndexEntry(
+                    path=os.fsdecode(name),
+                    mode=fields[6],
+                    sha=sha,
+                    stage=(flags >> 12) & 3,
+                    ctime=(fields[0], fields[1]),
+                    mtime=(fields[2], fields[3]),
+                    ino=fields[5],
+                    size=fields[9],
+                    assume_valid=bool(flags & 0x8000),
+                    skip_worktree=bool(extended & 0x4000),
+                    intent_to_add=bool(extended & 0x2000),
+                )
+            )
+        return pos
+
+    def _read_extensions(self, data: bytes, pos: int, end: int) -> None:
+        while pos + 8 <= end:
+            signature = data[pos : pos + 4]
+            size = _u32(data, pos + 4)
+            body = data[pos + 8 : pos + 8 + size]
+            pos += 8 + size
+            if signature == b"TREE":
+                self._read_cache_tree(body)
+            elif signature == b"UNTR":
+                self.untracked = self._read_untracked(body)
+            elif signature == b"FSMN":
+                self._read_fsmonitor(body)
+            elif not b"A" <= signature[:1] <= b"Z":
+                # Lowercase extensions (split index, sparse index ...) are
+                # required to understand the index
+                raise UnsupportedRepositoryError(
+                    f"Unsupported index extension: {signature.decode('ascii', 'replace')}"
+                )
+
+    def _read_cache_tree(self, body: bytes) -> None:
+        stack: List[Tuple[str, int]] = []  # (path prefix, remaining subtrees)
+        pos = 0
+        while pos < len(body):
+            end = body.index(b"\0", pos)
+            name = os.fsdecode(body[pos:end])
+            line_end = body.index(b"\n", end)
+            entry_count, subtree_count = (
+                int(value) for value in body[end + 1 : line_end].split(b" ")
+            )
+            pos = line_end + 1
+            sha = b""
+            if entry_count >= 0:
+                sha = body[pos : pos + 20]
+                pos += 20
+
+            while stack and stack[-1][1] == 0:
+                stack.pop()
+            if stack:
+                parent, remaining = stack.pop()
+                stack.append((parent, remaining - 1))
+                path = f"{parent}{name}"
+            else:
+                path = name
+            self.cache_tree[path] = (entry_count, sha)
+            stack.append((f"{path}/" if path else "", subtree_count))
+
+    def _read_untracked(self, body: bytes) -> Optional[UntrackedCache]:
+        ident_size, pos = _varint(body, 0)
+        idents = body[pos : pos + ident_size].split(b"\0")
+        pos += ident_size
+        location = ""
+        for ident in idents:
+            text = os.fsdecode(ident)
+            if text.startswith("Location "):
+                location = text[len("Location ") :].split(", system ")[0]
+        pos += 36 * 2 + 4  # stat of info/exclude and core.excludesFile, flags
+        info_exclude_sha = body[pos : pos + 20]
+        excludes_file_sha = body[pos + 20 : pos + 40]
+        pos += 40
+        end = body.index(b"\0", pos)
+        exclude_per_dir = os.fsdecode(body[pos:end])
+        pos = end + 1
+
+        dir_count, pos = _varint(body, pos)
+        blocks: List[Tuple[str, List[str]]] = []
+
+        def read_dir(pos: int, prefix: str) -> int:
+            untracked_count, pos = _varint(body, pos)
+            subdir_count, pos = _varint(body, pos)
+            end = body.index(b"\0", pos)
+            name = os.fsdecode(body[pos:end])
+            pos = end + 1
+            path = f"{prefix}{name}/" if name else prefix
+            names = []
+            for _ in range(untracked_count):
+                end = body.index(b"\0", pos)
+                names.append(os.fsdecode(body[pos:end]))
+                pos = end + 1
+            blocks.append((path, names))
+            for _ in range(subdir_count):
+                pos = read_dir(pos, path)
+            return pos
+
+        if dir_count:
+            pos = read_dir(pos, "")
+        valid, pos = _read_ewah(body, pos) if dir_count else (set(), pos)
+        _, pos = _read_ewah(body, pos) if dir_count else (set(), pos)
+        sha_valid, pos = _read_ewah(body, pos) if dir_count else (set(), pos)
+
+        stats: Dict[int, Tuple[int, ...]] = {}
+        for index in sorted(valid):
+            stats[index] = tuple(_u32(body, pos + 4 * i) for i in range(9))
+            pos += 36
+        shas: Dict[int, bytes] = {}
+        for index in sorted(sha_valid):
+            shas[index] = body[pos : pos + 20]
+            pos += 20
+
+        directories = [
+            (path, names, stats.get(index), shas.get(index))
+            for index, (path, names) in enumerate(blocks)
+        ]
+        return UntrackedCache(
+            location=location,
+            info_exclude_sha=info_exclude_sha,
+            excludes_file_sha=excludes_file_sha,
+            exclude_per_dir=exclude_per_dir,
+            directories=directories,
+            all_valid=len(valid) == len(blocks),
+        )
+
+    def _read_fsmonitor(self, body: bytes) -> None:
+        version = _u32(body, 0)
+        if version == 1:
+            self.fsmonitor_token = str(int.from_bytes(body[4:12], "big"))
+            pos = 12
+        elif version == 2:
+            end = body.index(b"\0", 4)
+            self.fsmonitor_token = body[4:end].decode("utf-8", errors="replace")
+            pos = end + 1
+        else:
+            return
+        pos += 4  # bitmap size
+        self.fsmonitor_dirty, _ = _read_ewah(body, pos)
+
+
+class IndexStatus:
+    """Answer status queries from the index, HEAD tree and worktree stat data."""
+
+    def __init__(self, repo_path: str, store: Optional[ObjectStore] = None):
+        """Load the index of a repository.
+
+        Args:
+            repo_path: Path to the repository worktree
+            store: Object store used to read the HEAD tree
+
+        Raises:
+            UnsupportedRepositoryError: If the index can't be read natively
+        """
+        self.repo_path = os.path.abspath(repo_path)
+        self.store = store or ObjectStore(repo_path)
+        self.index = GitIndex(os.path.join(self.store.git_dir, "index"))
+        self.config = self._read_config()
+
+    def _read_config(self) -> Dict[str, str]:
+        """Read the few core.* settings that affect status, lowercased."""
+        values = {}
+        for path in (
+            os.path.expanduser("~/.gitconfig"),
+            os.path.join(self.store.common_dir, "config"),
+        ):
+            if not os.path.exists(path):
+                continue
+            section = ""
+            with open(path, "r", errors="replace") as f:
+                for line in f:
+                    line = line.strip()
+                    if line.startswith("["):
+                        section = line.strip("[]").split()[0].lower()
+                    elif "=" in line and section == "core":
+                        key, _, value = line.partition("=")
+                        values[key.strip().lower()] = value.strip()
+        return values
+
+    # Staged
+
+    def _flatten_tree(
+        self, tree_sha: bytes, prefix: str, out: Dict[str, Tuple[int, bytes]], clean: Set[str]
+    ) -> None:
+        cached = self.index.cache_tree.get(prefix.rstrip("/"))
+        if cached is not None and cached[0] >= 0 and cached[1] == tree_sha:
+            # The index still has exactly this subtree; nothing staged below it
+            clean.add(prefix)
+            return
+        for mode, name, sha in self.store.read_tree(tree_sha):
+            path = f"{prefix}{name}"
+            if mode == 0o40000:
+                self._flatten_tree(sha, f"{path}/", out, clean)
+            else:
+                out[path] = (mode, sha)
+
+    @staticmethod
+    def _under(path: str, prefixes: Set[str]) -> bool:
+        if "" in prefixes:
+            return True
+        parts = path.rstrip("/").split("/")
+        return any("/".join(parts[:i]) + "/" in prefixes for i in range(1, len(parts)))
+
+    def staged_files(self) -> List[str]:
+        """Get paths whose index state differs from HEAD, sorted like git.
+
+        Raises:
+            UnsupportedRepositoryError: If files were both added and
+                deleted; git's rename detection may pair them up
+        """
+        return [path for _, path in self.staged_changes()]
+
+    def staged_changes(self) -> List[Tuple[str, str]]:
+        """Get (status letter, path) of staged paths, sorted like git.
+
+        Letters follow ``git status``: A added, D deleted, M modified, T
+        type changed and U unmerged.
+
+        Raises:
+            UnsupportedRepositoryError: If files were both added and
+                deleted; git's rename detection may pair them up
+        """
+        head: Dict[str, Tuple[int, bytes]] = {}
+        clean: Set[str] = set()
+        try:
+            head_tree = self.store.commit_tree(self.store.resolve("HEAD"))
+        except UnsupportedRepositoryError:
+            head_tree = None  # unborn branch: everything in the index is new
+        if head_tree is not None:
+            self._flatten_tree(head_tree, "", head, clean)
+
+        staged: Dict[str, str] = {}
+        seen = set()
+        added = False
+        for entry in self.index.entries:
+            seen.add(entry.path)
+            if self._under(entry.path, clean):
+                continue
+            if entry.stage:
+                staged[entry.path] = "U"
+                continue
+            if entry.path not in head:
+                if entry.intent_to_add:
+                    continue
+                added = True
+                staged[entry.path] = "A"
+            elif head[entry.path] != (entry.mode, entry.sha):
+                retyped = (head[entry.path][0] ^ entry.mode) & 0o170000
+                staged[entry.path] = "T" if retyped else "M"
+        deleted = [path for path in head if path not in seen]
+        if added and deleted:
+            raise UnsupportedRepositoryError("Possible renames need git's similarity detection")
+        staged.update((path, "D") for path in deleted)
+        return [(staged[path], path) for path in sorted(staged, key=os.fsencode)]
+
+    # Modified
+
+    def _check_filters(self) -> None:
+        """Refuse to hash worktree files when content filters may apply."""
+        if self.config.get("autocrlf", "false").lower() not in ("false", "0", "no", "off"):
+            raise UnsupportedRepositoryError("core.autocrlf is enabled")
+        if os.path.exists(os.path.join(self.store.common_dir, "info", "attributes")):
+            raise UnsupportedRepositoryError("info/attributes may define filters")
+        if any(os.path.basename(e.path) == ".gitattributes" for e in self.index.entries):
+            raise UnsupportedRepositoryError(".gitattributes may define filters")
+
+    def _is_modified(self, position: int, entry: IndexEntry) -> bool:
+        full_path = os.path.join(self.repo_path, entry.path)
+        try:
+            st = os.lstat(full_path)
+        except (FileNotFoundError, NotADirectoryError):
+            return True
+        if stat.S_ISGITLINK(entry.mode) if hasattr(stat, "S_ISGITLINK") else entry.mode == 0o160000:
+            return not stat.S_ISDIR(st.st_mode)
+
+        is_link = entry.mode == 0o120000
+        if is_link != stat.S_ISLNK(st.st_mode) or (not is_link and not stat.S_ISREG(st.st_mode)):
+            return True
+        trust_mode = self.config.get("filemode", "true").lower() not in ("false", "0", "no", "off")
+        if trust_mode and not is_link and bool(entry.mode & 0o100) != bool(st.st_mode & 0o100):
+            return True
+
+        mtime = (int(st.st_mtime_ns // 10**9) & 0xFFFFFFFF, st.st_mtime_ns % 10**9)
+        ctime = (int(st.st_ctime_ns // 10**9) & 0xFFFFFFFF, st.st_ctime_ns % 10**9)
+        trust_ctime = self.config.get("trustctime", "true").lower() not in ("false", "0", "no", "off")
+        stat_matches = (
+            entry.mtime == mtime
+            and (ctime == entry.ctime or not trust_ctime)
+            and entry.ino == st.st_ino & 0xFFFFFFFF
+            and entry.size == st.st_size & 0xFFFFFFFF
+        )
+        entry_mtime_ns = entry.mtime[0] * 10**9 + entry.mtime[1]
+        racy = entry_mtime_ns >= self.index.mtime_ns
+        if stat_matches and not racy and position not in self.index.fsmonitor_dirty:
+            return False
+        if not is_link and entry.size != st.st_size & 0xFFFFFFFF and not racy:
+            return True
+
+        # Stat data is inconclusive: compare contents
+        if is_link:
+            content = os.fsencode(os.readlink(full_path))
+        else:
+            with open(full_path, "rb") as f:
+                content = f.read()
+        return blob_sha(content) != entry.sha
+
+    def modified_files(self) -> List[str]:
+        """Get tracked paths whose worktree content differs from the index.
+
+        Raises:
+            UnsupportedRepositoryError: If content filters could make the
+                comparison unreliable
+        """
+        return [path for _, path in self.modified_changes()]
+
+    def modified_changes(self) -> List[Tuple[str, str]]:
+        """Get (status letter, path) of tracked paths changed in the worktree.
+
+        Letters follow ``git status``: D deleted, T type changed, A added
+        with intent to add, U unmerged and M modified.
+
+        Raises:
+            UnsupportedRepositoryError: If content filters could make the
+                comparison unreliable
+        """
+        self._check_filters()
+        modified: List[Tuple[str, str]] = []
+        for position, entry in enumerate(self.index.entries):
+            if entry.skip_worktree or entry.assume_valid:
+                continue
+            if modified and modified[-1][1] == entry.path:
+                continue
+            if entry.stage:
+                modified.append(("U", entry.path))
+            elif self._is_modified(position, entry):
+                modified.append((self._worktree_letter(entry), entry.path))
+        return modified
+
+    def _worktree_letter(self, entry: IndexEntry) -> str:
+        """Status letter of a tracked file known to differ from the index."""
+        if entry.intent_to_add:
+            return "A"
+        try:
+            st = os.lstat(os.path.join(self.repo_path, entry.path))
+        except (FileNotFoundError, NotADirectoryError):
+            return "D"
+        if entry.mode == 0o160000:
+            return "M"
+        return "T" if (entry.mode == 0o120000) != stat.S_ISLNK(st.st_mode) else "M"
+
+    # Untracked
+
+    @staticmethod
+    def _exclude_shas(path: str) -> Set[bytes]:
+        """Hashes git may have recorded for an ignore file.
+
+        Git hashes ignore files with a newline appended, except for tracked
+        files that are up to date, where it reuses the blob id from the index.
+        """
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+        except OSError:
+            return {b"\0" * 20}
+        if not content:
+            return {blob_sha(content)}
+        return {blob_sha(content + b"\n"), blob_sha(content)}
+
+    def untracked_files(self) -> List[str]:
+        """Get untracked paths from the untracked cache, like `git status`.
+
+        Wholly untracked directories are reported once with a trailing
+        slash, the way `git status` shows them.
+
+        Raises:
+            UnsupportedRepositoryError: If there is no untracked cache or it
+                is out of date
+        """
+        cache = self.index.untracked
+        if cache is None or not cache.all_valid:
+            raise UnsupportedRepositoryError("No valid untracked cache")
+        if os.path.abspath(cache.location) != self.repo_path:
+            raise UnsupportedRepositoryError("Untracked cache belongs to another worktree")
+        info_exclude = os.path.join(self.store.common_dir, "info", "exclude")
+        if cache.info_exclude_sha not in self._exclude_shas(info_exclude):
+            raise UnsupportedRepositoryError("info/exclude changed")
+        excludes_file = self.config.get("excludesfile") or os.path.join(
+            os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config"), "git", "ignore"
+        )
+        if cache.excludes_file_sha not in self._exclude_shas(os.path.expanduser(excludes_file)):
+            raise UnsupportedRepositoryError("core.excludesFile changed")
+
+        untracked = []
+        for directory, names, dir_stat, exclude_sha in cache.directories:
+            full_dir = os.path.join(self.repo_path, directory)
+            try:
+                st = os.lstat(full_dir)
+            except OSError:
+                raise UnsupportedRepositoryError(f"Cached directory is gone: {directory}")
+            ctime = (int(st.st_ctime_ns // 10**9) & 0xFFFFFFFF, st.st_ctime_ns % 10**9)
+            mtime = (int(st.st_mtime_ns // 10**9) & 0xFFFFFFFF, st.st_mtime_ns % 10**9)
+            if dir_stat is None or (ctime + mtime) != dir_stat[:4] or st.st_ino & 0xFFFFFFFF != dir_stat[5]:
+                raise UnsupportedRepositoryError(f"Directory changed: {directory}")
+            if st.st_mtime_ns >= self.index.mtime_ns:
+                raise UnsupportedRepositoryError(f"Directory is racily clean: {directory}")
+            exclude_path = os.path.join(full_dir, cache.exclude_per_dir)
+            if (exclude_sha or b"\0" * 20) not in self._exclude_shas(exclude_path):
+                raise UnsupportedRepositoryError(f"Ignore rules changed in {directory}")
+            untracked.extend(f"{directory}{name}" for name in names)
+
+        # Untracked directories also get their own block; only report the
+        # directory itself
+        reported_dirs = {path for path in untracked if path.endswith("/")}
+        return sorted(
+            (path for path in untracked if not self._under(path, reported_dirs)),
+            key=os.fsencode,
+        )
@@ -0,0 +1,280 @@
+"""
+Per-commit data shared between clones through git notes.
+"""
+
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from .git import GitService
+
+NOTES_REF = "refs/notes/devtools"
+
+
+class CommitNotes:
+    """JSON notes attached to commits under ``refs/notes/devtools``.
+
+    Notes are ordinary git objects, so the ref can be pushed and fetched
+    like a branch and every clone reuses what another one computed. Each
+    note is a JSON object with one key per kind of data (e.g.
+    ``"changelog"``), so kinds never overwrite each other.
+
+    Writes build a new notes commit with plumbing and move the ref with a
+    compare-and-swap ``update-ref``; if another process moved it first the
+    update is redone on top of its result. Merges take the union of both
+    notes trees; where both annotate the same commit differently the two
+    notes are merged kind by kind, keeping the value with the smaller
+    canonical JSON when both have the same kind, so every clone converges
+    on the same tree.
+    """
+
+    MAX_RETRIES = 5
+
+    def __init__(self, git_service: GitService, ref: str = NOTES_REF):
+        """Initialize the notes store.
+
+        Args:
+            git_service: GitService of the repository
+            ref: Notes ref to read and write
+        """
+        self.git_service = git_service
+        self.ref = ref
+
+    def _git(self, args: List[str], input: Optional[bytes] = None) -> str:
+        stdout, stderr, returncode = self.git_service._run_git_bytes(args, input=input)
+        if returncode != 0:
+            details = self.git_service._decode(stderr.strip()) or f"exit code {returncode}"
+            raise Exception(f"git {args[0]} failed: {details}")
+        return self.git_service._decode(stdout.strip())
+
+    def _tip(self, ref: Optional[str] = None) -> Optional[str]:
+        stdout, _, returncode = self.git_service._run_git_command(
+            ["rev-parse", "--verify", "--quiet", f"{ref or self.ref}^{{commit}}"]
+        )
+        return stdout if returncode == 0 and stdout else None
+
+    def _entries(self, tip: Optional[str]) -> Dict[str, str]:
+        """Map annotated commit -> note blob id of a notes commit.
+
+        Fanout directories (``ab/cdef...``) written by ``git notes`` are
+        flattened back into full commit ids.
+        """
+        if tip is None:
+            return {}
+        stdout, _, _ = self.git_service._run_git_bytes(["ls-tree", "-r", "-z", tip])
+        entries = {}
+        for record in stdout.split(b"\0"):
+            if not record:
+                continue
+            info, path = record.split(b"\t", 1)
+            commit = path.decode("ascii", errors="replace").replace("/", "")
+            entries[commit] = info.split()[2].decode("ascii")
+        return entries
+
+    def _load(self, blobs: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """Decode the JSON notes of commit -> blob id pairs."""
+        if not blobs:
+            return {}
+        objects = self.git_service.read_objects(list(dict.fromkeys(blobs.values())))
+        notes = {}
+        for commit, blob in blobs.items():
+            obj = objects.get(blob)
+            if obj is None:
+                continue
+            try:
+                note = json.loads(obj.data.decode("utf-8"))
+            except ValueError:
+                continue
+            if isinstance(note, dict):
+                notes[commit] = note
+        return notes
+
+    def _hash(self, notes: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """Store notes as blobs in canonical JSON with one git call.
+
+        Returns:
+            Mapping of commit id to the blob id of its note
+        """
+        if not notes:
+            return {}
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for i, note in enumerate(notes.values()):
+                path = os.path.join(directory, str(i))
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(self._canonical(note))
+                paths.append(path)
+            blobs = self._git(
+                ["hash-object", "-w", "--no-filters", "--stdin-paths"],
+                input="\n".join(paths).encode("utf-8"),
+            ).split()
+        return dict(zip(notes, blobs))
+
+    @staticmethod
+    def _canonical(value: Any) -> str:
+        return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+    def _is_ancestor(self, ancestor: str, commit: str) -> bool:
+        _, _, returncode = self.git_service._run_git_command(
+            ["merge-base", "--is-ancestor", ancestor, commit]
+        )
+        return returncode == 0
+
+    def _update(
+        self,
+        entries: Dict[str, str],
+        old_tip: Optional[str],
+        parents: List[str],
+        message: str,
+    ) -> bool:
+        """Commit a flat notes tree and move the ref if it is still at old_tip.
+
+        Returns:
+            False if the ref moved in the meantime
+        """
+        tree = self._git(
+            ["mktree", "-z"],
+            input=b"".join(
+                f"100644 blob {blob}\t{commit}".encode("ascii") + b"\0"
+                for commit, blob in sorted(entries.items())
+            ),
+        )
+        args = ["commit-tree", tree, "-m", message]
+        for parent in ([old_tip] if old_tip else []) + parents:
+            args.extend(["-p", parent])
+        commit = self._git(args)
+        # An empty old value means the ref must not exist yet
+        _, _, returncode = self.git_service._run_git_command(
+            ["update-ref", "-m", message, self.ref, commit, old_tip or ""]
+        )
+        return returncode == 0
+
+    def read(self, commits: List[str], kind: str) -> Dict[str, Any]:
+        """Read the notes of one kind for many commits.
+
+        Args:
+            commits: Full commit ids
+            kind: Key of the data inside each note, e.g. ``"changelog"``
+
+        Returns:
+            Mapping of commit id to its data; commits without a note (or
+            without data of this kind) are left out
+        """
+        entries = self._entries(self._tip())
+        notes = self._load({commit: entries[commit] for commit in commits if commit in entries})
+        return {commit: note[kind] for commit, note in notes.items() if kind in note}
+
+    def write(self, data: Dict[str, Any], kind: str) -> None:
+        """Attach data of one kind to commits, keeping their other notes.
+
+        Args:
+            data: Mapping of full commit id to JSON-serializable data
+            kind: Key of the data inside each note
+
+        Raises:
+            Exception: If git fails or the ref keeps moving
+        """
+        if not data:
+            return
+        for _ in range(self.MAX_RETRIES):
+            tip = self._tip()
+            entries = self._entries(tip)
+            current = self._load({commit: entries[commit] for commit in data if commit in entries})
+            notes = {}
+            for commit, value in data.items():
+                note = dict(current.get(commit, {}))
+                note[kind] = value
+                notes[commit] = note
+            merged = dict(entries)
+            merged.update(self._hash(notes))
+            if merged == entries:
+                return
+            if self._update(merged, tip, [], "Notes added by devtools"):
+                return
+        raise Exception(f"Failed to update {self.ref}: it kept changing")
+
+    def merge(self, other_ref: str) -> None:
+        """Merge another notes ref (e.g. one fetched from a remote) into ours.
+
+        Raises:
+            Exception: If git fails or the ref keeps moving
+        """
+        other = self._tip(other_ref)
+        if other is None:
+            return
+        for _ in range(self.MAX_RETRIES):
+            tip = self._tip()
+            if tip is not None and self._is_ancestor(other, tip):
+                # Already merged
+                return
+            if tip is None or self._is_ancestor(tip, other):
+                _, _, returncode = self.git_service._run_git_command(
+                    ["update-ref", "-m", f"notes: fast-forward to {other_ref}", self.ref, other, tip or ""]
+                )
+                if returncode == 0:
+                    return
+                continue
+            ours = self._entries(tip)
+            theirs = self._entries(other)
+            merged = dict(theirs)
+            merged.update(ours)
+            conflicts = [
+                commit for commit in ours if commit in theirs and ours[commit] != theirs[commit]
+            ]
+            ours_notes = self._load({commit: ours[commit] for commit in conflicts})
+            theirs_notes = self._load({commit: theirs[commit] for commit in conflicts})
+            notes = {}
+            for commit in conflicts:
+                if commit not in ours_notes or commit not in theirs_notes:
+                    # Not a devtools note: keep one of them as a whole
+                    merged[commit] = min(ours[commit], theirs[commit])
+                    continue
+                note = dict(ours_notes[commit])
+                for kind, value in theirs_notes[commit].items():
+                    if kind not in note:
+                        note[kind] = value
+                    else:
+                        note[kind] = min(note[kind], value, key=self._canonical)
+                notes[commit] = note
+            merged.update(self._hash(notes))
+            if self._update(merged, tip, [other], f"Notes merged from {other_ref} by devtools"):
+                return
+        raise Exception(f"Failed to update {self.ref}: it kept changing")
+
+    def sync(self, remote: str = "origin") -> None:
+        """Fetch the remote's notes, merge them and push the result back.
+
+        The push is a plain fast-forward; if another clone pushed in the
+        meantime it is rejected and the fetch and merge are repeated.
+
+        Raises:
+            Exception: If fetching or pushing fails for another reason
+        """
+        tracking = f"{self.ref}-remotes/{remote}"
+        for attempt in range(self.MAX_RETRIES):
+            if attempt:
+                # Jitter so clones racing for the same remote do not retry in lockstep
+                time.sleep(random.uniform(0, 0.5 * attempt))
+            _, stderr, returncode = self.git_service._run_git_command(
+                ["fetch", "--quiet", remote, f"+{self.ref}:{tracking}"]
+            )
+            if returncode == 0:
+                self.merge(tracking)
+            elif "cannot lock ref" in stderr:
+                # Another process in this clone is fetching at the same time
+                continue
+            elif "couldn't find remote ref" not in stderr:
+                raise Exception(f"Failed to fetch notes from {remote}: {stderr}")
+            if self._tip() is None:
+                return
+            _, stderr, returncode = self.git_service._run_git_command(
+                ["push", "--quiet", remote, f"{self.ref}:{self.ref}"]
+            )
+            if returncode == 0:
+                return
+            if not any(reason in stderr for reason in ("rejected", "fetch first", "cannot lock ref")):
+                raise Exception(f"Failed to push notes to {remote}: {stderr}")
+        raise Exception(f"Failed to push notes to {remote}: it kept changing")
@@ -0,0 +1,622 @@
+"""
+Read-only, pure-Python access to git objects for history queries.
+
+Reads loose objects, version 2 pack indexes with their packfiles and a
+single-file commit-graph directly from ``.git`` (memory-mapped), so history
+can be walked in-process without running ``git log``. Anything outside this
+subset raises UnsupportedRepositoryError and callers should fall back to
+the git command line.
+"""
+
+import heapq
+import mmap
+import os
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class UnsupportedRepositoryError(Exception):
+    """Raised when the repository uses a format this reader can't handle."""
+
+    pass
+
+
+OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+OFS_DELTA = 6
+REF_DELTA = 7
+
+
+def _map_file(path: str) -> mmap.mmap:
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Apply a git delta instruction stream to its base object."""
+
+    def varint(pos: int) -> Tuple[int, int]:
+        value, shift = 0, 0
+        while True:
+            byte = delta[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                return value, pos
+
+    _, pos = varint(0)  # source size
+    target_size, pos = varint(pos)
+    out = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset, size = 0, 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (0x10 << i):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset : offset + (size or 0x10000)]
+        elif op:
+            out += delta[pos : pos + op]
+            pos += op
+        else:
+            raise ValueError("Invalid delta opcode")
+    if len(out) != target_size:
+        raise ValueError("Delta produced an object of the wrong size")
+    return bytes(out)
+
+
+class PackFile:
+    """A packfile and its version 2 index."""
+
+    def __init__(self, idx_path: str):
+        """Open a pack by its ``.idx`` path.
+
+        Raises:
+            UnsupportedRepositoryError: If the index is not version 2
+        """
+        self.idx = _map_file(idx_path)
+        if self.idx[:8] != b"\xfftOc\x00\x00\x00\x02":
+            raise UnsupportedRepositoryError(f"Unsupported pack index: {idx_path}")
+        self.pack = _map_file(idx_path[: -len(".idx")] + ".pack")
+        self.fanout = [
+            int.from_bytes(self.idx[8 + 4 * i : 12 + 4 * i], "big") for i in range(256)
+        ]
+        self.count = self.fanout[255]
+        self._names = 8 + 256 * 4
+        self._offsets = self._names + self.count * 24  # names + crc32s
+        self._large_offsets = self._offsets + self.count * 4
+
+    def _name(self, index: int) -> bytes:
+        start = self._names + index * 20
+        return self.idx[start : start + 20]
+
+    def find(self, sha: bytes) -> Optional[int]:
+        """Get the pack offset of an object, or None if not in this pack."""
+        lo = self.fanout[sha[0] - 1] if sha[0] else 0
+        hi = self.fanout[sha[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name = self._name(mid)
+            if name < sha:
+                lo = mid + 1
+            elif name > sha:
+                hi = mid
+            else:
+                start = self._offsets + mid * 4
+                offset = int.from_bytes(self.idx[start : start + 4], "big")
+                if offset & 0x80000000:
+                    start = self._large_offsets + (offset & 0x7FFFFFFF) * 8
+                    offset = int.from_bytes(self.idx[start : start + 8], "big")
+                return offset
+        return None
+
+    def read_header(self, offset: int) -> Tuple[int, int, int]:
+        """Parse an entry header. Returns (type, size, data offset)."""
+        byte = self.pack[offset]
+        offset += 1
+        type_num = (byte >> 4) & 7
+        size = byte & 0x0F
+        shift = 4
+        while byte & 0x80:
+            byte = self.pack[offset]
+            offset += 1
+            size |= (byte & 0x7F) << shift
+            shift += 7
+        return type_num, size, offset
+
+    def inflate(self, offset: int, size: int) -> bytes:
+        """Decompress the zlib stream starting at offset."""
+        decompressor = zlib.decompressobj()
+        out = []
+        length = 0
+        while not decompressor.eof:
+            chunk = self.pack[offset : offset + 65536]
+            if not chunk:
+                raise ValueError("Truncated packfile")
+            offset += len(chunk)
+            data = decompressor.decompress(chunk)
+            out.append(data)
+            length += len(data)
+        result = b"".join(out)
+        if length != size:
+            raise ValueError("Packed object has the wrong size")
+        return result
+
+    def close(self) -> None:
+        self.idx.close()
+        self.pack.close()
+
+
+class CommitGraph:
+    """Parents and commit times from a single-file commit-graph."""
+
+    NO_PARENT = 0x70000000
+
+    def __init__(self, path: str):
+        """Open a commit-graph file.
+
+        Raises:
+            UnsupportedRepositoryError: If the file uses an unsupported layout
+        """
+        self.data = _map_file(path)
+        if self.data[:4] != b"CGPH" or self.data[4] != 1 or self.data[5] != 1:
+            raise UnsupportedRepositoryError("Unsupported commit-graph format")
+        if self.data[7]:
+            raise UnsupportedRepositoryError("Split commit-graphs are not supported")
+        chunks = {}
+        for i in range(self.data[6] + 1):
+            entry = 8 + i * 12
+            chunks[self.data[entry : entry + 4]] = int.from_bytes(
+                self.data[entry + 4 : entry + 12], "big"
+            )
+        try:
+            self._fanout = chunks[b"OIDF"]
+            self._oids = chunks[b"OIDL"]
+            self._cdat = chunks[b"CDAT"]
+        except KeyError:
+            raise UnsupportedRepositoryError("Incomplete commit-graph")
+        self._edges = chunks.get(b"EDGE")
+        last = self._fanout + 255 * 4
+        self.count = int.from_bytes(self.data[last : last + 4], "big")
+
+    def _oid(self, pos: int) -> bytes:
+        return self.data[self._oids + pos * 20 : self._oids + pos * 20 + 20]
+
+    def position(self, sha: bytes) -> Optional[int]:
+        """Get the graph position of a commit, or None if not in the graph."""
+        names = _OidList(self)
+        pos = bisect_left(names, sha)
+        if pos < self.count and self._oid(pos) == sha:
+            return pos
+        return None
+
+    def lookup(self, sha: bytes) -> Optional[Tuple[List[bytes], int]]:
+        """Get (parent shas, commit time) of a commit, if it is in the graph."""
+        pos = self.position(sha)
+        if pos is None:
+            return None
+        entry = self._cdat + pos * 36
+        parent1 = int.from_bytes(self.data[entry + 20 : entry + 24], "big")
+        parent2 = int.from_bytes(self.data[entry + 24 : entry + 28], "big")
+        commit_time = int.from_bytes(self.data[entry + 28 : entry + 36], "big") & (
+            (1 << 34) - 1
+        )
+        parents = []
+        if parent1 != self.NO_PARENT:
+            parents.append(self._oid(parent1))
+        if parent2 & 0x80000000:
+            if self._edges is None:
+                raise UnsupportedRepositoryError("Octopus merge without EDGE chunk")
+            edge = self._edges + (parent2 & 0x7FFFFFFF) * 4
+            while True:
+                value = int.from_bytes(self.data[edge : edge + 4], "big")
+                parents.append(self._oid(value & 0x7FFFFFFF))
+                if value & 0x80000000:
+                    break
+                edge += 4
+        elif parent2 != self.NO_PARENT:
+            parents.append(self._oid(parent2))
+        return parents, commit_time
+
+    def close(self) -> None:
+        self.data.close()
+
+
+class _OidList:
+    """Sequence view over commit-graph object ids for bisect."""
+
+    def __init__(self, graph: CommitGraph):
+        self.graph = graph
+
+    def __len__(self) -> int:
+        return self.graph.count
+
+    def __getitem__(self, pos: int) -> bytes:
+        return self.graph._oid(pos)
+
+
+class ObjectStore:
+    """Read commits and walk history directly from a repository's ``.git``."""
+
+    # Number of fully resolved pack objects kept for delta chains
+    CACHE_SIZE = 256
+    # Number of parsed commits (or their parents and time) kept
+    COMMIT_CACHE_SIZE = 4096
+
+    def __init__(self, repo_path: str):
+        """Open the object database of a repository.
+
+        Raises:
+            UnsupportedRepositoryError: If the repository layout or object
+                format is not supported
+        """
+        self.git_dir = self._find_git_dir(repo_path)
+        common_file = os.path.join(self.git_dir, "commondir")
+        if os.path.exists(common_file):
+            with open(common_file, "r") as f:
+                self.common_dir = os.path.normpath(
+                    os.path.join(self.git_dir, f.read().strip())
+                )
+        else:
+            self.common_dir = self.git_dir
+        self.objects_dir = os.path.join(self.common_dir, "objects")
+        self._check_supported()
+
+        self.packs: List[PackFile] = []
+        pack_dir = os.path.join(self.objects_dir, "pack")
+        if os.path.isdir(pack_dir):
+            for name in sorted(os.listdir(pack_dir)):
+                if name.endswith(".idx") and os.path.exists(
+                    os.path.join(pack_dir, name[: -len(".idx")] + ".pack")
+                ):
+                    self.packs.append(PackFile(os.path.join(pack_dir, name)))
+
+        self.graph: Optional[CommitGraph] = None
+        graph_path = os.path.join(self.objects_dir, "info", "commit-graph")
+        if os.path.exists(graph_path):
+            self.graph = CommitGraph(graph_path)
+
+        self.shallow = set()
+        shallow_path = os.path.join(self.common_dir, "shallow")
+        if os.path.exists(shallow_path):
+            with open(shallow_path, "r") as f:
+                self.shallow = {bytes.fromhex(line.strip()) for line in f if line.strip()}
+
+        self._cache: "OrderedDict[Tuple[int, int], Tuple[int, bytes]]" = OrderedDict()
+        self._commits: "OrderedDict[bytes, Dict]" = OrderedDict()
+
+    @staticmethod
+    def _find_git_dir(repo_path: str) -> str:
+        git_path = os.path.join(repo_path, ".git")
+        if os.path.isfile(git_path):
+            # Worktrees and submodules use a "gitdir: <path>" file
+            with open(git_path, "r") as f:
+                content = f.read().strip()
+            if not content.startswith("gitdir:"):
+                raise UnsupportedRepositoryError("Unrecognized .git file")
+            return os.path.normpath(
+                os.path.join(repo_path, content[len("gitdir:") :].strip())
+            )
+        return git_path
+
+    def _check_supported(self) -> None:
+        config_path = os.path.join(self.common_dir, "config")
+        if os.path.exists(config_path):
+            with open(config_path, "r", errors="replace") as f:
+                for line in f:
+                    key, _, value = line.partition("=")
+                    if key.strip().lower() == "objectformat" and value.strip() != "sha1":
+                        raise UnsupportedRepositoryError(
+                            "Only SHA-1 repositories are supported"
+                        )
+        for unsupported in (
+            os.path.join(self.objects_dir, "info", "alternates"),
+            os.path.join(self.objects_dir, "info", "commit-graphs"),
+            os.path.join(self.common_dir, "info", "grafts"),
+            os.path.join(self.common_dir, "refs", "replace"),
+        ):
+            if os.path.exists(unsupported):
+                raise UnsupportedRepositoryError(
+                    f"Unsupported repository feature: {os.path.basename(unsupported)}"
+                )
+
+    def close(self) -> None:
+        """Release the memory maps."""
+        for pack in self.packs:
+            pack.close()
+        if self.graph:
+            self.graph.close()
+
+    # Objects
+
+    def _read_loose(self, sha: bytes) -> Optional[Tuple[str, bytes]]:
+        hex_sha = sha.hex()
+        path = os.path.join(self.objects_dir, hex_sha[:2], hex_sha[2:])
+        try:
+            with open(path, "rb") as f:
+                raw = zlib.decompress(f.read())
+        except FileNotFoundError:
+            return None
+        header, _, data = raw.partition(b"\0")
+        type_name, _, _ = header.partition(b" ")
+        return type_name.decode("ascii"), data
+
+    def _read_packed(self, pack_index: int, offset: int) -> Tuple[int, bytes]:
+        key = (pack_index, offset)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        pack = self.packs[pack_index]
+        type_num, size, data_offset = pack.read_header(offset)
+        if type_num == OFS_DELTA:
+            byte = pack.pack[data_offset]
+            data_offset += 1
+            distance = byte & 0x7F
+            while byte & 0x80:
+                byte = pack.pack[data_offset]
+                data_offset += 1
+                distance = ((distance + 1) << 7) | (byte & 0x7F)
+            base_type, base = self._read_packed(pack_index, offset - distance)
+            result = (base_type, _apply_delta(base, pack.inflate(data_offset, size)))
+        elif type_num == REF_DELTA:
+            base_sha = bytes(pack.pack[data_offset : data_offset + 20])
+            base_type_name, base = self.read(base_sha)
+            type_num_by_name = {name: num for num, name in OBJECT_TYPES.items()}
+            delta = pack.inflate(data_offset + 20, size)
+            result = (type_num_by_name[base_type_name], _apply_delta(base, delta))
+        elif type_num in OBJECT_TYPES:
+            result = (type_num, pack.inflate(data_offset, size))
+        else:
+            raise UnsupportedRepositoryError(f"Unknown pack object type {type_num}")
+
+        self._cache[key] = result
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return result
+
+    def read(self, sha: bytes) -> Tuple[str, bytes]:
+        """Read an object by binary sha. Returns (type name, contents).
+
+        Raises:
+            KeyError: If the object does not exist
+        """
+        for index, pack in enumerate(self.packs):
+            offset = pack.find(sha)
+            if offset is not None:
+                type_num, data = self._read_packed(index, offset)
+                return OBJECT_TYPES[type_num], data
+        loose = self._read_loose(sha)
+        if loose is None:
+            raise KeyError(sha.hex())
+        return loose
+
+    # Refs
+
+    def _read_ref(self, name: str, depth: int = 0) -> Optional[bytes]:
+        if depth > 5:
+            return None
+        base = self.git_dir if name == "HEAD" else self.common_dir
+        path = os.path.join(base, name)
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                value = f.read().strip()
+            if value.startswith("ref:"):
+                return self._read_ref(value[len("ref:") :].strip(), depth + 1)
+            return bytes.fromhex(value)
+        packed_refs = os.path.join(self.common_dir, "packed-refs")
+        if os.path.exists(packed_refs):
+            with open(packed_refs, "r") as f:
+                for line in f:
+                    if line.startswith(("#", "^")):
+                        continue
+                    parts = line.split()
+                    if len(parts) == 2 and parts[1] == name:
+                        return bytes.fromhex(parts[0])
+        return None
+
+    def resolve(self, rev: str) -> bytes:
+        """Resolve a full sha, HEAD, branch or tag name to a commit sha.
+
+        Raises:
+            UnsupportedRepositoryError: For revision syntax this reader
+                does not understand (short shas, ``~``/``^`` suffixes ...)
+        """
+        sha = None
+        if len(rev) == 40 and all(c in "0123456789abcdef" for c in rev.lower()):
+            sha = bytes.fromhex(rev)
+        else:
+            for name in (rev, f"refs/{rev}", f"refs/tags/{rev}", f"refs/heads/{rev}"):
+                sha = self._read_ref(name)
+                if sha is not None:
+                    break
+        if sha is None:
+            raise UnsupportedRepositoryError(f"Cannot resolve revision natively: {rev}")
+        # Peel annotated tags
+        for _ in range(10):
+            type_name, data = self.read(sha)
+            if type_name != "tag":
+                break
+            sha = bytes.fromhex(data.split(b"\n", 1)[0].split(b" ")[1].decode("ascii"))
+        return sha
+
+    # Commits
+
+    def commit(self, sha: bytes) -> Dict:
+        """Parse a commit object (lazily decompressed and cached).
+
+        Returns:
+            Dict with parents, commit_time, author, author_time, author_tz
+            and message
+        """
+        commit = self._cached_commit(sha)
+        if commit is not None and "message" in commit:
+            return commit
+        type_name, data = self.read(sha)
+        if type_name != "commit":
+            raise ValueError(f"Not a commit: {sha.hex()}")
+        headers, _, message = data.partition(b"\n\n")
+        commit = {
+            "parents": [],
+            "commit_time": 0,
+            "author": "",
+            "author_time": 0,
+            "author_tz": "+0000",
+        }
+        for line in headers.split(b"\n"):
+            if line.startswith(b"parent "):
+                commit["parents"].append(bytes.fromhex(line[7:].decode("ascii")))
+            elif line.startswith(b"author "):
+                ident, _, stamp = line[7:].decode("utf-8", errors="replace").rpartition("> ")
+                commit["author"] = ident.split(" <")[0]
+                seconds, _, tz = stamp.partition(" ")
+                commit["author_time"] = int(seconds)
+                commit["author_tz"] = tz or "+0000"
+            elif line.startswith(b"committer "):
+                stamp = line.decode("utf-8", errors="replace").rpartition("> ")[2]
+                commit["commit_time"] = int(stamp.split(" ")[0])
+        if sha in self.shallow:
+            commit["parents"] = []
+        commit["message"] = message.decode("utf-8", errors="replace")
+        self._cache_commit(sha, commit)
+        return commit
+
+    def _cached_commit(self, sha: bytes) -> Optional[Dict]:
+        commit = self._commits.get(sha)
+        if commit is not None:
+            self._commits.move_to_end(sha)
+        return commit
+
+    def _cache_commit(self, sha: bytes, commit: Dict) -> None:
+        self._commits[sha] = commit
+        self._commits.move_to_end(sha)
+        if len(self._commits) > self.COMMIT_CACHE_SIZE:
+            self._commits.popitem(last=False)
+
+    def _parents_and_time(self, sha: bytes) -> Tuple[List[bytes], int]:
+        """Get parents and commit time, from the commit-graph when possible."""
+        commit = self._cached_commit(sha)
+        if commit is not None:
+            return commit["parents"], commit["commit_time"]
+        if self.graph is not None:
+            found = self.graph.lookup(sha)
+            if found is not None:
+                parents = [] if sha in self.shallow else found[0]
+                self._cache_commit(sha, {"parents": parents, "commit_time": found[1]})
+                return parents, found[1]
+        commit = self.commit(sha)
+        return commit["parents"], commit["commit_time"]
+
+    # Trees
+
+    def commit_tree(self, sha: bytes) -> bytes:
+        """Get the root tree sha of a commit."""
+        type_name, data = self.read(sha)
+        if type_name != "commit" or not data.startswith(b"tree "):
+            raise ValueError(f"Not a commit: {sha.hex()}")
+        return bytes.fromhex(data[5:45].decode("ascii"))
+
+    def read_tree(self, sha: bytes) -> List[Tuple[int, str, bytes]]:
+        """Parse a tree object.
+
+        Returns:
+            List of (mode, name, sha) entries in tree order
+        """
+        type_name, data = self.read(sha)
+        if type_name != "tree":
+            raise ValueError(f"Not a tree: {sha.hex()}")
+        entries = []
+        pos = 0
+        while pos < len(data):
+            space = data.index(b" ", pos)
+            nul = data.index(b"\0", space)
+            entries.append(
+                (
+                    int(data[pos:space], 8),
+                    os.fsdecode(data[space + 1 : nul]),
+                    data[nul + 1 : nul + 21],
+                )
+            )
+            pos = nul + 21
+        return entries
+
+    def walk(
+        self,
+        include: Iterable[bytes],
+        exclude: Iterable[bytes] = (),
+        since: Optional[int] = None,
+    ) -> Iterator[bytes]:
+        """Yield commits reachable from include but not from exclude.
+
+        Commits come newest first by commit date, like ``git log``. Walking
+        stops at the first commit older than ``since`` (a Unix timestamp).
+        """
+        heap: List[Tuple[int, int, bytes]] = []
+        seen = set()
+        uninteresting = set()
+        # Queued commits that are still interesting; the walk ends when
+        # only uninteresting ones are left
+        queued = set()
+        counter = 0
+
+        def push(sha: bytes) -> None:
+            nonlocal counter
+            if sha in seen:
+                return
+            seen.add(sha)
+            _, commit_time = self._parents_and_time(sha)
+            heapq.heappush(heap, (-commit_time, counter, sha))
+            if sha not in uninteresting:
+                queued.add(sha)
+            counter += 1
+
+        def mark_uninteresting(sha: bytes) -> None:
+            stack = [sha]
+            while stack:
+                current = stack.pop()
+                if current in uninteresting:
+                    continue
+                uninteresting.add(current)
+                queued.discard(current)
+                if current in seen:
+                    stack.extend(self._parents_and_time(current)[0])
+
+        for sha in exclude:
+            mark_uninteresting(sha)
+            push(sha)
+        for sha in include:
+            push(sha)
+
+        while queued:
+            negative_time, _, sha = heapq.heappop(heap)
+            queued.discard(sha)
+            parents, _ = self._parents_and_time(sha)
+            if sha in uninteresting:
+                for parent in parents:
+                    mark_uninteresting(parent)
+                    push(parent)
+                continue
+            if since is not None and -negative_time < since:
+                return
+            yield sha
+            for parent in parents:
+                push(parent)
+
+
+def format_git_date(seconds: int, tz: str) -> str:
+    """Format a timestamp like ``git log --date=format:%Y-%m-%d %H:%M:%S %z``."""
+    sign = -1 if tz.startswith("-") else 1
+    offset = timedelta(hours=int(tz[1:3] or 0), minutes=int(tz[3:5] or 0))
+    return datetime.fromtimestamp(seconds, timezone(sign * offset)).strftime(
+        "%Y-%m-%d %H:%M:%S %z"
+    )
@@ -0,0 +1,89 @@
+"""
+Small persistent cache for generated results.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional
+
+
+class ResultCache:
+    """JSON-backed key-value cache capped at a number of entries.
+
+    Entries are loaded on first use and written back atomically by
+    ``save``; when the file is full the least recently used entries are
+    dropped. Keys are built with ``make_key`` from whatever inputs
+    determine the cached result.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 256):
+        """Initialize the cache.
+
+        Args:
+            path: Path to the JSON cache file
+            max_entries: Number of entries kept when saving
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._dirty = False
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Hash JSON-serializable inputs into a cache key."""
+        encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._entries = data if isinstance(data, dict) else {}
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached value, or None on a miss."""
+        with self._lock:
+            entry = self._load().get(key)
+            if not isinstance(entry, dict) or "value" not in entry:
+                return None
+            entry["used"] = time.time()
+            self._dirty = True
+            return entry["value"]
+
+    def put(self, key: str, value: Any) -> None:
+        """Store a value; it is persisted on the next ``save``."""
+        with self._lock:
+            self._load()[key] = {"value": value, "used": time.time()}
+            self._dirty = True
+
+    def save(self) -> None:
+        """Write the cache to disk if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = self._load()
+            if len(entries) > self.max_entries:
+                newest = sorted(entries.items(), key=lambda item: item[1].get("used", 0))
+                entries = dict(newest[-self.max_entries :])
+                self._entries = entries
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Write atomically so concurrent runs never see a half-written file
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
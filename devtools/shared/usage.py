@@ -0,0 +1,184 @@
+"""
+Token usage ledger and budget enforcement for AI services.
+"""
+
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterator, Optional
+
+from .config import BaseConfig
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class BudgetExceededError(Exception):
+    """Raised when the configured token budget has been used up."""
+
+    pass
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on path, shared by all processes using it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class UsageLedger:
+    """Track prompt and completion tokens per provider and model.
+
+    Daily totals are persisted to a small JSON file so budgets hold across
+    runs; per-run totals only live in memory. Updates hold a lock file next
+    to the ledger, so concurrent runs don't lose each other's requests.
+    """
+
+    # Number of days of history kept in the ledger file
+    RETENTION_DAYS = 30
+
+    def __init__(self, path: Path):
+        """Initialize the ledger.
+
+        Args:
+            path: Path to the JSON ledger file
+        """
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._lock = Lock()
+        self.run_tokens = 0
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, data: Dict[str, Dict[str, Dict[str, int]]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write atomically so concurrent runs never see a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def record(
+        self, provider: str, model: str, prompt_tokens: int, completion_tokens: int
+    ) -> None:
+        """Add a completed request to today's totals.
+
+        Args:
+            provider: Provider name (e.g. openrouter)
+            model: Model name used for the request
+            prompt_tokens: Tokens sent in the prompt
+            completion_tokens: Tokens generated in the response
+        """
+        with self._lock, _file_lock(self.lock_path):
+            self.run_tokens += prompt_tokens + completion_tokens
+            data = self._load()
+            today = date.today().isoformat()
+            cutoff = (date.today() - timedelta(days=self.RETENTION_DAYS)).isoformat()
+            data = {day: usage for day, usage in data.items() if day >= cutoff}
+            entry = data.setdefault(today, {}).setdefault(
+                f"{provider}/{model}",
+                {"prompt_tokens": 0, "completion_tokens": 0, "requests": 0},
+            )
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["requests"] += 1
+            self._save(data)
+
+    def daily_usage(self, day: Optional[date] = None) -> Dict[str, Dict[str, int]]:
+        """Get per provider/model usage for a day (default: today)."""
+        with self._lock:
+            return self._load().get((day or date.today()).isoformat(), {})
+
+    def daily_tokens(self) -> int:
+        """Get the total tokens used today across all providers."""
+        return sum(
+            usage["prompt_tokens"] + usage["completion_tokens"]
+            for usage in self.daily_usage().values()
+        )
+
+
+class BudgetGovernor:
+    """Decide how much AI work a request may do under the configured budgets.
+
+    Modes:
+        normal: no budget pressure
+        reduced: past the soft limit; use a smaller model and shorter prompts
+        exhausted: budget used up; callers should use their local fallback
+    """
+
+    def __init__(self, config: BaseConfig, ledger: UsageLedger):
+        """Initialize the governor from configuration.
+
+        Args:
+            config: Configuration with optional daily_token_budget,
+                run_token_budget and budget_soft_limit values
+            ledger: Ledger the budgets are checked against
+        """
+        self.ledger = ledger
+        self.daily_budget = int(config.get("daily_token_budget", 0) or 0)
+        self.run_budget = int(config.get("run_token_budget", 0) or 0)
+        self.soft_limit = float(config.get("budget_soft_limit", 0.8))
+
+    def mode(self) -> str:
+        """Get the current budget mode."""
+        ratios = []
+        if self.daily_budget:
+            ratios.append(self.ledger.daily_tokens() / self.daily_budget)
+        if self.run_budget:
+            ratios.append(self.ledger.run_tokens / self.run_budget)
+        if not ratios:
+            return "normal"
+        used = max(ratios)
+        if used >= 1.0:
+            return "exhausted"
+        if used >= self.soft_limit:
+            return "reduced"
+        return "normal"
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of text (about 4 characters per token)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+_default_ledger: Optional[UsageLedger] = None
+_default_ledger_lock = Lock()
+
+
+def get_default_ledger(config: BaseConfig) -> UsageLedger:
+    """Get the process-wide usage ledger so per-run totals are shared."""
+    global _default_ledger
+    with _default_ledger_lock:
+        if _default_ledger is None:
+            config_dir = getattr(config, "config_dir", Path.home() / ".devtools")
+            _default_ledger = UsageLedger(Path(config_dir) / "usage.json")
+        return _default_ledger
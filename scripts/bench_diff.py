@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark staged diff collection under different diff options.
+
+Builds a throwaway repository with a large staged change set (many renamed
+files plus a rewritten vendored tree) and times ``GitService.get_diff_set``
+with git's defaults, a lower rename limit, ``--no-renames``, less context
+and the histogram algorithm.
+
+Usage: python scripts/bench_diff.py [--files N] [--lines N] [--runs N]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from devtools.shared.git import GitService  # noqa: E402
+
+CONFIGURATIONS = [
+    ("defaults", {}),
+    ("rename_limit=100", {"rename_limit": 100}),
+    ("no renames", {"detect_renames": False}),
+    ("-U1", {"diff_context": 1}),
+    ("histogram", {"diff_algorithm": "histogram"}),
+    ("no renames, -U1", {"detect_renames": False, "diff_context": 1}),
+]
+
+
+def git(repo: Path, *args: str) -> None:
+    subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+
+def write_lines(path: Path, lines: int, rng: random.Random) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        "".join(f"value_{rng.randrange(10**6)} = {rng.random()!r}\n" for _ in range(lines))
+    )
+
+
+def build_repo(repo: Path, files: int, lines: int) -> None:
+    """Commit a tree, then stage renames with edits and a vendored rewrite."""
+    rng = random.Random(0)
+    git(repo, "init", "-q")
+    git(repo, "config", "user.email", "bench@example.com")
+    git(repo, "config", "user.name", "bench")
+    for i in range(files):
+        write_lines(repo / "src" / f"module_{i}.py", lines, rng)
+        write_lines(repo / "vendor" / f"lib_{i}.js", lines, rng)
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "initial")
+
+    # Move half of the sources under new names with a small edit each,
+    # forcing inexact rename detection (git pairs same-basename moves before
+    # applying the rename limit), and regenerate every vendored file
+    for i in range(0, files, 2):
+        source = repo / "src" / f"module_{i}.py"
+        target = repo / "pkg" / f"moved_{i}.py"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(source.read_text() + f"# moved {i}\n")
+        source.unlink()
+    for i in range(files):
+        write_lines(repo / "vendor" / f"lib_{i}.js", lines, rng)
+    git(repo, "add", "-A")
+
+
+def bench(repo: Path, options: dict, runs: int) -> tuple[float, int, int]:
+    """Best time of several runs, with the file count and output size."""
+    service = GitService(str(repo))
+    for name, value in options.items():
+        setattr(service, name, value)
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        diff_set = service.get_diff_set(staged=True)
+        best = min(best, time.perf_counter() - started)
+    return best, len(diff_set), sum(file.size for file in diff_set)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=400, help="Files per directory")
+    parser.add_argument("--lines", type=int, default=200, help="Lines per file")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per configuration")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="devtools-bench-") as tmp:
+        repo = Path(tmp)
+        print(f"Building repository with {args.files * 2} files in {repo} ...")
+        build_repo(repo, args.files, args.lines)
+        print(f"{'configuration':<20} {'time':>9} {'files':>7} {'diff size':>12}")
+        for label, options in CONFIGURATIONS:
+            elapsed, count, size = bench(repo, options, args.runs)
+            print(f"{label:<20} {elapsed:>8.3f}s {count:>7} {size / 1024:>10.0f}KB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,21 @@
+from pathlib import Path
+
+from devtools.shared.git import GitService
+
+from .conftest import git
+
+
+def test_read_objects_with_spaces_in_names(repo: Path):
+    (repo / "a b").write_text("spaced\n")
+    git(repo, "add", "-A")
+    service = GitService(str(repo))
+    try:
+        assert service.read_blob(":a b") == b"spaced\n"
+        # "<name> missing" splits into three fields like a found object
+        assert service.read_blob(":x y") is None
+        assert service.read_objects([":a", ":a b"]) == {
+            ":a": None,
+            ":a b": service.object_reader.read(":a b"),
+        }
+    finally:
+        service.close()
@@ -0,0 +1,29 @@
+from pathlib import Path
+
+from devtools.shared.git import GitService
+
+from .conftest import git
+
+PREPARE_COMMIT_MSG = """#!/bin/sh
+echo "source: $2" >> "$1"
+"""
+
+
+def test_commit_files_runs_prepare_commit_msg(repo: Path):
+    (repo / "a").write_text("a\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "initial")
+    hook = repo / ".git" / "hooks" / "prepare-commit-msg"
+    hook.write_text(PREPARE_COMMIT_MSG)
+    hook.chmod(0o755)
+    for name in ("a", "b"):
+        (repo / name).write_text("changed\n")
+    git(repo, "add", "-A")
+
+    service = GitService(str(repo))
+    try:
+        service.commit_files({"a": "change a", "b": "add b"}, no_verify=True)
+    finally:
+        service.close()
+    messages = git(repo, "log", "-2", "--format=%B%x00").split("\x00")
+    assert [m.strip() for m in messages[:2]] == ["add b\nsource: message", "change a\nsource: message"]
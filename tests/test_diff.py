@@ -0,0 +1,68 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from devtools.shared.diff import DiffSet
+from devtools.shared.git import GitService
+
+from .conftest import git
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+
+
+@pytest.fixture
+def retyped(repo: Path) -> Path:
+    """Stage a file replaced by a symlink, followed by two edited files."""
+    (repo / "a").write_text("one\n")
+    (repo / "b").write_text("b1\n")
+    (repo / "c").write_text("c1\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "initial")
+    (repo / "a").unlink()
+    os.symlink("b", repo / "a")
+    (repo / "b").write_text("b2\n")
+    (repo / "c").write_text("c2\n")
+    git(repo, "add", "-A")
+    return repo
+
+
+def expected(repo: Path) -> dict:
+    """Per-file patches as git prints them for each path alone."""
+    return {path: git(repo, "diff", "--cached", "--", path).rstrip("\n") for path in "abc"}
+
+
+def test_iter_file_diffs_matches_patches_after_type_change(retyped: Path):
+    diffs = dict(GitService(str(retyped)).iter_file_diffs(staged=True))
+    assert diffs == expected(retyped)
+
+
+def test_get_diff_set_matches_patches_after_type_change(retyped: Path):
+    diff_set = GitService(str(retyped)).get_diff_set(staged=True)
+    assert diff_set.paths == ["a", "b", "c"]
+    assert diff_set.as_dict() == expected(retyped)
+    assert diff_set["a"].status == "T"
+    assert (diff_set["a"].additions, diff_set["a"].deletions) == (1, 1)
+    assert [(f.additions, f.deletions) for f in (diff_set["b"], diff_set["c"])] == [(1, 1), (1, 1)]
+
+
+def test_parse_and_stream_agree_on_type_change(retyped: Path):
+    (retyped / "b").unlink()
+    (retyped / "b").write_text("".join(f"{i}\n" for i in range(300)))
+    (retyped / "c").unlink()
+    os.symlink("a", retyped / "c")
+    git(retyped, "add", "-A")
+    data = GitService(str(retyped))._run_git_bytes(
+        ["diff", "--cached", "-z", "--patch-with-raw", "--no-abbrev"]
+    )[0]
+    whole = DiffSet.parse(data)
+    assert whole.as_dict() == expected(retyped)
+    for size in (1, 7, 4096):
+        chunks = [data[i : i + size] for i in range(0, len(data), size)]
+        assert DiffSet.parse_stream(chunks).as_dict() == whole.as_dict()
+        # Counts of patches dropped for a ceiling skip the second header
+        for limit in (10, 100):
+            streamed = DiffSet.parse_stream(chunks, max_file_bytes=limit)
+            assert [(f.path, f.additions, f.deletions) for f in streamed] == [
+                (f.path, f.additions, f.deletions) for f in whole
+            ]
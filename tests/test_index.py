@@ -0,0 +1,127 @@
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from devtools.shared.git import GitService
+from devtools.shared.index import GitIndex, IndexStatus
+from devtools.shared.objectstore import UnsupportedRepositoryError
+
+from .conftest import git
+
+
+def git_status(repo: Path) -> Dict[str, List[str]]:
+    """Staged, modified and untracked paths as reported by `git status`."""
+    result: Dict[str, List[str]] = {"staged": [], "modified": [], "untracked": []}
+    for record in git(repo, "status", "--porcelain", "-z", "--no-renames").split("\0"):
+        if not record:
+            continue
+        code, path = record[:2], record[3:]
+        if code == "??":
+            result["untracked"].append(path)
+            continue
+        if code[0] not in " ?":
+            result["staged"].append(path)
+        if code[1] != " ":
+            result["modified"].append(path)
+    return {kind: sorted(paths) for kind, paths in result.items()}
+
+
+def native_status(repo: Path) -> Dict[str, List[str]]:
+    status = IndexStatus(str(repo))
+    return {
+        "staged": sorted(status.staged_files()),
+        "modified": sorted(status.modified_files()),
+        "untracked": sorted(status.untracked_files()),
+    }
+
+
+@pytest.fixture(params=[2, 3, 4])
+def changed(request, repo: Path) -> Path:
+    """A repository in the given index version with every kind of change.
+
+    Version 3 is only written when an entry has extended flags, so an
+    intent-to-add entry is added from version 3 on (git would upgrade a
+    version 2 index for it). The untracked cache is enabled and refreshed
+    by `git status` after the worktree settles.
+    """
+    git(repo, "config", "core.untrackedCache", "true")
+    git(repo, "config", "core.fsmonitor", "false")
+    for path in ("keep.txt", "edit.txt", "stage.txt", "gone.txt", "src/a.py", "src/b.py"):
+        (repo / path).parent.mkdir(parents=True, exist_ok=True)
+        (repo / path).write_text(f"{path}\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "initial")
+    git(repo, "update-index", "--index-version", str(request.param))
+
+    (repo / "stage.txt").write_text("staged\n")
+    (repo / "src" / "a.py").write_text("staged\n")
+    (repo / "new.txt").write_text("new\n")
+    git(repo, "add", "stage.txt", "src/a.py", "new.txt")
+    (repo / "edit.txt").write_text("edited\n")
+    (repo / "src" / "b.py").unlink()
+    (repo / "gone.txt").unlink()
+    if request.param >= 3:
+        (repo / "intent.txt").write_text("intent\n")
+        git(repo, "add", "-N", "intent.txt")
+    (repo / "loose.txt").write_text("loose\n")
+    (repo / "src" / "loose.py").write_text("loose\n")
+    (repo / "fresh").mkdir()
+    (repo / "fresh" / "one.txt").write_text("one\n")
+    (repo / "ignored.log").write_text("ignored\n")
+    (repo / ".git" / "info" / "exclude").write_text("*.log\n")
+
+    # Directories must be older than the index for the cache to be trusted
+    time.sleep(1.1)
+    git(repo, "update-index", "--untracked-cache")
+    git(repo, "status", "--porcelain")
+    git(repo, "status", "--porcelain")
+    assert GitIndex(str(repo / ".git" / "index")).version == request.param
+    return repo
+
+
+def test_native_status_matches_git_status(changed: Path):
+    index = GitIndex(str(changed / ".git" / "index"))
+    assert index.untracked is not None and index.untracked.all_valid
+    expected = git_status(changed)
+    assert expected["untracked"] == ["fresh/", "loose.txt", "src/loose.py"]
+    assert native_status(changed) == expected
+
+
+def test_native_index_service_matches_git(changed: Path):
+    service = GitService(str(changed))
+    # `git ls-files` lists untracked files first; the order carries no meaning
+    from_git = (service.get_staged_files(), sorted(service.get_unstaged_files()))
+    service.native_index = True
+    assert service._index_status() is not None
+    assert (service.get_staged_files(), sorted(service.get_unstaged_files())) == from_git
+
+
+
+def test_native_status_snapshot_matches_porcelain(changed: Path):
+    service = GitService(str(changed))
+    from_git = service.get_status_snapshot()
+    service.native_index = True
+    assert service._native_status_snapshot() is not None
+    native = service.get_status_snapshot()
+    assert native._replace(unstaged_files=sorted(native.unstaged_files)) == from_git._replace(
+        unstaged_files=sorted(from_git.unstaged_files)
+    )
+
+def test_stale_untracked_cache_is_not_trusted(changed: Path):
+    (changed / "src" / "later.py").write_text("later\n")
+    with pytest.raises(UnsupportedRepositoryError):
+        IndexStatus(str(changed)).untracked_files()
+
+
+def test_added_and_deleted_files_fall_back_to_git(repo: Path):
+    (repo / "old.txt").write_text("content that moves\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "initial")
+    git(repo, "mv", "old.txt", "new.txt")
+    with pytest.raises(UnsupportedRepositoryError):
+        IndexStatus(str(repo)).staged_files()
+    service = GitService(str(repo))
+    service.native_index = True
+    assert service.get_staged_files() == git(repo, "diff", "--cached", "--name-only").split()
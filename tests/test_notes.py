@@ -0,0 +1,63 @@
+from pathlib import Path
+
+from devtools.shared.git import GitService
+from devtools.shared.notes import CommitNotes
+
+from .conftest import git
+
+
+def clone(remote: Path, path: Path) -> Path:
+    git(remote.parent, "clone", "-q", str(remote), str(path))
+    git(path, "config", "user.email", "test@example.com")
+    git(path, "config", "user.name", "test")
+    git(path, "config", "commit.gpgsign", "false")
+    return path
+
+
+def test_sync_merges_conflicting_notes_by_kind(repo: Path, tmp_path: Path):
+    (repo / "a").write_text("a\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "initial")
+    commit = git(repo, "rev-parse", "HEAD").strip()
+    remote = tmp_path / "remote.git"
+    git(tmp_path, "clone", "-q", "--bare", str(repo), str(remote))
+    first, second = clone(remote, tmp_path / "first"), clone(remote, tmp_path / "second")
+
+    services = [GitService(str(first)), GitService(str(second))]
+    try:
+        a, b = (CommitNotes(service) for service in services)
+        a.write({commit: {"section": "Added"}}, "changelog")
+        a.write({commit: "from first"}, "shared")
+        b.write({commit: ["from second"]}, "other")
+        b.write({commit: "from second"}, "shared")
+        a.sync()
+        b.sync()
+        a.sync()
+
+        expected = {"changelog": {"section": "Added"}, "other": ["from second"], "shared": "from first"}
+        for notes in (a, b):
+            assert {kind: notes.read([commit], kind)[commit] for kind in expected} == expected
+        assert git(first, "rev-parse", "refs/notes/devtools") == git(second, "rev-parse", "refs/notes/devtools")
+    finally:
+        for service in services:
+            service.close()
+
+
+def test_write_stores_all_notes_with_one_git_call(repo: Path):
+    for i in range(3):
+        (repo / "a").write_text(f"{i}\n")
+        git(repo, "add", "-A")
+        git(repo, "commit", "-qm", f"commit {i}")
+    commits = git(repo, "rev-list", "HEAD").split()
+    service = GitService(str(repo))
+    calls = []
+    run = service._run_git_bytes
+    service._run_git_bytes = lambda args, **kwargs: calls.append(args[0]) or run(args, **kwargs)
+    try:
+        notes = CommitNotes(service)
+        notes.write({commit: {"n": i} for i, commit in enumerate(commits)}, "changelog")
+        assert calls.count("hash-object") == 1
+        assert notes.read(commits, "changelog") == {commit: {"n": i} for i, commit in enumerate(commits)}
+        assert git(repo, "notes", "--ref=devtools", "show", commits[0]).strip() == '{"changelog": {"n": 0}}'
+    finally:
+        service.close()
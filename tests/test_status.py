@@ -0,0 +1,38 @@
+from pathlib import Path
+
+from devtools.shared.git import GitService
+
+from .conftest import git
+
+
+def changed(repo: Path) -> GitService:
+    for name in ("a", "b", "c"):
+        (repo / name).write_text("".join(f"{i}\n" for i in range(50)))
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "initial")
+    for name in ("a", "b"):
+        (repo / name).write_text("".join(f"{i}\n" for i in range(100, 200)))
+    git(repo, "add", "a", "b")
+    (repo / "c").write_text("changed\n")
+    (repo / "new").write_text("new\n")
+    return GitService(str(repo))
+
+
+def test_status_with_diffs_matches_sequential_calls(repo: Path):
+    service = changed(repo)
+    snapshot, diffs = service.get_status_with_diffs()
+    assert snapshot == service.get_status_snapshot()
+    assert [(f.path, f.text) for f in diffs.staged] == list(service.iter_file_diffs(staged=True))
+    assert [(f.path, f.text) for f in diffs.unstaged] == list(service.iter_file_diffs(staged=False))
+    assert not diffs.truncated
+
+
+def test_status_with_diffs_drops_the_file_cut_off_by_the_cap(repo: Path):
+    service = changed(repo)
+    service.git_concurrency = 1
+    service.max_diff_total_bytes = 1000
+    _, diffs = service.get_status_with_diffs()
+    assert diffs.truncated
+    expected = dict(service.iter_file_diffs(staged=True))
+    assert [f.path for f in diffs.staged] == ["a"]
+    assert diffs.staged[0].text == expected["a"]